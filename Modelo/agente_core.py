@@ -3,22 +3,117 @@ Agente Inteligente de Texto Predictivo en Español (Colombia)
 Núcleo principal con arquitectura PEAS y lógica FOL
 """
 
-import re
+import os
 import json
-import sqlite3
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, NamedTuple, Set, Tuple, Optional, Sequence
 from datetime import datetime
 from dataclasses import dataclass
-from collections import defaultdict, Counter
-import heapq
+from collections import defaultdict, Counter, OrderedDict
+from itertools import chain
 import threading
+import time
 import logging
 
+from utils import inicio_cola, tokenizar, prefijo_en_curso, plegar_acentos
+from indice_prefijos import IndicePrefijos
+from modelo_ngramas import ModeloNgramas
+from lexicon_binario import LexiconBinario, compilar_desde_conexion, huella_palabras
+from conexiones_bd import GestorConexiones
+from escritor_feedback import EscritorFeedback
+from instrumentacion import InstrumentacionEtapas
+from corrector_ortografico import CorrectorSymSpell
+from indice_acentos import IndiceAcentos
+from detector_contexto import DetectorContexto, cargar_reglas_flujo
+from puntuacion import Rasgos, TablaRasgos, seleccionar_mejores
+from vocabulario import VOCABULARIO, Vocabulario
+from base_hechos import ConjuntoBits, Relacion
+from motor_reglas import MotorReglas, cargar_axiomas_flujo
+from preferencias_usuario import PreferenciasUsuario
+from modelo_usuario import GestorModelosUsuario, ModeloUsuario
+from aprendizaje_online import (AprendizajeOnline, PESOS_HEURISTICA_INICIALES, PesosAprendidos,
+                                 cargar_pesos_flujo, pesos_iniciales)
+from sesiones import GestorSesiones
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Versión del esquema SQLite (PRAGMA user_version)
+# 1: tablas y datos semilla; 2: índices secundarios para las consultas frecuentes
+VERSION_ESQUEMA = 2
+
+SQL_CANDIDATOS_CONTEXTO = """
+    SELECT palabra FROM palabras 
+    WHERE contexto = ? OR contexto = 'general'
+    ORDER BY frecuencia DESC
+    LIMIT 20
+"""
+
+# También la usa la ingesta de corpus, que puede correr antes que el agente
+SQL_CREAR_PALABRAS = """
+    CREATE TABLE IF NOT EXISTS palabras (
+        id INTEGER PRIMARY KEY,
+        palabra TEXT UNIQUE,
+        frecuencia INTEGER DEFAULT 1,
+        contexto TEXT,
+        es_colombianismo BOOLEAN DEFAULT FALSE,
+        requiere_tilde BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SQL_METRICAS_SEMANA = """
+    SELECT COUNT(*) as total, 
+           SUM(CASE WHEN accion = 'acepta' THEN 1 ELSE 0 END) as aceptadas
+    FROM interacciones
+    WHERE timestamp >= date('now', '-7 days')
+"""
+
+# Consultas frecuentes y el índice que EXPLAIN QUERY PLAN debe mostrar para cada una
+PLANES_ESPERADOS = (
+    (SQL_CANDIDATOS_CONTEXTO, ('formal',), 'idx_palabras_contexto_frecuencia'),
+    (SQL_METRICAS_SEMANA, (), 'idx_interacciones_timestamp_accion')
+)
+
+# Fracción del presupuesto reservada para la búsqueda: las etapas opcionales
+# (modelo del usuario, enriquecimiento FOL) se omiten si no queda más que esta reserva
+FRACCION_RESERVA_BUSQUEDA = 0.25
+
+# Cada cuántos candidatos puntuados la búsqueda revisa el plazo
+CANDIDATOS_POR_REVISION = 32
+
+# Puntos de f(n) que mueve la preferencia aprendida de un usuario (ajuste en [-1, 1])
+PESO_PREFERENCIA = 10.0
+
+# Peso de una sugerencia aceptada en el modelo de n-gramas del usuario (una palabra escrita pesa 1)
+PESO_ACEPTACION_MODELO = 3.0
+
+# Pesos de la heurística cuando no hay aprendizaje online
+PESOS_FIJOS = pesos_iniciales()
+
+# Indicadores de contexto (palabras completas, sin distinguir tildes); flujo.JSON aporta más
+INDICADORES_CONTEXTO = {
+    'formal': ('estimado', 'estimada', 'cordialmente', 'atentamente', 'señor', 'señora'),
+    'informal': ('parce', 'chévere', 'bacano', 'jaja', 'jajaja', 'lol'),
+    'academico': ('análisis', 'investigación', 'metodología', 'conclusión')
+}
+
+# Artículos que exigen concordancia con el sustantivo siguiente
+ARTICULOS = ('el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas')
+
+# Axiomas del motor de reglas (los mismos del nodo reglas_fol_correcciones de flujo.JSON)
+AXIOMAS_FOL = (
+    'Palabra(p) ∧ TieneTilde(p) ∧ ¬TildePresente(p) → CorregirTilde(p)',
+    'Precede(p1,p2,t) ∧ RequiereConcordancia(p1,p2) ∧ ¬Concordancia(p1,p2) → CorregirConcordancia(p2,p1)'
+)
+
+# Palabras funcionales que siempre entran como candidatas
+PALABRAS_BASE = ('que', 'de', 'la', 'en', 'el', 'y', 'con', 'para', 'por', 'se')
+
+# Frecuencias de palabras funcionales para el modelo semilla (sin corpus entrenado)
+FRECUENCIAS_BASE = {'que': 95, 'de': 90, 'la': 88, 'en': 85, 'el': 83}
+
 @dataclass
 class Sugerencia:
     """Estructura de datos para sugerencias predictivas"""
@@ -28,6 +123,25 @@ class Sugerencia:
     contexto: str
     metadata: Dict
 
+class Plazo:
+    """Fecha límite de una petición, medida con perf_counter_ns"""
+
+    def __init__(self, limite_ms: float):
+        self.limite_ms = limite_ms
+        self.fin_ns = time.perf_counter_ns() + int(limite_ms * 1e6)
+
+    def restante_ms(self) -> float:
+        """Milisegundos que quedan antes del límite (negativo si ya venció)"""
+        return (self.fin_ns - time.perf_counter_ns()) / 1e6
+
+    def vencido(self) -> bool:
+        """Indica si ya se alcanzó el límite"""
+        return time.perf_counter_ns() >= self.fin_ns
+
+    def permite(self, reserva_ms: float) -> bool:
+        """Indica si queda más tiempo que la reserva (para etapas opcionales)"""
+        return self.restante_ms() > reserva_ms
+
 @dataclass
 class Usuario:
     """Modelo de usuario con historial y preferencias"""
@@ -43,40 +157,80 @@ class BaseConocimientoFOL:
     para el dominio de texto predictivo en español colombiano
     """
 
-    def __init__(self):
+    def __init__(self, axiomas: Optional[List[str]] = None):
+        # Constantes que no son palabras (usuarios, textos, contextos, sistema) como ids propios
+        self.constantes = Vocabulario()
+
+        # Usuario, Texto y Contexto son ids de constantes; el resto, ids del vocabulario global
         self.predicados = {
-            'Usuario': set(),
-            'Texto': set(), 
-            'Palabra': set(),
-            'Sugerencia': set(),
-            'EspanolColombia': set(),
-            'Contexto': set()
+            'Usuario': ConjuntoBits(),
+            'Texto': ConjuntoBits(), 
+            'Palabra': ConjuntoBits(),
+            'Sugerencia': ConjuntoBits(),
+            'EspanolColombia': ConjuntoBits(),
+            'Contexto': ConjuntoBits()
         }
 
         self.propiedades = {
-            'Frecuente': set(),
-            'Correcto': set(),
-            'TieneTilde': set(),
-            'Masculino': set(),
-            'Femenino': set(),
-            'Singular': set(),
-            'Plural': set()
+            'Frecuente': ConjuntoBits(),
+            'Correcto': ConjuntoBits(),
+            'TieneTilde': ConjuntoBits(),
+            'Masculino': ConjuntoBits(),
+            'Femenino': ConjuntoBits(),
+            'Singular': ConjuntoBits(),
+            'Plural': ConjuntoBits(),
+            'Informal': ConjuntoBits(),
+            'Formal': ConjuntoBits(),
+            'Articulo': ConjuntoBits()
         }
 
         self.relaciones = {
-            'Escribe': set(),  # (usuario, texto)
-            'Sugiere': set(),  # (sistema, palabra, contexto)
-            'Acepta': set(),   # (usuario, sugerencia)
-            'Rechaza': set(),  # (usuario, sugerencia)
-            'Precede': set(),  # (palabra1, palabra2, texto)
-            'Concordancia': set()  # (palabra1, palabra2)
+            'Escribe': Relacion(2),  # (usuario, texto)
+            'Sugiere': Relacion(3),  # (sistema, palabra, contexto)
+            'Precede': Relacion(3),  # (palabra1, palabra2, texto)
+            'Concordancia': Relacion(2)  # (palabra1, palabra2)
         }
 
+        # Acepta/Rechaza como contadores acotados con decaimiento por (usuario, palabra)
+        self.preferencias = PreferenciasUsuario()
+
+        # Índices sobre todo el léxico (los asigna el agente)
+        self.corrector: Optional[CorrectorSymSpell] = None
+        self._indice_acentos: Optional[IndiceAcentos] = None
+
+        # Los axiomas se compilan en el motor; sus conclusiones quedan materializadas
+        self.motor = MotorReglas(
+            hechos={**self.predicados, **self.propiedades, **self.relaciones},
+            funciones={
+                'TieneTilde': self._hecho_tiene_tilde,
+                'TildePresente': self._hecho_tilde_presente,
+                'RequiereConcordancia': self._requiere_concordancia
+            }
+        )
+        for axioma in axiomas or AXIOMAS_FOL:
+            self.motor.agregar_regla(axioma)
+
         # Axiomas y reglas de inferencia
         self.reglas = self._cargar_reglas_fol()
 
         # Corpus específico colombiano
         self.corpus_colombiano = self._cargar_corpus_inicial()
+        self.propiedades['Informal'].agregar_varios(VOCABULARIO.ids(self.corpus_colombiano['expresiones_informales']))
+        self.propiedades['Formal'].agregar_varios(VOCABULARIO.ids(self.corpus_colombiano['expresiones_formales']))
+        self.propiedades['Articulo'].agregar_varios(VOCABULARIO.ids(ARTICULOS))
+
+        # Conjunción Palabra ∧ EspanolColombia ∧ Frecuente ∧ relevancia por contexto
+        self._mascaras_sugerencia: Dict[str, Tuple[Tuple[int, ...], ConjuntoBits]] = {}
+
+    @property
+    def indice_acentos(self) -> Optional[IndiceAcentos]:
+        return self._indice_acentos
+
+    @indice_acentos.setter
+    def indice_acentos(self, indice: Optional[IndiceAcentos]):
+        # TieneTilde y TildePresente dependen del índice: se recalculan las conclusiones
+        self._indice_acentos = indice
+        self.motor.recalcular()
 
     def _cargar_reglas_fol(self) -> Dict:
         """Carga las reglas FOL del dominio"""
@@ -89,31 +243,88 @@ class BaseConocimientoFOL:
 
     def _regla_sugerencia_basica(self, usuario, texto, palabra, contexto):
         """Regla FOL para sugerencia básica"""
-        return (usuario in self.predicados['Usuario'] and
-                texto in self.predicados['Texto'] and
+        return (self.constantes.buscar(usuario) in self.predicados['Usuario'] and
+                self.constantes.buscar(texto) in self.predicados['Texto'] and
                 palabra in self.predicados['Palabra'] and
                 palabra in self.predicados['EspanolColombia'] and
                 palabra in self.propiedades['Frecuente'] and
                 self._es_relevante(palabra, contexto))
 
+    def filtrar_sugerencia_basica(self, usuario: str, texto: str, palabras: np.ndarray,
+                                  contexto: str) -> np.ndarray:
+        """_regla_sugerencia_basica para un arreglo de ids (máscara booleana)"""
+        if (self.constantes.buscar(usuario) not in self.predicados['Usuario'] or
+                self.constantes.buscar(texto) not in self.predicados['Texto']):
+            return np.zeros(len(palabras), dtype=bool)
+        return self._mascara_sugerencia(contexto).contiene(palabras)
+
+    def _mascara_sugerencia(self, contexto: str) -> ConjuntoBits:
+        """Palabras que cumplen la parte de la regla básica que no depende del usuario
+
+        Se recalcula solo cuando cambia alguno de los conjuntos que intervienen
+        """
+        conjuntos = [self.predicados['Palabra'], self.predicados['EspanolColombia'],
+                     self.propiedades['Frecuente']]
+        if contexto == 'informal':
+            conjuntos.append(self.propiedades['Informal'])
+        elif contexto == 'formal':
+            conjuntos.append(self.propiedades['Formal'])
+
+        versiones = tuple(conjunto.version for conjunto in conjuntos)
+        guardada = self._mascaras_sugerencia.get(contexto)
+        if guardada is not None and guardada[0] == versiones:
+            return guardada[1]
+
+        mascara = conjuntos[0]
+        for conjunto in conjuntos[1:]:
+            mascara = mascara & conjunto
+        self._mascaras_sugerencia[contexto] = (versiones, mascara)
+        return mascara
+
     def _regla_correccion_tildes(self, palabra):
         """Regla FOL para corrección de tildes"""
-        return (palabra in self.predicados['Palabra'] and
-                palabra in self.propiedades['TieneTilde'] and
-                not self._tiene_tilde_presente(palabra))
+        return self.corregir_tilde(palabra) is not None
+
+    def corregir_tilde(self, palabra: str) -> Optional[str]:
+        """Forma con tilde correcta de la palabra según CorregirTilde ya derivado"""
+        palabra_id = int(self.ids_texto([palabra])[0])
+        if palabra_id < 0:
+            forma = self._forma_acentuada(palabra)
+            return forma if forma and forma.lower() != palabra.lower() else None
+
+        # Solo la primera aparición de la palabra evalúa el axioma
+        self.motor.afirmar('Palabra', (palabra_id,))
+        if self.motor.cumple('CorregirTilde', (palabra_id,)):
+            return self._forma_acentuada(palabra)
+        return None
+
+    def _forma_acentuada(self, palabra: str) -> Optional[str]:
+        """Forma con tildes que corresponde a la palabra, si la lleva"""
+        if self.indice_acentos is not None:
+            return self.indice_acentos.forma_acentuada(palabra)
+
+        forma = self.corpus_colombiano['correcciones_frecuentes'].get(palabra.lower())
+        return forma if forma and self._tiene_tilde_presente(forma) else None
+
+    def _hecho_tiene_tilde(self, palabra_id: int) -> bool:
+        """Predicado TieneTilde: la forma correcta de la palabra lleva tilde"""
+        return self._forma_acentuada(VOCABULARIO.palabra(palabra_id)) is not None
+
+    def _hecho_tilde_presente(self, palabra_id: int) -> bool:
+        """Predicado TildePresente: la palabra ya está escrita con su forma acentuada"""
+        palabra = VOCABULARIO.palabra(palabra_id)
+        forma = self._forma_acentuada(palabra)
+        return forma is not None and forma.lower() == palabra.lower()
 
     def _regla_concordancia(self, palabra1, palabra2, texto):
-        """Regla de concordancia gramatical"""
-        return (self._requiere_concordancia(palabra1, palabra2) and
-                not (palabra1, palabra2) in self.relaciones['Concordancia'])
+        """Regla de concordancia gramatical (ids del vocabulario global)"""
+        self.motor.afirmar('Precede', (palabra1, palabra2, self.constantes.id(texto)))
+        return self.motor.cumple('CorregirConcordancia', (palabra2, palabra1))
 
     def _regla_aprendizaje(self, usuario, sugerencia, accion):
         """Regla de aprendizaje por retroalimentación"""
-        if accion == 'acepta':
-            self.relaciones['Acepta'].add((usuario, sugerencia))
-            return True
-        elif accion == 'rechaza':
-            self.relaciones['Rechaza'].add((usuario, sugerencia))
+        if accion in ('acepta', 'rechaza'):
+            self.preferencias.registrar(usuario, sugerencia, accion == 'acepta')
             return True
         return False
 
@@ -138,12 +349,35 @@ class BaseConocimientoFOL:
             }
         }
 
-    def _es_relevante(self, palabra, contexto):
-        """Determina relevancia contextual de una palabra"""
+    def sugerir_correccion(self, palabra: str) -> Optional[str]:
+        """Corrección sugerida para la palabra o None si parece correcta"""
+        palabra = palabra.lower()
+
+        correccion = (self.corpus_colombiano['correcciones_frecuentes'].get(palabra) or
+                      self.corregir_tilde(palabra))
+        if correccion:
+            return correccion
+
+        if self.corrector is None or self.corrector.contiene(palabra):
+            return None
+
+        correcciones = self.corrector.corregir(palabra, 1)
+        return correcciones[0][0] if correcciones else None
+
+    def palabra_conocida(self, palabra: str) -> bool:
+        """Indica si la palabra es del léxico o del modelo de n-gramas (se internan al verla escrita)"""
+        return self.corrector is not None and self.corrector.contiene(palabra)
+
+    def ids_texto(self, palabras: Sequence[str]) -> np.ndarray:
+        """Ids de palabras escritas por el usuario (temporales y negativos si no son conocidas)"""
+        return VOCABULARIO.ids_texto(palabras, self.palabra_conocida)
+
+    def _es_relevante(self, palabra_id, contexto):
+        """Determina relevancia contextual de una palabra (id del vocabulario global)"""
         if contexto == 'informal':
-            return palabra in self.corpus_colombiano['expresiones_informales']
+            return palabra_id in self.propiedades['Informal']
         elif contexto == 'formal':
-            return palabra in self.corpus_colombiano['expresiones_formales']
+            return palabra_id in self.propiedades['Formal']
         return True
 
     def _tiene_tilde_presente(self, palabra):
@@ -152,74 +386,252 @@ class BaseConocimientoFOL:
         return any(c in tildes for c in palabra)
 
     def _requiere_concordancia(self, palabra1, palabra2):
-        """Determina si dos palabras requieren concordancia"""
-        articulos = ['el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas']
-        return palabra1 in articulos
+        """Determina si dos palabras (ids del vocabulario global) requieren concordancia"""
+        return palabra1 in self.propiedades['Articulo']
+
+class RecursosBusqueda(NamedTuple):
+    """Tabla de rasgos y correspondencias a ids globales usadas por la búsqueda"""
+    tabla: TablaRasgos
+    global_de_modelo: np.ndarray
+    listas: Dict[str, np.ndarray]
 
 class AlgoritmoBusquedaAEstrella:
     """Implementación del algoritmo A* para búsqueda óptima de sugerencias"""
 
-    def __init__(self, base_conocimiento: BaseConocimientoFOL):
+    def __init__(self, base_conocimiento: BaseConocimientoFOL,
+                 indice_prefijos: Optional[IndicePrefijos] = None,
+                 modelo_ngramas: Optional[ModeloNgramas] = None):
         self.base_conocimiento = base_conocimiento
+        self.indice_prefijos = indice_prefijos
+        self.modelo_ngramas = modelo_ngramas or ModeloNgramas.entrenar([], FRECUENCIAS_BASE)
+        # Pesos aprendidos del feedback; se leen sin lock (el hilo de aprendizaje reemplaza la referencia)
+        self.aprendizaje: Optional[AprendizajeOnline] = None
 
-    def buscar_mejores_sugerencias(self, contexto: str, palabras_previas: List[str], 
-                                  n_sugerencias: int = 5) -> List[Sugerencia]:
-        """Encuentra las mejores sugerencias usando A*"""
-        cola_abierta = []
-        visitados = set()
-
-        candidatos = self._generar_candidatos(contexto, palabras_previas)
+        # Rasgos y correspondencias de ids; se reconstruyen si cambian el modelo o los índices
+        self._recursos_busqueda: Optional[RecursosBusqueda] = None
+        self._fuentes_recursos: Tuple = ()
 
-        for candidato in candidatos:
-            g_score = self._costo_real(candidato, palabras_previas)
-            h_score = self._heuristica(candidato, contexto, palabras_previas)
-            f_score = g_score + h_score
-
-            heapq.heappush(cola_abierta, (f_score, candidato))
+    def buscar_mejores_sugerencias(self, contexto: str, palabras_previas: List[str], 
+                                  n_sugerencias: int = 5, prefijo: str = '',
+                                  plazo: Optional[Plazo] = None,
+                                  ids_previos: Optional[np.ndarray] = None,
+                                  usuario_id: Optional[str] = None,
+                                  modelo_usuario: Optional[ModeloUsuario] = None) -> List[Sugerencia]:
+        """Encuentra las mejores sugerencias usando A*
+
+        Los candidatos se manejan como ids del vocabulario global: f(n) = g(n) + h(n)
+        se calcula en bloque y los k mejores salen con argpartition; el texto solo
+        se materializa al construir las sugerencias. Con el plazo ya vencido solo
+        se puntúa el primer bloque de candidatos y el resultado se marca con
+        metadata['degradada']. Con usuario_id, sus aceptaciones y rechazos
+        recientes bajan o suben f(n); con modelo_usuario, sus n-gramas se
+        interpolan con los del modelo global
+        """
+        truncada = False
+
+        if ids_previos is None:
+            ids_previos = self.base_conocimiento.ids_texto(palabras_previas)
+
+        correccion = self.base_conocimiento.sugerir_correccion(palabras_previas[-1]) if palabras_previas else None
+        candidatos = self._generar_candidatos(contexto, palabras_previas, prefijo, ids_previos, correccion,
+                                              modelo_usuario)
+
+        # La palabra a medio escribir no forma parte de la historia del modelo
+        ids_historia = ids_previos[:-1] if prefijo else ids_previos
+
+        if plazo is not None and len(candidatos) > CANDIDATOS_POR_REVISION and plazo.vencido():
+            candidatos = candidatos[:CANDIDATOS_POR_REVISION]
+            truncada = True
+
+        f_scores, columnas = self._puntuar_candidatos(candidatos, contexto, ids_previos, ids_historia, correccion,
+                                                      modelo_usuario)
+        if usuario_id is not None:
+            f_scores = f_scores - PESO_PREFERENCIA * self.base_conocimiento.preferencias.ajustes(usuario_id, candidatos)
 
         mejores_sugerencias = []
+        texto = lambda indice: VOCABULARIO.palabra(candidatos[indice])
 
-        while cola_abierta and len(mejores_sugerencias) < n_sugerencias:
-            f_score, candidato = heapq.heappop(cola_abierta)
-
-            if candidato in visitados:
-                continue
-
-            visitados.add(candidato)
+        for indice in seleccionar_mejores(f_scores, texto, n_sugerencias):
+            candidato_id = int(candidatos[indice])
+            candidato = VOCABULARIO.palabra(candidato_id)
+            f_score = float(f_scores[indice])
 
             sugerencia = Sugerencia(
                 texto=candidato,
                 confianza=1.0 - (f_score / 100.0),
-                tipo=self._determinar_tipo_sugerencia(candidato, palabras_previas),
+                tipo=self._determinar_tipo_sugerencia(candidato, correccion, prefijo),
                 contexto=contexto,
                 metadata={
                     'f_score': f_score,
-                    'frecuencia': self._obtener_frecuencia(candidato),
-                    'es_colombianismo': candidato in self.base_conocimiento.corpus_colombiano['expresiones_informales']
+                    'frecuencia': float(columnas['frecuencia'][candidato_id]),
+                    'es_colombianismo': bool(columnas['informal'][candidato_id])
                 }
             )
+            if truncada:
+                sugerencia.metadata['degradada'] = True
 
             mejores_sugerencias.append(sugerencia)
 
         return mejores_sugerencias
 
-    def _generar_candidatos(self, contexto: str, palabras_previas: List[str]) -> List[str]:
-        """Genera candidatos basados en contexto y palabras previas"""
+    def _generar_candidatos(self, contexto: str, palabras_previas: List[str], prefijo: str = '',
+                            ids_previos: Optional[np.ndarray] = None,
+                            correccion: Optional[str] = None,
+                            modelo_usuario: Optional[ModeloUsuario] = None) -> np.ndarray:
+        """Genera los ids de los candidatos según contexto y palabras previas, sin repetidos"""
+        recursos = self._recursos()
+        if ids_previos is None:
+            ids_previos = self.base_conocimiento.ids_texto(palabras_previas)
+
+        # Lo que el usuario suele escribir después de la palabra anterior
+        propios = np.empty(0, dtype=np.int32)
+        ids_historia = ids_previos[:-1] if prefijo else ids_previos
+        if modelo_usuario is not None and len(ids_historia):
+            propios = np.array(modelo_usuario.siguientes_ids(int(ids_historia[-1])), dtype=np.int32)
+            if prefijo:
+                propios = propios[[VOCABULARIO.palabra(i).startswith(prefijo.lower()) for i in propios.tolist()]]
+
+        # Si hay una palabra a medio escribir, solo sirven sus completaciones
+        if prefijo and self.indice_prefijos is not None:
+            completaciones = self.indice_prefijos.completar(prefijo, contexto)
+            completados = [VOCABULARIO.ids(completaciones), propios]
+            correccion_prefijo = self.base_conocimiento.sugerir_correccion(prefijo)
+            if correccion_prefijo:
+                completados.append(VOCABULARIO.ids([correccion_prefijo]))
+            if completaciones or correccion_prefijo or len(propios):
+                return self._sin_repetidos(completados)
+
+        # Los más prometedores van primero: si la búsqueda se corta por plazo,
+        # ya se habrán puntuado
         candidatos = []
+        if len(ids_previos):
+            if correccion:
+                candidatos.append(VOCABULARIO.ids([correccion]))
+
+            ids_modelo = self._ids_modelo(recursos.tabla, ids_previos)
+            siguientes = [i for i, _ in self.modelo_ngramas.siguientes_ids(ids_modelo)]
+            candidatos.append(recursos.global_de_modelo[siguientes])
+            candidatos.append(propios)
+
+        if contexto in ('informal', 'formal'):
+            candidatos.append(recursos.listas[contexto])
+
+        candidatos.append(recursos.listas['base'])
+
+        return self._sin_repetidos(candidatos)
+
+    @staticmethod
+    def _sin_repetidos(bloques: List[np.ndarray]) -> np.ndarray:
+        """Concatena bloques de ids conservando la primera aparición de cada uno"""
+        ids = np.concatenate(bloques).astype(np.int32, copy=False)
+        ids = ids[ids >= 0]
+        _, primeros = np.unique(ids, return_index=True)
+        return ids[np.sort(primeros)]
+
+    def _recursos(self) -> RecursosBusqueda:
+        """Rasgos y correspondencias de ids vigentes para el modelo y los índices actuales"""
+        fuentes = (
+            self.modelo_ngramas,
+            self.base_conocimiento.indice_acentos,
+            self.indice_prefijos,
+            len(self.indice_prefijos) if self.indice_prefijos is not None else 0
+        )
+        recursos = self._recursos_busqueda
+        if recursos is not None and self._fuentes_recursos == fuentes:
+            return recursos
+
+        corpus = self.base_conocimiento.corpus_colombiano
+        informales = set(corpus['expresiones_informales'])
+        formales = set(corpus['expresiones_formales'])
+        modelo = self.modelo_ngramas
+
+        def extraer(palabra: str) -> Rasgos:
+            return Rasgos(
+                longitud=len(palabra),
+                tilde=self._tiene_tildes_correctas(palabra),
+                informal=palabra in informales,
+                formal=palabra in formales,
+                id_modelo=modelo.ids.get(palabra.lower(), -1),
+                frecuencia=modelo.frecuencia(palabra)
+            )
 
-        if contexto == 'informal':
-            candidatos.extend(self.base_conocimiento.corpus_colombiano['expresiones_informales'])
-        elif contexto == 'formal':
-            candidatos.extend(self.base_conocimiento.corpus_colombiano['expresiones_formales'])
-
-        if palabras_previas:
-            ultima_palabra = palabras_previas[-1].lower()
-            if ultima_palabra in self.base_conocimiento.corpus_colombiano['correcciones_frecuentes']:
-                candidatos.append(self.base_conocimiento.corpus_colombiano['correcciones_frecuentes'][ultima_palabra])
+        recursos = RecursosBusqueda(
+            tabla=TablaRasgos(extraer, VOCABULARIO),
+            global_de_modelo=VOCABULARIO.ids(modelo.vocabulario),
+            listas={
+                'informal': VOCABULARIO.ids(corpus['expresiones_informales']),
+                'formal': VOCABULARIO.ids(corpus['expresiones_formales']),
+                'base': VOCABULARIO.ids(PALABRAS_BASE)
+            }
+        )
+        self._recursos_busqueda, self._fuentes_recursos = recursos, fuentes
+        return recursos
+
+    @staticmethod
+    def _ids_modelo(tabla: TablaRasgos, ids: np.ndarray) -> np.ndarray:
+        """Ids del modelo de n-gramas para ids globales (-1 si son desconocidos)"""
+        conocidos = ids >= 0
+        columnas = tabla.columnas(ids[conocidos])
+        return np.where(conocidos, columnas['id_modelo'][np.maximum(ids, 0)], -1)
+
+    def _puntuar_candidatos(self, candidatos: np.ndarray, contexto: str, ids_previos: np.ndarray,
+                            ids_historia: np.ndarray, correccion: Optional[str],
+                            modelo_usuario: Optional[ModeloUsuario] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """f(n) = g(n) + h(n) de todos los candidatos y las columnas de rasgos usadas
+
+        Mismas operaciones y en el mismo orden que _costo_real y _heuristica,
+        para que el resultado sea idéntico al cálculo candidato por candidato.
+        El modelo del usuario, si hay, se interpola en la frecuencia
+        """
+        tabla = self._recursos().tabla
+        ids_historia_modelo = self._ids_modelo(tabla, ids_historia)
+        columnas = tabla.columnas(candidatos)
+
+        g_scores = columnas['longitud'][candidatos] * 0.1 + np.where(np.isin(candidatos, ids_previos), 5.0, 0.0)
+
+        if len(ids_historia):
+            frecuencias = self.modelo_ngramas.puntajes(columnas['id_modelo'][candidatos], ids_historia_modelo)
+        else:
+            frecuencias = columnas['frecuencia'][candidatos]
 
-        candidatos.extend(['que', 'de', 'la', 'en', 'el', 'y', 'con', 'para', 'por', 'se'])
+        if modelo_usuario is not None and modelo_usuario.total:
+            previo = int(ids_historia[-1]) if len(ids_historia) else -1
+            peso = modelo_usuario.peso(previo)
+            frecuencias = (1.0 - peso) * frecuencias + peso * modelo_usuario.puntajes(candidatos, previo)
 
-        return list(set(candidatos))
+        if contexto == 'informal':
+            relevancias = np.where(columnas['informal'][candidatos], 90.0, 50.0)
+        elif contexto == 'formal':
+            relevancias = np.where(columnas['formal'][candidatos], 85.0, 50.0)
+        else:
+            relevancias = np.full(len(candidatos), 50.0)
+
+        gramaticales = np.where(columnas['tilde'][candidatos], 80.0, 60.0)
+        if len(ids_previos) and correccion:
+            gramaticales = np.where(candidatos == VOCABULARIO.buscar(correccion), 95.0, gramaticales)
+
+        pesos = self._pesos()
+        w_frecuencia, w_relevancia, w_gramatica = pesos.heuristica.tolist()
+        h_scores = 100.0 - (frecuencias * w_frecuencia + relevancias * w_relevancia + gramaticales * w_gramatica)
+        h_scores = h_scores - pesos.impulsos_de(candidatos)
+        return g_scores + h_scores, columnas
+
+    def _pesos(self) -> PesosAprendidos:
+        """Instantánea vigente de los pesos de la heurística y los impulsos por palabra"""
+        aprendizaje = self.aprendizaje
+        return aprendizaje.pesos if aprendizaje is not None else PESOS_FIJOS
+
+    def rasgos_heuristica(self, palabra_id: int, contexto: str) -> np.ndarray:
+        """Frecuencia, relevancia y gramática (0-100) de una palabra, sin historia, para el aprendizaje"""
+        columnas = self._recursos().tabla.columnas(np.array([palabra_id]))
+        if contexto == 'informal':
+            relevancia = 90.0 if columnas['informal'][palabra_id] else 50.0
+        elif contexto == 'formal':
+            relevancia = 85.0 if columnas['formal'][palabra_id] else 50.0
+        else:
+            relevancia = 50.0
+        gramatica = 80.0 if columnas['tilde'][palabra_id] else 60.0
+        return np.array([columnas['frecuencia'][palabra_id], relevancia, gramatica], dtype=np.float64)
 
     def _costo_real(self, candidato: str, palabras_previas: List[str]) -> float:
         """Calcula el costo real g(n) desde el inicio"""
@@ -230,22 +642,26 @@ class AlgoritmoBusquedaAEstrella:
 
         return costo
 
-    def _heuristica(self, candidato: str, contexto: str, palabras_previas: List[str]) -> float:
+    def _heuristica(self, candidato: str, contexto: str, palabras_previas: List[str],
+                    historia: Optional[List[str]] = None) -> float:
         """Función heurística h(n)"""
-        peso_frecuencia = self._obtener_frecuencia(candidato) * 0.4
-        peso_relevancia = self._calcular_relevancia_contextual(candidato, contexto) * 0.3
-        peso_gramatical = self._validar_correccion_gramatical(candidato, palabras_previas) * 0.3
-
-        return 100.0 - (peso_frecuencia + peso_relevancia + peso_gramatical)
-
-    def _obtener_frecuencia(self, palabra: str) -> float:
-        """Obtiene frecuencia de palabra en corpus"""
-        frecuencias_simuladas = {
-            'que': 95, 'de': 90, 'la': 88, 'en': 85, 'el': 83,
-            'chévere': 70, 'bacano': 65, 'parce': 60,
-            'cordialmente': 75, 'atentamente': 70
-        }
-        return frecuencias_simuladas.get(palabra.lower(), 20)
+        if historia is None:
+            historia = palabras_previas
+
+        pesos = self._pesos()
+        w_frecuencia, w_relevancia, w_gramatica = pesos.heuristica.tolist()
+        peso_frecuencia = self._obtener_frecuencia(candidato, historia) * w_frecuencia
+        peso_relevancia = self._calcular_relevancia_contextual(candidato, contexto) * w_relevancia
+        peso_gramatical = self._validar_correccion_gramatical(candidato, palabras_previas) * w_gramatica
+
+        impulso = float(pesos.impulsos_de(np.array([VOCABULARIO.buscar(candidato)]))[0])
+        return 100.0 - (peso_frecuencia + peso_relevancia + peso_gramatical) - impulso
+
+    def _obtener_frecuencia(self, palabra: str, historia: Optional[List[str]] = None) -> float:
+        """Obtiene frecuencia de palabra (0-100) según el modelo de n-gramas"""
+        if historia:
+            return self.modelo_ngramas.puntaje(palabra, historia)
+        return self.modelo_ngramas.frecuencia(palabra)
 
     def _calcular_relevancia_contextual(self, palabra: str, contexto: str) -> float:
         """Calcula relevancia según contexto"""
@@ -258,8 +674,7 @@ class AlgoritmoBusquedaAEstrella:
     def _validar_correccion_gramatical(self, palabra: str, palabras_previas: List[str]) -> float:
         """Valida corrección gramatical"""
         if palabras_previas:
-            ultima = palabras_previas[-1].lower()
-            if palabra == self.base_conocimiento.corpus_colombiano['correcciones_frecuentes'].get(ultima):
+            if palabra == self.base_conocimiento.sugerir_correccion(palabras_previas[-1]):
                 return 95.0
 
         if self._tiene_tildes_correctas(palabra):
@@ -269,66 +684,276 @@ class AlgoritmoBusquedaAEstrella:
 
     def _tiene_tildes_correctas(self, palabra: str) -> bool:
         """Verifica si la palabra tiene tildes correctas"""
+        indice_acentos = self.base_conocimiento.indice_acentos
+        if indice_acentos is not None:
+            return indice_acentos.tiene_tildes_correctas(palabra)
+
         requieren_tilde = ['también', 'José', 'camión', 'análisis', 'está', 'será']
         return palabra in requieren_tilde
 
-    def _determinar_tipo_sugerencia(self, candidato: str, palabras_previas: List[str]) -> str:
-        """Determina el tipo de sugerencia"""
-        if palabras_previas:
-            ultima = palabras_previas[-1].lower()
-            if candidato == self.base_conocimiento.corpus_colombiano['correcciones_frecuentes'].get(ultima):
-                return 'correccion'
+    def _determinar_tipo_sugerencia(self, candidato: str, correccion: Optional[str],
+                                    prefijo: str = '') -> str:
+        """Determina el tipo de sugerencia (correccion es la de la última palabra previa)"""
+        if correccion and candidato == correccion:
+            return 'correccion'
+
+        if prefijo and plegar_acentos(candidato).startswith(plegar_acentos(prefijo)):
+            return 'completado'
 
         if len(candidato) > 8:
             return 'completado'
 
         return 'prediccion'
 
+class CacheSugerencias:
+    """Caché LRU de sugerencias con contadores de aciertos, fallos y desalojos"""
+
+    def __init__(self, tamano_maximo: int = 1000):
+        self.tamano_maximo = tamano_maximo
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obtener(self, clave) -> Optional[List[Sugerencia]]:
+        """Devuelve las sugerencias guardadas para la clave o None"""
+        with self._lock:
+            sugerencias = self._entradas.get(clave)
+            if sugerencias is None:
+                self.fallos += 1
+                return None
+
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return sugerencias
+
+    def guardar(self, clave, sugerencias: List[Sugerencia]):
+        """Guarda sugerencias desalojando la entrada menos usada si hace falta"""
+        with self._lock:
+            self._entradas[clave] = sugerencias
+            self._entradas.move_to_end(clave)
+
+            while len(self._entradas) > self.tamano_maximo:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar_palabras(self, palabras: Set[str]):
+        """Elimina las entradas que sugieren alguna de las palabras"""
+        with self._lock:
+            claves = [clave for clave, sugerencias in self._entradas.items()
+                      if any(s.texto.lower() in palabras for s in sugerencias)]
+            for clave in claves:
+                del self._entradas[clave]
+
+    def limpiar(self):
+        """Vacía la caché conservando los contadores"""
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self) -> Dict:
+        """Contadores de uso de la caché"""
+        consultas = self.aciertos + self.fallos
+        return {
+            'entradas': len(self._entradas),
+            'tamano_maximo': self.tamano_maximo,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'desalojos': self.desalojos,
+            'tasa_aciertos': round(self.aciertos / consultas * 100, 2) if consultas else 0.0
+        }
+
 class AgentePredictivo:
     """Clase principal del Agente Inteligente de Texto Predictivo"""
 
     def __init__(self, config_path: str = 'data/configuracion.json'):
         """Inicializa el agente con configuración"""
         self.config = self._cargar_configuracion(config_path)
+        self.detector_contexto = self._construir_detector_contexto()
 
-        self.base_conocimiento = BaseConocimientoFOL()
+        self.base_conocimiento = BaseConocimientoFOL(self._cargar_axiomas())
         self.algoritmo_busqueda = AlgoritmoBusquedaAEstrella(self.base_conocimiento)
 
         self.usuarios_activos = {}
-        self.sesiones = {}
+        # Estado incremental por sesión de escritura del cliente
+        self.sesiones = GestorSesiones(self.config['ttl_sesion_s'], self.config['maximo_sesiones'],
+                                       self.config['caracteres_analisis'], self.config['maximo_verificadas_sesion'])
         self.metricas = defaultdict(float)
-
-        self.db_path = 'corpus_colombiano.db'
+        self.instrumentacion = InstrumentacionEtapas()
+        # (latencia en ms, marca de tiempo) de la última predicción exitosa
+        self.ultima_prediccion: Optional[Tuple[float, float]] = None
+
+        # Caché de sugerencias; la versión de usuario cambia cuando su feedback altera el ranking
+        self.cache_sugerencias = None
+        if self.config['cache_habilitado']:
+            self.cache_sugerencias = CacheSugerencias(self.config['tamano_cache'])
+        self._versiones_usuario = defaultdict(int)
+
+        self.db_path = self.config['db_path']
+        self.bd = GestorConexiones(self.db_path)
         self._inicializar_base_datos()
 
+        # El feedback se escribe por lotes en segundo plano
+        self.escritor_feedback = EscritorFeedback(self.bd)
+        self.escritor_feedback.iniciar()
+
+        self.lexicon = self._abrir_lexicon()
+
+        self.indice_prefijos = self._construir_indice_prefijos()
+        self.algoritmo_busqueda.indice_prefijos = self.indice_prefijos
+
+        self.modelo_ngramas = self._cargar_modelo_ngramas()
+        self.algoritmo_busqueda.modelo_ngramas = self.modelo_ngramas
+
+        self.base_conocimiento.corrector = self._construir_corrector()
+        self.base_conocimiento.preferencias = PreferenciasUsuario(
+            self.config['vida_media_preferencias_h'] * 3600.0,
+            self.config['maximo_palabras_por_usuario'],
+            self.config['maximo_entradas_preferencias']
+        )
+        self.base_conocimiento.indice_acentos = self._construir_indice_acentos()
+
+        # Pesos de la heurística e impulsos por palabra aprendidos del feedback en segundo plano
+        self.aprendizaje = AprendizajeOnline(
+            self._cargar_pesos_heuristica(),
+            self.config['tasa_aprendizaje_pesos'],
+            self.config['paso_impulso'],
+            self.config['impulso_maximo'],
+            publicar_cada_lotes=self.config['publicar_pesos_cada_lotes'],
+            intervalo_publicacion_s=self.config['intervalo_publicacion_pesos_s'],
+            tolerancia_heuristica=self.config['tolerancia_pesos_heuristica'],
+            al_publicar_impulsos=self._impulsos_publicados
+        )
+        self.aprendizaje.iniciar()
+        self.algoritmo_busqueda.aprendizaje = self.aprendizaje
+
+        # Unigramas y bigramas propios de cada usuario, interpolados con el modelo global
+        self.modelos_usuario = GestorModelosUsuario(
+            self.config['directorio_modelos_usuario'],
+            int(self.config['presupuesto_modelos_usuario_mb'] * 1024 * 1024),
+            self.config['maximo_entradas_modelo_usuario']
+        )
+        self.modelos_usuario.iniciar()
+
+        # Interna el léxico en el vocabulario global antes de la primera petición
+        self.algoritmo_busqueda._recursos()
+
         logger.info("Agente Predictivo inicializado correctamente")
 
     def _cargar_configuracion(self, config_path: str) -> Dict:
         """Carga configuración del sistema"""
-        return {
+        config = {
             'max_sugerencias': 5,
             'tiempo_limite_ms': 200,
             'nivel_confianza_minimo': 0.6,
-            'contextos_soportados': ['formal', 'informal', 'academico']
+            'contextos_soportados': ['formal', 'informal', 'academico'],
+            'db_path': 'corpus_colombiano.db',
+            'ruta_modelo_ngramas': 'data/modelo_ngramas.npz',
+            'ruta_lexicon': 'data/lexicon.bin',
+            'cache_habilitado': True,
+            'tamano_cache': 1000,
+            'ventana_tokens': 8,
+            # Límites del análisis: el costo por petición no depende del largo del texto
+            'max_caracteres_entrada': 50000,
+            'caracteres_analisis': 8192,
+            'ventana_analisis_tokens': 256,
+            'ventana_contexto_tokens': 512,
+            'decaimiento_contexto': 0.995,
+            'ttl_sesion_s': 1800,
+            'vida_media_preferencias_h': 168,
+            'maximo_palabras_por_usuario': 256,
+            'maximo_entradas_preferencias': 500000,
+            'maximo_sesiones': 10000,
+            'maximo_verificadas_sesion': 4096,
+            # Modelos de n-gramas por usuario: en memoria hasta el presupuesto, el resto en disco
+            'directorio_modelos_usuario': 'data/usuarios',
+            'presupuesto_modelos_usuario_mb': 64,
+            'maximo_entradas_modelo_usuario': 50000,
+            # Aprendizaje online de pesos desde el feedback
+            'tasa_aprendizaje_pesos': 0.02,
+            'paso_impulso': 0.5,
+            'impulso_maximo': 5.0,
+            'publicar_pesos_cada_lotes': 32,
+            'intervalo_publicacion_pesos_s': 1.0,
+            'tolerancia_pesos_heuristica': 0.01,
+            'ruta_flujo': os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Entregables', 'flujo.JSON')
         }
 
+        try:
+            with open(config_path, encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+        except FileNotFoundError:
+            return config
+        except Exception as e:
+            logger.warning(f"Configuración {config_path} inválida, se usan valores por defecto: {e}")
+            return config
+
+        config.update(datos.get('agente', {}))
+
+        base_datos = datos.get('base_datos', {})
+        config['db_path'] = base_datos.get('nombre_archivo', config['db_path'])
+
+        busqueda = datos.get('algoritmo_busqueda', {})
+        config['cache_habilitado'] = busqueda.get('cache_habilitado', config['cache_habilitado'])
+        config['tamano_cache'] = busqueda.get('tamaño_cache', config['tamano_cache'])
+
+        return config
+
     def _inicializar_base_datos(self):
         """Inicializa base de datos SQLite"""
-        conn = sqlite3.connect(self.db_path)
+        # Solo se aplican las migraciones pendientes según PRAGMA user_version
+        version = self.bd.consultar_uno("PRAGMA user_version")[0]
+
+        if version < VERSION_ESQUEMA:
+            with self.bd.transaccion() as conn:
+                if version < 1:
+                    self._crear_tablas(conn)
+                    self._poblar_datos_iniciales(conn)
+                if version < 2:
+                    self._crear_indices(conn)
+                conn.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+
+            logger.info(f"Esquema de base de datos migrado de la versión {version} a {VERSION_ESQUEMA}")
+
+        self._verificar_planes_consulta()
+
+    def _crear_indices(self, conn):
+        """Crea los índices de cobertura para las consultas frecuentes"""
         cursor = conn.cursor()
 
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS palabras (
-                id INTEGER PRIMARY KEY,
-                palabra TEXT UNIQUE,
-                frecuencia INTEGER DEFAULT 1,
-                contexto TEXT,
-                es_colombianismo BOOLEAN DEFAULT FALSE,
-                requiere_tilde BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            CREATE INDEX IF NOT EXISTS idx_interacciones_usuario_timestamp
+            ON interacciones (usuario_id, timestamp DESC, texto_entrada)
         """)
 
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_interacciones_timestamp_accion
+            ON interacciones (timestamp, accion)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_palabras_contexto_frecuencia
+            ON palabras (contexto, frecuencia DESC, palabra)
+        """)
+
+    def _verificar_planes_consulta(self):
+        """Comprueba con EXPLAIN QUERY PLAN que las consultas frecuentes usan sus índices"""
+        with self.bd.conexion() as conn:
+            for sql, parametros, indice in PLANES_ESPERADOS:
+                plan = [fila[3] for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+                if not any(indice in paso for paso in plan) or any(paso.startswith('SCAN') for paso in plan):
+                    raise RuntimeError(f"La consulta no usa el índice {indice}: {plan}")
+
+    def _crear_tablas(self, conn):
+        """Crea las tablas del esquema si no existen"""
+        cursor = conn.cursor()
+
+        cursor.execute(SQL_CREAR_PALABRAS)
+
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS interacciones (
                 id INTEGER PRIMARY KEY,
@@ -350,14 +975,8 @@ class AgentePredictivo:
             )
         """)
 
-        conn.commit()
-        conn.close()
-
-        self._poblar_datos_iniciales()
-
-    def _poblar_datos_iniciales(self):
+    def _poblar_datos_iniciales(self, conn):
         """Pobla la base de datos con corpus inicial colombiano"""
-        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
         colombianismos = [
@@ -379,160 +998,525 @@ class AgentePredictivo:
             VALUES (?, ?, ?, ?, ?)
         """, colombianismos)
 
-        conn.commit()
-        conn.close()
+    def _abrir_lexicon(self) -> Optional[LexiconBinario]:
+        """Abre el léxico binario, compilándolo desde SQLite si falta, es de otra versión
+        o la tabla palabras cambió desde que se compiló"""
+        ruta = self.config['ruta_lexicon']
+
+        try:
+            with self.bd.conexion() as conn:
+                huella = huella_palabras(conn)
+        except Exception as e:
+            logger.error(f"Error leyendo la huella de palabras: {e}")
+            huella = None
+
+        if os.path.exists(ruta):
+            try:
+                lexicon = LexiconBinario.abrir(ruta)
+                if huella is None or lexicon.huella == huella:
+                    return lexicon
+                lexicon.cerrar()
+                logger.info(f"Léxico {ruta} desactualizado respecto a la tabla palabras, se recompila")
+            except Exception as e:
+                logger.warning(f"Léxico {ruta} inválido, se recompila: {e}")
+
+        try:
+            with self.bd.conexion() as conn:
+                compilar_desde_conexion(conn, ruta)
+            return LexiconBinario.abrir(ruta)
+        except Exception as e:
+            logger.error(f"Error compilando léxico binario: {e}")
+            return None
+
+    def _construir_indice_prefijos(self) -> IndicePrefijos:
+        """Trie de completado: el compilado del léxico más las expresiones del corpus"""
+        indice = IndicePrefijos(base=self.lexicon.prefijos if self.lexicon is not None else None)
+
+        corpus = self.base_conocimiento.corpus_colombiano
+        for expresion in corpus['expresiones_informales']:
+            indice.agregar(expresion, 1, 'informal')
+        for expresion in corpus['expresiones_formales']:
+            indice.agregar(expresion, 1, 'formal')
+        for expresion in corpus['modismos']:
+            indice.agregar(expresion, 1, 'informal')
+        for correccion in corpus['correcciones_frecuentes'].values():
+            indice.agregar(correccion, 1, 'general')
+
+        indice.construir()
+        return indice
+
+    def _cargar_modelo_ngramas(self) -> ModeloNgramas:
+        """Carga el modelo de n-gramas entrenado o construye uno semilla"""
+        ruta = self.config.get('ruta_modelo_ngramas')
+        if ruta and os.path.exists(ruta):
+            try:
+                return ModeloNgramas.cargar(ruta)
+            except Exception as e:
+                logger.error(f"Error cargando modelo de n-gramas {ruta}: {e}")
+
+        # Modelo semilla: frecuencias de la tabla palabras y frases del corpus
+        unigramas = dict(FRECUENCIAS_BASE)
+        lexicon = ((palabra, frecuencia or 1) for palabra, frecuencia, _, _, _ in (self.lexicon or ()))
+        for palabra, frecuencia in chain(lexicon, zip(self.indice_prefijos.palabras, self.indice_prefijos.frecuencias)):
+            if ' ' not in palabra:
+                unigramas[palabra.lower()] = max(unigramas.get(palabra.lower(), 0), frecuencia)
+
+        corpus = self.base_conocimiento.corpus_colombiano
+        frases = corpus['expresiones_formales'] + corpus['modismos']
+
+        return ModeloNgramas.entrenar(frases, unigramas)
+
+    def _construir_corrector(self) -> CorrectorSymSpell:
+        """Corrector: los borrados compilados del léxico más el corpus y el vocabulario del modelo"""
+        corrector = CorrectorSymSpell(base=self.lexicon.borrados if self.lexicon is not None else None)
+
+        # Primero el léxico, que conserva mayúsculas ("José"), luego el modelo
+        sueltas = [(palabra, frecuencia) for palabra, frecuencia in
+                   zip(self.indice_prefijos.palabras, self.indice_prefijos.frecuencias) if ' ' not in palabra]
+        corrector.agregar_varias([palabra for palabra, _ in sueltas], [frecuencia for _, frecuencia in sueltas])
+        corrector.agregar_varias(self.modelo_ngramas.vocabulario, self.modelo_ngramas.unigramas)
+
+        return corrector
+
+    def _construir_indice_acentos(self) -> IndiceAcentos:
+        """Índice de acentos con las mismas formas que el corrector"""
+        indice = IndiceAcentos(base=self.lexicon.acentos if self.lexicon is not None else None)
+        corrector = self.base_conocimiento.corrector
+
+        for palabra, frecuencia in corrector.agregadas():
+            indice.agregar(palabra, frecuencia)
+
+        indice.construir()
+        return indice
 
     def procesar_entrada(self, texto: str, usuario_id: str = 'anonimo', 
-                        contexto: str = 'general') -> List[Sugerencia]:
-        """Método principal: procesa entrada y genera sugerencias"""
-        inicio = datetime.now()
+                        contexto: str = 'general', sesion_id: Optional[str] = None) -> List[Sugerencia]:
+        """Método principal: procesa entrada y genera sugerencias
+
+        Con sesion_id el texto se procesa de forma incremental: solo se tokeniza
+        y analiza la parte que cambió desde la petición anterior de la sesión
+        """
+        inicio = time.perf_counter_ns()
+        plazo = Plazo(self.config['tiempo_limite_ms'])
+        medir = self.instrumentacion.medir
+        self.instrumentacion.iniciar_peticion()
 
         try:
-            entrada_procesada = self._procesar_sensores(texto, usuario_id, contexto)
-            candidatos = self._razonamiento_fol(entrada_procesada)
-            sugerencias = self._generar_sugerencias(candidatos, entrada_procesada)
+            with medir('procesar_sensores'):
+                if sesion_id is None:
+                    entrada_procesada = self._procesar_sensores(texto, usuario_id, contexto)
+                else:
+                    entrada_procesada = self._procesar_sensores_sesion(texto, usuario_id, contexto, sesion_id)
+            contexto = entrada_procesada['contexto']
+
+            sugerencias, desde_cache = self._resolver_entrada(entrada_procesada, {}, {}, plazo)
 
-            tiempo_procesamiento = (datetime.now() - inicio).total_seconds() * 1000
-            self._registrar_metricas('tiempo_respuesta', tiempo_procesamiento)
+            tiempo_procesamiento = self._finalizar_medicion(inicio, contexto)
+            self.ultima_prediccion = (tiempo_procesamiento, time.time())
 
-            logger.info(f"Generadas {len(sugerencias)} sugerencias en {tiempo_procesamiento:.1f}ms")
+            if desde_cache:
+                logger.debug(f"Sugerencias desde caché en {tiempo_procesamiento:.1f}ms")
+            else:
+                logger.info(f"Generadas {len(sugerencias)} sugerencias en {tiempo_procesamiento:.1f}ms")
 
             return sugerencias
 
         except Exception as e:
+            self._finalizar_medicion(inicio, contexto)
             logger.error(f"Error procesando entrada: {e}")
             return []
 
-    def _procesar_sensores(self, texto: str, usuario_id: str, contexto: str) -> Dict:
-        """Procesa información de sensores"""
-        palabras = texto.lower().split()
+    def procesar_lote(self, peticiones: List[Dict]) -> List[Dict]:
+        """Procesa un lote de peticiones {texto, usuario_id, contexto} en orden
+
+        Las peticiones con la misma ventana, prefijo, contexto y usuario comparten
+        una sola búsqueda, y el modelo por usuario y los candidatos por contexto
+        se consultan una vez por lote. Cada resultado es {'sugerencias': [...]} o
+        {'error': mensaje}; el error de un elemento no afecta a los demás
+        """
+        resultados: List[Optional[Dict]] = [None] * len(peticiones)
+        grupos: Dict[Tuple, List[int]] = {}
+        entradas: Dict[Tuple, Dict] = {}
+
+        for indice, peticion in enumerate(peticiones):
+            try:
+                texto = peticion.get('texto') if isinstance(peticion, dict) else None
+                if not isinstance(texto, str):
+                    raise ValueError('Texto requerido')
+                if len(texto) > self.config['max_caracteres_entrada']:
+                    raise ValueError(f"El texto admite como máximo {self.config['max_caracteres_entrada']} caracteres")
+
+                usuario_id = peticion.get('usuario_id', 'anonimo')
+                if isinstance(usuario_id, bool) or not isinstance(usuario_id, (str, int)) or usuario_id == '':
+                    raise ValueError('usuario_id debe ser un texto o un número')
+                usuario_id = str(usuario_id)
+
+                contexto = peticion.get('contexto', 'general')
+                if not isinstance(contexto, str) or not contexto.strip():
+                    raise ValueError('contexto debe ser un texto no vacío')
+
+                entrada = self._procesar_sensores(texto, usuario_id, contexto.strip())
+            except Exception as e:
+                resultados[indice] = {'error': str(e)}
+                continue
 
-        contexto_detectado = self._detectar_contexto(texto)
+            clave = (
+                self._clave_ventana(entrada),
+                entrada['prefijo'],
+                entrada['contexto'],
+                usuario_id
+            )
+            grupos.setdefault(clave, []).append(indice)
+            entradas.setdefault(clave, entrada)
+
+        # Se recorre por contexto y usuario para reutilizar las consultas compartidas
+        modelos: Dict[str, ModeloUsuario] = {}
+        contextuales: Dict[str, np.ndarray] = {}
+        for clave in sorted(grupos, key=lambda c: (str(c[2]), str(c[3]))):
+            inicio = time.perf_counter_ns()
+            self.instrumentacion.iniciar_peticion()
+
+            try:
+                sugerencias, _ = self._resolver_entrada(entradas[clave], modelos, contextuales)
+                resultado = {'sugerencias': sugerencias}
+            except Exception as e:
+                logger.error(f"Error procesando elemento del lote: {e}")
+                resultado = {'error': str(e)}
+
+            tiempo_procesamiento = self._finalizar_medicion(inicio, clave[2])
+            if 'error' not in resultado:
+                self.ultima_prediccion = (tiempo_procesamiento, time.time())
+            for indice in grupos[clave]:
+                resultados[indice] = resultado
+
+        self._registrar_metricas('elementos_lote', len(peticiones))
+        logger.info(f"Lote de {len(peticiones)} elementos resuelto con {len(grupos)} búsquedas")
+
+        return resultados
+
+    def _resolver_entrada(self, entrada_procesada: Dict, modelos: Dict[str, ModeloUsuario],
+                          contextuales: Dict[str, np.ndarray],
+                          plazo: Optional[Plazo] = None) -> Tuple[List[Sugerencia], bool]:
+        """Sugerencias para una entrada ya procesada e indicador de acierto en caché
+
+        modelos y contextuales guardan las consultas por usuario y por contexto
+        para reutilizarlas entre los elementos de un lote. Con plazo, las etapas
+        opcionales se omiten cuando solo queda la reserva de la búsqueda y la
+        respuesta se marca con metadata['degradada'] (y no se guarda en caché)
+        """
+        medir = self.instrumentacion.medir
+        degradada = False
+        reserva_ms = plazo.limite_ms * FRACCION_RESERVA_BUSQUEDA if plazo is not None else 0.0
+
+        clave_cache = self._clave_cache(entrada_procesada)
+        if clave_cache is not None:
+            sugerencias = self.cache_sugerencias.obtener(clave_cache)
+            if sugerencias is not None:
+                return list(sugerencias), True
+
+        usuario_id = entrada_procesada['usuario_id']
+        if usuario_id not in modelos:
+            if plazo is None or plazo.permite(reserva_ms):
+                with medir('modelo_usuario'):
+                    modelos[usuario_id] = self.modelos_usuario.obtener(usuario_id)
+            else:
+                degradada = True
+                self._registrar_metricas('modelo_usuario_omitido', 1)
+        entrada_procesada['modelo_usuario'] = modelos.get(usuario_id)
+
+        if plazo is None or plazo.permite(reserva_ms):
+            with medir('razonamiento_fol'):
+                candidatos = self._razonamiento_fol(
+                    entrada_procesada, contextuales, self._limite_etapa(plazo, reserva_ms)
+                )
+        else:
+            candidatos = []
+            degradada = True
+            self._registrar_metricas('fol_omitido', 1)
+
+        with medir('buscar_mejores_sugerencias'):
+            sugerencias = self._generar_sugerencias(candidatos, entrada_procesada, plazo)
+
+        if any(sugerencia.metadata.get('degradada') for sugerencia in sugerencias):
+            degradada = True
+            self._registrar_metricas('busquedas_truncadas', 1)
+
+        if plazo is not None and plazo.vencido():
+            self._registrar_metricas('plazos_vencidos', 1)
+
+        if degradada:
+            for sugerencia in sugerencias:
+                sugerencia.metadata['degradada'] = True
+            self._registrar_metricas('respuestas_degradadas', 1)
+        elif clave_cache is not None:
+            self.cache_sugerencias.guardar(clave_cache, list(sugerencias))
+
+        return sugerencias, False
+
+    @staticmethod
+    def _limite_etapa(plazo: Optional[Plazo], reserva_ms: float) -> Optional[float]:
+        """Tiempo máximo para una consulta de una etapa opcional, respetando la reserva"""
+        if plazo is None:
+            return None
+        return plazo.restante_ms() - reserva_ms
+
+    def _finalizar_medicion(self, inicio_ns: int, contexto: str) -> float:
+        """Cierra la medición de la petición y devuelve su duración en ms"""
+        total_ns = time.perf_counter_ns() - inicio_ns
+        self.instrumentacion.finalizar_peticion(contexto, total_ns)
+
+        tiempo_procesamiento = total_ns / 1e6
+        self._registrar_metricas('tiempo_respuesta', tiempo_procesamiento)
+        self._registrar_metricas('peticiones', 1)
+        return tiempo_procesamiento
+
+    def _procesar_sensores(self, texto: str, usuario_id: str, contexto: str) -> Dict:
+        """Procesa información de sensores
+
+        Solo se analiza la cola del texto: las últimas ventana_analisis_tokens
+        palabras generan candidatos y correcciones, y el contexto sale de las
+        últimas ventana_contexto_tokens
+        """
+        tokens = tokenizar(self._cola_texto(texto))
+        palabras = tokens[-self.config['ventana_analisis_tokens']:]
+        prefijo = prefijo_en_curso(texto)
+
+        with self.instrumentacion.medir('detectar_contexto'):
+            contexto_detectado, indicadores = self._detectar_contexto(tokens)
         if contexto == 'general':
             contexto = contexto_detectado
 
-        historial = self._obtener_historial_usuario(usuario_id)
-
+        # El modelo del usuario se consulta solo si la caché no resuelve la petición
         return {
             'texto_original': texto,
             'palabras': palabras,
+            'ids': self.base_conocimiento.ids_texto(palabras),
+            'prefijo': prefijo,
             'usuario_id': usuario_id,
             'contexto': contexto,
-            'historial_usuario': historial,
+            'indicadores_contexto': indicadores,
             'timestamp': datetime.now()
         }
 
-    def _detectar_contexto(self, texto: str) -> str:
-        """Detecta contexto automáticamente"""
-        texto_lower = texto.lower()
+    def _procesar_sensores_sesion(self, texto: str, usuario_id: str, contexto: str,
+                                  sesion_id: str) -> Dict:
+        """Como _procesar_sensores(), reprocesando solo la cola que cambió en la sesión
+
+        Las correcciones y los contextos de cada token ya vienen calculados de
+        la sesión; se usan las mismas ventanas finales que sin sesión. Las
+        palabras terminadas desde la última petición se aprenden en el modelo
+        del usuario
+        """
+        sesion = self.sesiones.obtener(usuario_id, sesion_id)
+
+        with sesion.lock:
+            with self.instrumentacion.medir('actualizar_sesion'):
+                reprocesados = sesion.actualizar(
+                    texto, self.detector_contexto, self.base_conocimiento.sugerir_correccion, VOCABULARIO,
+                    self.base_conocimiento.palabra_conocida
+                )
+            tokens = sesion.tokens[-self.config['ventana_analisis_tokens']:]
+            recientes = sesion.tokens[-self.config['ventana_contexto_tokens']:]
+            previo, aprendidos = sesion.por_aprender(VOCABULARIO)
+        self._registrar_metricas('tokens_reprocesados', reprocesados)
+
+        # Las palabras que el usuario termina de escribir alimentan su modelo
+        if aprendidos:
+            self.modelos_usuario.aprender(usuario_id, aprendidos, previo=previo)
+            self._invalidar_cache_usuario(usuario_id)
+
+        correcciones = list(dict.fromkeys(t.correccion_id for t in tokens if t.correccion_id >= 0))
+        with self.instrumentacion.medir('detectar_contexto'):
+            indicadores = self.detector_contexto.ponderar(
+                [t.contextos for t in recientes], self.config['decaimiento_contexto']
+            )
+        contexto_detectado = self.detector_contexto.elegir(indicadores)
+        if contexto == 'general':
+            contexto = contexto_detectado
 
-        formal_indicators = ['estimado', 'cordialmente', 'atentamente', 'señor', 'señora']
-        if any(indicator in texto_lower for indicator in formal_indicators):
-            return 'formal'
+        return {
+            'texto_original': texto,
+            'palabras': [token.palabra for token in tokens],
+            'ids': np.array([token.palabra_id for token in tokens], dtype=np.int32),
+            'correcciones': correcciones,
+            'prefijo': prefijo_en_curso(texto),
+            'usuario_id': usuario_id,
+            'contexto': contexto,
+            'indicadores_contexto': indicadores,
+            'timestamp': datetime.now()
+        }
 
-        informal_indicators = ['parce', 'chévere', 'bacano', 'jaja', 'lol']
-        if any(indicator in texto_lower for indicator in informal_indicators):
-            return 'informal'
+    def _clave_cache(self, entrada: Dict) -> Optional[Tuple]:
+        """Clave de caché: ventana final de tokens, contexto resuelto, usuario y versiones del usuario y de los pesos
 
-        academic_indicators = ['análisis', 'investigación', 'metodología', 'conclusión']
-        if any(indicator in texto_lower for indicator in academic_indicators):
-            return 'academico'
+        El ranking es personal (preferencias y modelo del usuario): la versión
+        sola no distingue a dos usuarios con la misma cantidad de cambios
+        """
+        if self.cache_sugerencias is None:
+            return None
 
-        return 'general'
+        usuario_id = entrada['usuario_id']
+        return (
+            self._clave_ventana(entrada),
+            entrada['prefijo'],
+            entrada['contexto'],
+            usuario_id,
+            self._versiones_usuario.get(usuario_id, 0),
+            self.aprendizaje.pesos.version
+        )
 
-    def _razonamiento_fol(self, entrada: Dict) -> List[str]:
-        """Aplicar razonamiento FOL para generar candidatos"""
+    def _clave_ventana(self, entrada: Dict) -> Tuple:
+        """Ventana final de tokens como tupla de ids (o de textos si alguno no tiene id)"""
+        ventana = self.config['ventana_tokens']
+        ids = entrada['ids'][-ventana:]
+        if len(ids) and ids.min() < 0:
+            return tuple(entrada['palabras'][-ventana:])
+        return tuple(ids.tolist())
+
+    def _invalidar_cache_usuario(self, usuario_id: str):
+        """Invalida las sugerencias en caché que dependen del modelo del usuario"""
+        self._versiones_usuario[usuario_id] += 1
+
+    def _impulsos_publicados(self, ids: Set[int]):
+        """Invalida las sugerencias en caché que contienen palabras con impulso nuevo
+
+        Los impulsos no forman parte de la versión de pesos de la clave: solo
+        caen las entradas afectadas, no toda la caché
+        """
+        if self.cache_sugerencias is not None:
+            self.cache_sugerencias.invalidar_palabras(set(VOCABULARIO.palabras(sorted(ids))))
+
+    def _cola_texto(self, texto: str) -> str:
+        """Últimos caracteres_analisis caracteres del texto, sin la palabra cortada al inicio"""
+        return texto[inicio_cola(texto, self.config['caracteres_analisis']):]
+
+    def _detectar_contexto(self, palabras: List[str]) -> Tuple[str, Dict[str, float]]:
+        """Detecta contexto con los indicadores de las últimas palabras ponderados por recencia"""
+        resumen = self.detector_contexto.resumir(
+            palabras[-self.config['ventana_contexto_tokens']:], self.config['decaimiento_contexto']
+        )
+        return self.detector_contexto.elegir(resumen), resumen
+
+    def _cargar_axiomas(self) -> List[str]:
+        """Axiomas propios más los de flujo.JSON, sin repetir"""
+        axiomas = list(AXIOMAS_FOL)
+        ruta_flujo = self.config.get('ruta_flujo')
+        if ruta_flujo and os.path.exists(ruta_flujo):
+            axiomas.extend(cargar_axiomas_flujo(ruta_flujo))
+        return list(dict.fromkeys(axiomas))
+
+    def _cargar_pesos_heuristica(self) -> Tuple[float, ...]:
+        """Pesos iniciales de la heurística: los de flujo.JSON si están"""
+        ruta_flujo = self.config.get('ruta_flujo')
+        if ruta_flujo and os.path.exists(ruta_flujo):
+            pesos = cargar_pesos_flujo(ruta_flujo)
+            if pesos:
+                return pesos
+        return PESOS_HEURISTICA_INICIALES
+
+    def _construir_detector_contexto(self) -> DetectorContexto:
+        """Compila los indicadores propios y las reglas de flujo.JSON en el autómata"""
+        detector = DetectorContexto()
+
+        for contexto, indicadores in INDICADORES_CONTEXTO.items():
+            for indicador in indicadores:
+                detector.agregar(indicador, contexto)
+
+        ruta_flujo = self.config.get('ruta_flujo')
+        if ruta_flujo and os.path.exists(ruta_flujo):
+            for indicador, contexto in cargar_reglas_flujo(ruta_flujo):
+                detector.agregar(indicador, contexto)
+
+        detector.construir()
+        return detector
+
+    def _razonamiento_fol(self, entrada: Dict,
+                          contextuales: Optional[Dict[str, np.ndarray]] = None,
+                          limite_ms: Optional[float] = None) -> List[int]:
+        """Aplicar razonamiento FOL para generar candidatos (ids del vocabulario global)"""
         palabras = entrada['palabras']
         contexto = entrada['contexto']
         usuario_id = entrada['usuario_id']
 
-        candidatos = []
-
-        for palabra in palabras:
-            if self.base_conocimiento._regla_correccion_tildes(palabra):
-                correccion = self.base_conocimiento.corpus_colombiano['correcciones_frecuentes'].get(palabra)
+        if 'correcciones' in entrada:
+            # Ya verificadas por la sesión al procesar cada token
+            candidatos = list(entrada['correcciones'])
+        else:
+            candidatos = []
+            for palabra in palabras:
+                correccion = self.base_conocimiento.sugerir_correccion(palabra)
                 if correccion:
-                    candidatos.append(correccion)
-
-        candidatos_contextuales = self._obtener_candidatos_contextuales(contexto)
-        for candidato in candidatos_contextuales:
-            if self.base_conocimiento._regla_sugerencia_basica(usuario_id, entrada['texto_original'], candidato, contexto):
-                candidatos.append(candidato)
+                    candidatos.append(VOCABULARIO.id(correccion))
+
+        if contextuales is None:
+            contextuales = {}
+        if contexto not in contextuales:
+            with self.instrumentacion.medir('obtener_candidatos_contextuales'):
+                contextuales[contexto] = VOCABULARIO.ids(self._obtener_candidatos_contextuales(contexto, limite_ms))
+        candidatos_contextuales = contextuales[contexto]
+        aceptados = self.base_conocimiento.filtrar_sugerencia_basica(
+            usuario_id, entrada['texto_original'], candidatos_contextuales, contexto
+        )
+        candidatos.extend(candidatos_contextuales[aceptados].tolist())
 
-        return list(set(candidatos))
+        return list(dict.fromkeys(candidatos))
 
-    def _obtener_candidatos_contextuales(self, contexto: str) -> List[str]:
+    def _obtener_candidatos_contextuales(self, contexto: str,
+                                         limite_ms: Optional[float] = None) -> List[str]:
         """Obtiene candidatos según contexto"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            filas = self.bd.consultar(SQL_CANDIDATOS_CONTEXTO, (contexto,), limite_ms)
 
-            cursor.execute("""
-                SELECT palabra FROM palabras 
-                WHERE contexto = ? OR contexto = 'general'
-                ORDER BY frecuencia DESC
-                LIMIT 20
-            """, (contexto,))
-
-            candidatos = [row[0] for row in cursor.fetchall()]
-            conn.close()
-
-            return candidatos
+            return [row[0] for row in filas]
         except:
             return ['que', 'de', 'la', 'en', 'el', 'y', 'con']
 
-    def _generar_sugerencias(self, candidatos: List[str], entrada: Dict) -> List[Sugerencia]:
+    def _generar_sugerencias(self, candidatos: List[int], entrada: Dict,
+                             plazo: Optional[Plazo] = None) -> List[Sugerencia]:
         """Genera sugerencias finales usando A*"""
         return self.algoritmo_busqueda.buscar_mejores_sugerencias(
             entrada['contexto'], 
-            entrada['palabras'],
-            self.config['max_sugerencias']
+            entrada['palabras'][-self.config['ventana_tokens']:],
+            self.config['max_sugerencias'],
+            entrada.get('prefijo', ''),
+            plazo,
+            entrada['ids'][-self.config['ventana_tokens']:],
+            entrada['usuario_id'],
+            entrada.get('modelo_usuario')
         )
 
-    def _obtener_historial_usuario(self, usuario_id: str) -> List[str]:
-        """Obtiene historial del usuario"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+    def registrar_feedback(self, usuario_id: str, sugerencia: str, accion: str,
+                           contexto: str = 'general') -> bool:
+        """Registra feedback del usuario para aprendizaje
 
-            cursor.execute("""
-                SELECT texto_entrada FROM interacciones 
-                WHERE usuario_id = ?
-                ORDER BY timestamp DESC
-                LIMIT 10
-            """, (usuario_id,))
+        La escritura en la base de datos es asíncrona; devuelve False si la cola
+        de feedback está llena y el evento no se pudo encolar
+        """
+        encolado = self.escritor_feedback.encolar(usuario_id, sugerencia, accion, contexto)
+        if not encolado:
+            logger.warning(f"Cola de feedback llena, evento descartado: {usuario_id} {accion}")
+            return False
 
-            historial = [row[0] for row in cursor.fetchall()]
-            conn.close()
+        # Una sugerencia que el agente no conoce no tiene preferencias ni pesos que ajustar
+        palabra_id = int(self.base_conocimiento.ids_texto([sugerencia])[0])
+        if palabra_id >= 0:
+            if self.base_conocimiento._regla_aprendizaje(usuario_id, palabra_id, accion):
+                self._invalidar_cache_usuario(usuario_id)
 
-            return historial
-        except:
-            return []
-
-    def registrar_feedback(self, usuario_id: str, sugerencia: str, accion: str, contexto: str = 'general'):
-        """Registra feedback del usuario para aprendizaje"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                INSERT INTO interacciones (usuario_id, sugerencia_mostrada, accion, contexto)
-                VALUES (?, ?, ?, ?)
-            """, (usuario_id, sugerencia, accion, contexto))
-
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            logger.error(f"Error registrando feedback: {e}")
-
-        self.base_conocimiento._regla_aprendizaje(usuario_id, sugerencia, accion)
+            # Nodo aprendizaje_online: incrementar_peso / disminuir_peso en segundo plano
+            self.aprendizaje.encolar(palabra_id, accion == 'acepta',
+                                     self.algoritmo_busqueda.rasgos_heuristica(palabra_id, contexto))
 
         if accion == 'acepta':
+            # Lo aceptado pasa al modelo del usuario: sus palabras sí se internan
+            self.modelos_usuario.aprender(usuario_id, VOCABULARIO.ids(tokenizar(sugerencia)), PESO_ACEPTACION_MODELO)
+            self._invalidar_cache_usuario(usuario_id)
             self._registrar_metricas('sugerencias_aceptadas', 1)
         else:
             self._registrar_metricas('sugerencias_rechazadas', 1)
 
         logger.info(f"Feedback registrado: {usuario_id} {accion} '{sugerencia}'")
+        return True
 
     def _registrar_metricas(self, metrica: str, valor: float):
         """Registra métricas del sistema"""
@@ -541,28 +1525,35 @@ class AgentePredictivo:
     def obtener_metricas_rendimiento(self) -> Dict:
         """Obtiene métricas de rendimiento del agente"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                SELECT COUNT(*) as total, 
-                       SUM(CASE WHEN accion = 'acepta' THEN 1 ELSE 0 END) as aceptadas
-                FROM interacciones
-                WHERE timestamp >= date('now', '-7 days')
-            """)
+            result = self.bd.consultar_uno(SQL_METRICAS_SEMANA)
 
-            result = cursor.fetchone()
             total, aceptadas = result if result else (0, 0)
             acceptance_rate = (aceptadas / total * 100) if total > 0 else 0
 
-            conn.close()
-
             return {
                 'acceptance_rate': round(acceptance_rate, 2),
-                'tiempo_respuesta_promedio_ms': round(self.metricas.get('tiempo_respuesta', 0) / max(1, total), 2),
+                'tiempo_respuesta_promedio_ms': round(
+                    self.metricas.get('tiempo_respuesta', 0) / max(1, self.metricas.get('peticiones', 0)), 2
+                ),
                 'total_interacciones': total,
                 'kss_estimado': round(acceptance_rate * 0.4, 2),
                 'precision_estimada': round(acceptance_rate * 0.85, 2),
+                'cache': self.cache_sugerencias.estadisticas() if self.cache_sugerencias else None,
+                'feedback': self.escritor_feedback.estadisticas(),
+                'presupuesto_ms': self.config['tiempo_limite_ms'],
+                'plazos': {
+                    'vencidos': int(self.metricas.get('plazos_vencidos', 0)),
+                    'respuestas_degradadas': int(self.metricas.get('respuestas_degradadas', 0)),
+                    'modelo_usuario_omitido': int(self.metricas.get('modelo_usuario_omitido', 0)),
+                    'fol_omitido': int(self.metricas.get('fol_omitido', 0)),
+                    'busquedas_truncadas': int(self.metricas.get('busquedas_truncadas', 0))
+                },
+                'preferencias': self.base_conocimiento.preferencias.estadisticas(),
+                'modelos_usuario': self.modelos_usuario.estadisticas(),
+                'aprendizaje_online': self.aprendizaje.estadisticas(),
+                'sesiones': dict(self.sesiones.estadisticas(),
+                                 tokens_reprocesados=int(self.metricas.get('tokens_reprocesados', 0))),
+                'latencias_por_etapa': self.instrumentacion.resumen(),
                 'estado_sistema': 'operativo'
             }
         except:
@@ -575,6 +1566,15 @@ class AgentePredictivo:
                 'estado_sistema': 'operativo'
             }
 
+    def cerrar(self):
+        """Libera los recursos del agente (escribe el feedback pendiente antes de cerrar)"""
+        self.escritor_feedback.detener()
+        self.aprendizaje.detener()
+        self.modelos_usuario.detener()
+        self.bd.cerrar()
+        if self.lexicon is not None:
+            self.lexicon.cerrar()
+
 def main():
     """Función principal para pruebas del agente"""
     agente = AgentePredictivo()
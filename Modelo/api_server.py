@@ -5,11 +5,14 @@ Proporciona endpoints HTTP para integración con aplicaciones
 
 from flask import Flask, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+import atexit
 import json
 import os
 import logging
 from datetime import datetime
 from agente_core import AgentePredictivo
+from monitor_salud import MonitorSalud
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -21,14 +24,48 @@ app = Flask(__name__,
            static_folder='../web')
 CORS(app)
 
-# Instancia global del agente
+# Instancia global del agente y su monitor de salud
 agente = None
+monitor = None
+
+# Máximo de elementos aceptados por /api/predict/batch
+MAX_ELEMENTOS_LOTE = 5000
+
+# Tamaño máximo del cuerpo: global (lotes) y de /api/predict, que se rechaza antes de leerlo
+MAX_BYTES_PETICION = 8 * 1024 * 1024
+MAX_BYTES_PREDICCION = 256 * 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_BYTES_PETICION
+
+def respuesta_demasiado_grande(mensaje):
+    """Respuesta 413 en el formato de errores de la API"""
+    return jsonify({
+        'error': mensaje,
+        'status': 'error',
+        'code': 413
+    }), 413
+
+def serializar_sugerencias(sugerencias):
+    """Convierte sugerencias del agente a diccionarios JSON"""
+    return [
+        {
+            'texto': sug.texto,
+            'confianza': round(sug.confianza, 3),
+            'tipo': sug.tipo,
+            'contexto': sug.contexto,
+            'metadata': sug.metadata
+        } for sug in sugerencias
+    ]
 
 def inicializar_agente():
     """Inicializa el agente predictivo"""
-    global agente
+    global agente, monitor
     try:
         agente = AgentePredictivo()
+        atexit.register(agente.cerrar)
+
+        monitor = MonitorSalud(agente)
+        monitor.iniciar()
+        atexit.register(monitor.detener)
         logger.info("Agente inicializado correctamente")
         return True
     except Exception as e:
@@ -54,9 +91,17 @@ def predict():
     {
         "texto": "Hola parce, como",
         "usuario_id": "user123",
-        "contexto": "informal"
+        "contexto": "informal",
+        "sesion_id": "doc-42"
     }
+
+    Con sesion_id (opcional) el agente reprocesa solo lo que cambió desde la
+    petición anterior de la misma sesión. Cuerpos de más de MAX_BYTES_PREDICCION
+    bytes o textos de más de max_caracteres_entrada caracteres se rechazan con 413
     """
+    if request.content_length is not None and request.content_length > MAX_BYTES_PREDICCION:
+        return respuesta_demasiado_grande(f'El cuerpo admite como máximo {MAX_BYTES_PREDICCION} bytes')
+
     try:
         data = request.get_json()
 
@@ -67,30 +112,32 @@ def predict():
             }), 400
 
         texto = data['texto']
+        max_caracteres = agente.config['max_caracteres_entrada']
+        if isinstance(texto, str) and len(texto) > max_caracteres:
+            return respuesta_demasiado_grande(f'El texto admite como máximo {max_caracteres} caracteres')
+
         usuario_id = data.get('usuario_id', 'anonimo')
         contexto = data.get('contexto', 'general')
+        sesion_id = data.get('sesion_id')
+        if sesion_id is not None:
+            sesion_id = str(sesion_id)
 
         # Procesar con el agente
-        sugerencias = agente.procesar_entrada(texto, usuario_id, contexto)
+        sugerencias = agente.procesar_entrada(texto, usuario_id, contexto, sesion_id)
 
         # Formatear respuesta
-        sugerencias_json = []
-        for sug in sugerencias:
-            sugerencias_json.append({
-                'texto': sug.texto,
-                'confianza': round(sug.confianza, 3),
-                'tipo': sug.tipo,
-                'contexto': sug.contexto,
-                'metadata': sug.metadata
-            })
+        sugerencias_json = serializar_sugerencias(sugerencias)
 
         return jsonify({
             'sugerencias': sugerencias_json,
             'total': len(sugerencias_json),
+            'degradado': any(sug.metadata.get('degradada') for sug in sugerencias),
             'tiempo_procesamiento': 'calculado_en_cliente',
             'status': 'success'
         })
 
+    except RequestEntityTooLarge:
+        return respuesta_demasiado_grande(f'El cuerpo admite como máximo {MAX_BYTES_PETICION} bytes')
     except Exception as e:
         logger.error(f"Error en /api/predict: {e}")
         return jsonify({
@@ -98,6 +145,71 @@ def predict():
             'status': 'error'
         }), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Endpoint de sugerencias para muchos textos en una sola petición
+
+    Body JSON (lista directa o dentro de "peticiones"):
+    {
+        "peticiones": [
+            {"texto": "Hola parce, como", "usuario_id": "user123", "contexto": "informal"},
+            {"texto": "Estimado señor", "usuario_id": "user123", "contexto": "formal"}
+        ]
+    }
+
+    Los resultados se devuelven en el mismo orden; un elemento inválido
+    produce un resultado con status "error" sin afectar a los demás
+    """
+    try:
+        data = request.get_json()
+        peticiones = data.get('peticiones') if isinstance(data, dict) else data
+
+        if not isinstance(peticiones, list):
+            return jsonify({
+                'error': 'Se requiere una lista de peticiones',
+                'status': 'error'
+            }), 400
+
+        if len(peticiones) > MAX_ELEMENTOS_LOTE:
+            return jsonify({
+                'error': f'El lote admite como máximo {MAX_ELEMENTOS_LOTE} elementos',
+                'status': 'error'
+            }), 413
+
+        resultados = []
+        for indice, resultado in enumerate(agente.procesar_lote(peticiones)):
+            if 'error' in resultado:
+                resultados.append({
+                    'indice': indice,
+                    'error': resultado['error'],
+                    'status': 'error'
+                })
+            else:
+                sugerencias_json = serializar_sugerencias(resultado['sugerencias'])
+                resultados.append({
+                    'indice': indice,
+                    'sugerencias': sugerencias_json,
+                    'total': len(sugerencias_json),
+                    'status': 'success'
+                })
+
+        return jsonify({
+            'resultados': resultados,
+            'total': len(resultados),
+            'errores': sum(1 for resultado in resultados if resultado['status'] == 'error'),
+            'status': 'success'
+        })
+
+    except RequestEntityTooLarge:
+        return respuesta_demasiado_grande(f'El cuerpo admite como máximo {MAX_BYTES_PETICION} bytes')
+    except Exception as e:
+        logger.error(f"Error en /api/predict/batch: {e}")
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
 @app.route('/api/feedback', methods=['POST'])
 def feedback():
     """
@@ -134,8 +246,14 @@ def feedback():
                 'status': 'error'
             }), 400
 
-        # Registrar feedback
-        agente.registrar_feedback(usuario_id, sugerencia, accion, contexto)
+        # Registrar feedback (se encola y se escribe en segundo plano)
+        if not agente.registrar_feedback(usuario_id, sugerencia, accion, contexto):
+            respuesta = jsonify({
+                'error': 'Cola de feedback llena, reintente más tarde',
+                'status': 'error'
+            })
+            respuesta.headers['Retry-After'] = '1'
+            return respuesta, 503
 
         return jsonify({
             'mensaje': 'Feedback registrado exitosamente',
@@ -170,26 +288,40 @@ def metrics():
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    """Endpoint de health check"""
-    try:
-        # Verificar estado del agente
-        test_sugerencias = agente.procesar_entrada("test", "health_check", "general")
+    """Endpoint de health check (estado en caché del monitor, sin ejecutar predicciones)"""
+    estado = monitor.estado() if monitor is not None else {'listo': False, 'componentes': {}}
 
-        return jsonify({
-            'status': 'healthy',
-            'agente_operativo': True,
-            'version': '1.0.0',
-            'timestamp': datetime.now().isoformat()
-        })
+    return jsonify({
+        'status': 'healthy' if estado['listo'] else 'unhealthy',
+        'agente_operativo': estado['listo'],
+        'componentes': estado['componentes'],
+        'version': '1.0.0',
+        'timestamp': datetime.now().isoformat()
+    }), 200 if estado['listo'] else 503
+
+@app.route('/api/health/live', methods=['GET'])
+def health_live():
+    """Sonda de liveness: el proceso responde y el monitor sigue activo"""
+    vivo = monitor is not None and monitor.vivo()
 
-    except Exception as e:
-        logger.error(f"Error en health check: {e}")
-        return jsonify({
-            'status': 'unhealthy',
-            'agente_operativo': False,
-            'error': str(e),
-            'timestamp': datetime.now().isoformat()
-        }), 500
+    return jsonify({
+        'status': 'alive' if vivo else 'dead'
+    }), 200 if vivo else 503
+
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """Sonda de readiness: estado de los componentes según la última revisión"""
+    if monitor is None:
+        return jsonify({'status': 'not_ready', 'error': 'Agente no inicializado'}), 503
+
+    estado = monitor.estado()
+
+    return jsonify({
+        'status': 'ready' if estado['listo'] else 'not_ready',
+        'componentes': estado['componentes'],
+        'vigente': estado['vigente'],
+        'actualizado': estado['actualizado']
+    }), 200 if estado['listo'] else 503
 
 @app.route('/api/contexts', methods=['GET'])
 def contexts():
@@ -296,6 +428,11 @@ def not_found(error):
         'code': 404
     }), 404
 
+@app.errorhandler(413)
+def too_large(error):
+    """Manejo de errores 413 (cuerpo mayor que MAX_CONTENT_LENGTH)"""
+    return respuesta_demasiado_grande(f'El cuerpo admite como máximo {MAX_BYTES_PETICION} bytes')
+
 @app.errorhandler(500)
 def internal_error(error):
     """Manejo de errores 500"""
@@ -319,9 +456,12 @@ def main():
     print("  GET  /                    - Interfaz web principal")
     print("  GET  /demo                - Página de demostración")
     print("  POST /api/predict         - Obtener sugerencias")
+    print("  POST /api/predict/batch   - Sugerencias para un lote de textos")
     print("  POST /api/feedback        - Registrar feedback")
     print("  GET  /api/metrics         - Métricas del sistema")
     print("  GET  /api/health          - Health check")
+    print("  GET  /api/health/live     - Sonda de liveness")
+    print("  GET  /api/health/ready    - Sonda de readiness")
     print("  GET  /api/contexts        - Contextos soportados")
     print("  GET  /api/corpus/stats    - Estadísticas del corpus")
     print("  POST /api/test            - Pruebas del sistema")
@@ -0,0 +1,298 @@
+"""
+Aprendizaje online de pesos a partir del feedback (nodo aprendizaje_online de flujo.JSON)
+Cada aceptación o rechazo ajusta un impulso por palabra (incrementar_peso /
+disminuir_peso) y los pesos globales de la heurística (frecuencia, relevancia,
+gramática). Un hilo en segundo plano aplica los eventos por lotes sobre su
+copia privada y la publica cada cierto número de lotes o de segundos
+cambiando una sola referencia: los hilos de predicción leen self.pesos sin
+tomar ningún lock. Solo un cambio de la heurística sube la versión; los
+impulsos se avisan por palabra para no invalidar toda la caché
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Orden de los componentes de la heurística en el vector de pesos
+COMPONENTES_HEURISTICA = ('frecuencia', 'relevancia', 'gramatica')
+PESOS_HEURISTICA_INICIALES = (0.4, 0.3, 0.3)
+
+# Ningún componente puede quedar sin peso
+PESO_MINIMO = 0.05
+
+# Impulsos por debajo de este valor se eliminan de la tabla dispersa
+IMPULSO_MINIMO = 1e-9
+
+# Marcas de la cola: fin del hilo y publicación inmediata de lo pendiente
+_FIN = object()
+_PUBLICAR = object()
+
+# (id de palabra, acepta, rasgos de la heurística 0-100 en el orden de COMPONENTES_HEURISTICA)
+EventoAprendizaje = Tuple[int, bool, np.ndarray]
+
+class PesosAprendidos(NamedTuple):
+    """Instantánea inmutable de los pesos publicada a los lectores
+
+    Los impulsos son dispersos: ids_impulso ordenados y su valor en impulsos
+    """
+    version: int
+    heuristica: np.ndarray
+    ids_impulso: np.ndarray
+    impulsos: np.ndarray
+
+    def impulsos_de(self, ids: np.ndarray) -> np.ndarray:
+        """Impulso de cada id (0 para los que aún no tienen)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        resultado = np.zeros(len(ids), dtype=np.float64)
+        if not len(self.ids_impulso):
+            return resultado
+
+        posiciones = np.minimum(np.searchsorted(self.ids_impulso, ids), len(self.ids_impulso) - 1)
+        encontrados = self.ids_impulso[posiciones] == ids
+        resultado[encontrados] = self.impulsos[posiciones[encontrados]]
+        return resultado
+
+def _solo_lectura(arreglo: np.ndarray) -> np.ndarray:
+    """Marca el arreglo como inmutable antes de publicarlo"""
+    arreglo.setflags(write=False)
+    return arreglo
+
+def pesos_iniciales(heuristica: Sequence[float] = PESOS_HEURISTICA_INICIALES) -> PesosAprendidos:
+    """Pesos sin ningún evento aplicado"""
+    return PesosAprendidos(0, _solo_lectura(np.array(heuristica, dtype=np.float64)),
+                           _solo_lectura(np.zeros(0, dtype=np.int64)),
+                           _solo_lectura(np.zeros(0, dtype=np.float64)))
+
+def cargar_pesos_flujo(ruta: str) -> Optional[Tuple[float, ...]]:
+    """heuristic_weights de flujo.JSON en el orden de COMPONENTES_HEURISTICA"""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as archivo:
+            flujo = json.load(archivo)
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudieron leer los pesos de {ruta}: {e}")
+        return None
+
+    for nodo in flujo.get('components', []):
+        pesos = nodo.get('config', {}).get('heuristic_weights')
+        if pesos and all(componente in pesos for componente in COMPONENTES_HEURISTICA):
+            return tuple(float(pesos[componente]) for componente in COMPONENTES_HEURISTICA)
+    return None
+
+class AprendizajeOnline:
+    """Hilo que aprende pesos del feedback y los publica por intercambio de referencia"""
+
+    def __init__(self, heuristica: Sequence[float] = PESOS_HEURISTICA_INICIALES,
+                 tasa: float = 0.02, paso_impulso: float = 0.5, impulso_maximo: float = 5.0,
+                 capacidad: int = 10000, tamano_lote: int = 256,
+                 publicar_cada_lotes: int = 32, intervalo_publicacion_s: float = 1.0,
+                 tolerancia_heuristica: float = 0.01,
+                 al_publicar_impulsos: Optional[Callable[[Set[int]], None]] = None):
+        self.tasa = tasa
+        self.paso_impulso = paso_impulso
+        self.impulso_maximo = impulso_maximo
+        self.capacidad = capacidad
+        self.tamano_lote = tamano_lote
+        self.publicar_cada_lotes = publicar_cada_lotes
+        self.intervalo_publicacion_s = intervalo_publicacion_s
+        # La heurística publicada (y la versión) solo cambia si la privada se aleja más que esto
+        self.tolerancia_heuristica = tolerancia_heuristica
+        # Recibe los ids cuyo impulso cambió en cada publicación (la versión no cambia por ellos)
+        self.al_publicar_impulsos = al_publicar_impulsos
+
+        # Única referencia compartida: se reemplaza entera, nunca se modifica
+        self.pesos = pesos_iniciales(heuristica)
+        # Estado privado del hilo: se aplica aquí y se publica según el calendario
+        self._heuristica = self.pesos.heuristica.copy()
+        self._impulsos: Dict[int, float] = {}
+        self._cambiados: Set[int] = set()
+        self._lotes_sin_publicar = 0
+        # Media móvil de los rasgos: los eventos se comparan contra la sugerencia típica
+        self._media = np.full(len(COMPONENTES_HEURISTICA), 50.0)
+
+        self._cola: queue.Queue = queue.Queue(maxsize=capacidad)
+        self._hilo = threading.Thread(target=self._ejecutar, name='aprendizaje-online', daemon=True)
+        self._detenido = False
+
+        # Los contadores se actualizan desde los hilos de las peticiones y el de aprendizaje
+        self._lock = threading.Lock()
+        self.encolados = 0
+        self.rechazados = 0
+        self.aplicados = 0
+        self.publicaciones = 0
+
+    def iniciar(self):
+        """Arranca el hilo de aprendizaje"""
+        self._hilo.start()
+
+    def encolar(self, palabra_id: int, acepta: bool, rasgos: np.ndarray) -> bool:
+        """Encola un evento sin bloquear; devuelve False si la cola está llena"""
+        if self._detenido or palabra_id < 0:
+            return False
+        try:
+            self._cola.put_nowait((int(palabra_id), bool(acepta), np.asarray(rasgos, dtype=np.float64)))
+        except queue.Full:
+            with self._lock:
+                self.rechazados += 1
+            return False
+
+        with self._lock:
+            self.encolados += 1
+        return True
+
+    def _ejecutar(self):
+        """Bucle del hilo: aplica lo que haya en la cola y publica según el calendario"""
+        terminar = False
+        ultima_publicacion = time.monotonic()
+
+        while not terminar:
+            # Con cambios pendientes se espera solo hasta que toque publicar
+            espera = None
+            if self._lotes_sin_publicar:
+                espera = max(0.0, ultima_publicacion + self.intervalo_publicacion_s - time.monotonic())
+            try:
+                evento = self._cola.get(timeout=espera)
+            except queue.Empty:
+                evento = None
+
+            lote: List[EventoAprendizaje] = []
+            forzar = False
+            marcas = 0
+
+            while evento is not None:
+                if evento is _FIN or evento is _PUBLICAR:
+                    terminar = evento is _FIN
+                    forzar = True
+                    marcas += 1
+                    break
+
+                lote.append(evento)
+                if len(lote) >= self.tamano_lote:
+                    break
+                try:
+                    evento = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                if lote:
+                    self._aplicar(lote)
+                    with self._lock:
+                        self.aplicados += len(lote)
+                    self._lotes_sin_publicar += 1
+                if self._lotes_sin_publicar and (
+                        forzar or self._lotes_sin_publicar >= self.publicar_cada_lotes or
+                        time.monotonic() - ultima_publicacion >= self.intervalo_publicacion_s):
+                    self._publicar()
+                    ultima_publicacion = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error aplicando {len(lote)} eventos de aprendizaje: {e}")
+            finally:
+                for _ in range(len(lote) + marcas):
+                    self._cola.task_done()
+
+    def _aplicar(self, lote: List[EventoAprendizaje]):
+        """Aplica el lote al estado privado del hilo (lo publicado no se toca)
+
+        Una aceptación acerca la heurística a los componentes en los que la
+        palabra supera a la media y un rechazo la aleja; el vector se mantiene
+        con suma 1 para no cambiar la escala de h(n)
+        """
+        heuristica = self._heuristica
+        for palabra_id, acepta, rasgos in lote:
+            signo = 1.0 if acepta else -1.0
+            impulso = min(max(self._impulsos.get(palabra_id, 0.0) + signo * self.paso_impulso,
+                              -self.impulso_maximo), self.impulso_maximo)
+            if abs(impulso) < IMPULSO_MINIMO:
+                self._impulsos.pop(palabra_id, None)
+            else:
+                self._impulsos[palabra_id] = impulso
+            self._cambiados.add(palabra_id)
+
+            heuristica += self.tasa * signo * (rasgos - self._media) / 100.0
+            np.maximum(heuristica, PESO_MINIMO, out=heuristica)
+            heuristica /= heuristica.sum()
+            self._media += 0.05 * (rasgos - self._media)
+
+    def _publicar(self):
+        """Publica el estado privado
+
+        La heurística publicada y la versión (parte de la clave de la caché) solo
+        cambian cuando la privada se aleja de la publicada más que
+        tolerancia_heuristica en algún componente: un flujo constante de feedback
+        no invalida toda la caché en cada publicación
+        """
+        pesos = self.pesos
+        version = pesos.version
+        heuristica = pesos.heuristica
+        if np.abs(self._heuristica - heuristica).max() > self.tolerancia_heuristica:
+            version += 1
+            heuristica = _solo_lectura(self._heuristica.copy())
+
+        ids_impulso, impulsos = pesos.ids_impulso, pesos.impulsos
+        cambiados, self._cambiados = self._cambiados, set()
+        if cambiados:
+            ids_impulso = np.fromiter(sorted(self._impulsos), dtype=np.int64, count=len(self._impulsos))
+            impulsos = np.fromiter((self._impulsos[i] for i in ids_impulso.tolist()),
+                                   dtype=np.float64, count=len(ids_impulso))
+            _solo_lectura(ids_impulso)
+            _solo_lectura(impulsos)
+
+        self.pesos = PesosAprendidos(version, heuristica, ids_impulso, impulsos)
+        self._lotes_sin_publicar = 0
+        with self._lock:
+            self.publicaciones += 1
+
+        if cambiados and self.al_publicar_impulsos is not None:
+            try:
+                self.al_publicar_impulsos(cambiados)
+            except Exception as e:
+                logger.error(f"Error avisando {len(cambiados)} impulsos publicados: {e}")
+
+    def vaciar(self, timeout: float = 5.0) -> bool:
+        """Espera a que se apliquen y publiquen los eventos pendientes"""
+        limite = time.monotonic() + timeout
+        if self._hilo.is_alive():
+            try:
+                self._cola.put(_PUBLICAR, timeout=timeout)
+            except queue.Full:
+                return False
+        while self._cola.unfinished_tasks and time.monotonic() < limite:
+            time.sleep(0.005)
+        return not self._cola.unfinished_tasks
+
+    def detener(self, timeout: float = 5.0):
+        """Deja de aceptar eventos, aplica los pendientes y termina el hilo"""
+        if self._detenido:
+            return
+        self._detenido = True
+
+        if self._hilo.is_alive():
+            try:
+                self._cola.put(_FIN, timeout=timeout)
+            except queue.Full:
+                logger.warning("Cola de aprendizaje llena al detener; se descartan los eventos pendientes")
+                return
+            self._hilo.join(timeout)
+
+    def estadisticas(self) -> Dict:
+        """Pesos vigentes y contadores de eventos"""
+        pesos = self.pesos
+        with self._lock:
+            return {
+                'version': pesos.version,
+                'pesos_heuristica': {componente: round(float(peso), 4)
+                                     for componente, peso in zip(COMPONENTES_HEURISTICA, pesos.heuristica)},
+                'palabras_con_impulso': len(pesos.ids_impulso),
+                'pendientes': self._cola.qsize(),
+                'encolados': self.encolados,
+                'rechazados': self.rechazados,
+                'aplicados': self.aplicados,
+                'publicaciones': self.publicaciones
+            }
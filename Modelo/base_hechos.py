@@ -0,0 +1,211 @@
+"""
+Almacén compacto de hechos para la base de conocimiento FOL
+Los predicados unarios y las propiedades son conjuntos de bits sobre ids
+enteros (del vocabulario global o de constantes), así que evaluar una regla
+sobre todo un conjunto de candidatos son unas pocas operaciones AND. Las
+relaciones n-arias guardan sus argumentos en columnas int64 con un índice hash
+por posición, para consultar por cualquier argumento sin recorrer la relación
+"""
+
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_BITS = 64
+
+class ConjuntoBits:
+    """Conjunto de ids no negativos en bloques de 64 bits
+
+    Las escrituras toman un lock; las lecturas no: una ampliación publica el
+    nuevo arreglo ya copiado. version cambia con cada modificación
+    """
+
+    def __init__(self, capacidad: int = 1024):
+        self._bloques = np.zeros(max(1, -(-capacidad // _BITS)), dtype=np.uint64)
+        self._cantidad = 0
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def __len__(self) -> int:
+        return self._cantidad
+
+    def __contains__(self, elemento) -> bool:
+        if not isinstance(elemento, (int, np.integer)) or elemento < 0:
+            return False
+        bloques = self._bloques
+        bloque = int(elemento) // _BITS
+        return bloque < len(bloques) and bool((int(bloques[bloque]) >> (int(elemento) % _BITS)) & 1)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids().tolist())
+
+    def _asegurar(self, maximo: int):
+        """Amplía los bloques para que quepa el id maximo (con el lock tomado)"""
+        necesarios = maximo // _BITS + 1
+        if necesarios > len(self._bloques):
+            nuevos = np.zeros(max(necesarios, 2 * len(self._bloques)), dtype=np.uint64)
+            nuevos[:len(self._bloques)] = self._bloques
+            self._bloques = nuevos
+
+    def agregar(self, elemento: int):
+        """Agrega un id"""
+        self.agregar_varios([elemento])
+
+    def agregar_varios(self, elementos: Sequence[int]):
+        """Agrega varios ids con una sola operación sobre los bloques"""
+        ids = np.asarray(elementos, dtype=np.int64)
+        ids = ids[ids >= 0]
+        if not len(ids):
+            return
+
+        with self._lock:
+            self._asegurar(int(ids.max()))
+            np.bitwise_or.at(self._bloques, ids // _BITS,
+                             np.left_shift(np.uint64(1), (ids % _BITS).astype(np.uint64)))
+            self._cantidad = int(np.bitwise_count(self._bloques).sum())
+            self.version += 1
+
+    def descartar(self, elemento: int):
+        """Quita un id si está"""
+        with self._lock:
+            if elemento in self:
+                self._bloques[elemento // _BITS] &= ~np.uint64(1 << (elemento % _BITS))
+                self._cantidad -= 1
+                self.version += 1
+
+    def contiene(self, ids: np.ndarray) -> np.ndarray:
+        """Pertenencia de cada id de un arreglo (máscara booleana)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        bloques = self._bloques
+        dentro = (ids >= 0) & (ids < len(bloques) * _BITS)
+        resultado = np.zeros(len(ids), dtype=bool)
+
+        seleccion = ids[dentro]
+        bits = np.right_shift(bloques[seleccion // _BITS], (seleccion % _BITS).astype(np.uint64))
+        resultado[dentro] = (bits & np.uint64(1)).astype(bool)
+        return resultado
+
+    def ids(self) -> np.ndarray:
+        """Ids del conjunto en orden creciente"""
+        bits = np.unpackbits(self._bloques.view(np.uint8), bitorder='little')
+        return np.flatnonzero(bits)
+
+    def __and__(self, otro: 'ConjuntoBits') -> 'ConjuntoBits':
+        a, b = self._bloques, otro._bloques
+        largo = min(len(a), len(b))
+        return ConjuntoBits._desde_bloques(a[:largo] & b[:largo])
+
+    def __or__(self, otro: 'ConjuntoBits') -> 'ConjuntoBits':
+        a, b = self._bloques, otro._bloques
+        if len(a) < len(b):
+            a, b = b, a
+        bloques = a.copy()
+        bloques[:len(b)] |= b
+        return ConjuntoBits._desde_bloques(bloques)
+
+    @staticmethod
+    def _desde_bloques(bloques: np.ndarray) -> 'ConjuntoBits':
+        """Conjunto nuevo con los bloques dados"""
+        conjunto = ConjuntoBits(_BITS)
+        conjunto._bloques = bloques
+        conjunto._cantidad = int(np.bitwise_count(bloques).sum())
+        return conjunto
+
+class Relacion:
+    """Relación n-aria de ids con columnas int64 e índice hash por posición"""
+
+    def __init__(self, aridad: int, capacidad: int = 64):
+        self.aridad = aridad
+        self._columnas = np.zeros((aridad, capacidad), dtype=np.int64)
+        self._filas = 0
+        self._tuplas: Dict[Tuple[int, ...], int] = {}
+        self._indices: List[Dict[int, List[int]]] = [{} for _ in range(aridad)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._filas
+
+    def __contains__(self, tupla) -> bool:
+        return tuple(tupla) in self._tuplas
+
+    def agregar(self, *argumentos: int) -> bool:
+        """Agrega la tupla; False si ya estaba"""
+        if len(argumentos) != self.aridad:
+            raise ValueError(f"Se esperaban {self.aridad} argumentos, llegaron {len(argumentos)}")
+        tupla = tuple(int(argumento) for argumento in argumentos)
+
+        with self._lock:
+            if tupla in self._tuplas:
+                return False
+
+            fila = self._filas
+            if fila == self._columnas.shape[1]:
+                nuevas = np.zeros((self.aridad, 2 * fila), dtype=np.int64)
+                nuevas[:, :fila] = self._columnas[:, :fila]
+                self._columnas = nuevas
+
+            self._columnas[:, fila] = tupla
+            for posicion, valor in enumerate(tupla):
+                self._indices[posicion].setdefault(valor, []).append(fila)
+            self._tuplas[tupla] = fila
+            self._filas = fila + 1
+            return True
+
+    def quitar(self, *argumentos: int) -> bool:
+        """Quita la tupla (la última fila ocupa su lugar); False si no estaba"""
+        tupla = tuple(int(argumento) for argumento in argumentos)
+
+        with self._lock:
+            fila = self._tuplas.pop(tupla, None)
+            if fila is None:
+                return False
+
+            for posicion, valor in enumerate(tupla):
+                filas = self._indices[posicion][valor]
+                filas.remove(fila)
+                if not filas:
+                    del self._indices[posicion][valor]
+
+            ultima = self._filas - 1
+            if fila != ultima:
+                movida = tuple(self._columnas[:, ultima].tolist())
+                self._columnas[:, fila] = movida
+                for posicion, valor in enumerate(movida):
+                    filas = self._indices[posicion][valor]
+                    filas[filas.index(ultima)] = fila
+                self._tuplas[movida] = fila
+            self._filas = ultima
+            return True
+
+    def columna(self, posicion: int) -> np.ndarray:
+        """Valores de la posición dada en todas las filas"""
+        return self._columnas[posicion, :self._filas]
+
+    def consultar(self, patron: Sequence[Optional[int]]) -> np.ndarray:
+        """Filas que coinciden con el patrón (None en una posición acepta cualquier valor)
+
+        Se parte del índice de la posición ligada más selectiva y el resto se
+        filtra comparando columnas
+        """
+        ligadas = [(posicion, int(valor)) for posicion, valor in enumerate(patron) if valor is not None]
+        if not ligadas:
+            return np.arange(self._filas)
+
+        posicion, valor = min(ligadas, key=lambda p: len(self._indices[p[0]].get(p[1], ())))
+        filas = np.array(self._indices[posicion].get(valor, ()), dtype=np.int64)
+
+        columnas = self._columnas
+        for otra, otro_valor in ligadas:
+            if otra != posicion and len(filas):
+                filas = filas[columnas[otra, filas] == otro_valor]
+        return filas
+
+    def tuplas(self, patron: Sequence[Optional[int]]) -> List[Tuple[int, ...]]:
+        """Tuplas que coinciden con el patrón"""
+        filas = self.consultar(patron)
+        return list(zip(*self._columnas[:, filas].tolist())) if len(filas) else []
+
+    def valores(self, posicion: int, patron: Sequence[Optional[int]]) -> np.ndarray:
+        """Valores de una posición en las filas que coinciden con el patrón"""
+        return self._columnas[posicion, self.consultar(patron)]
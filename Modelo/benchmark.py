@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Benchmark reproducible del camino caliente del agente
+Genera un corpus sintético (semilla fija), simula flujos de pulsaciones y mide
+procesar_entrada, registrar_feedback y obtener_metricas_rendimiento.
+Cada escenario corre en un proceso nuevo contra una base de datos temporal,
+sin red. Uso:
+
+    python benchmark.py --tamanos 1000,100000,1000000 --interacciones 0,100000 \\
+        --salida resultados.json [--comparar resultados_anteriores.json]
+"""
+
+import argparse
+import concurrent.futures
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from typing import Callable, Dict, List
+
+SILABAS = [
+    'ba', 'be', 'ca', 'che', 'co', 'da', 'de', 'do', 'es', 'fa', 'ga', 'la', 'le', 'lo',
+    'ma', 'me', 'mo', 'na', 'no', 'pa', 'pe', 'po', 'que', 'ra', 're', 'ro', 'sa', 'se',
+    'ta', 'te', 'to', 'va', 've', 'ya', 'ción', 'mente', 'ñe', 'rí', 'tá', 'dó'
+]
+CONTEXTOS = ['general', 'formal', 'informal', 'academico']
+
+def generar_vocabulario(tamano: int, generador: random.Random) -> List[str]:
+    """Vocabulario sintético de palabras únicas formadas por sílabas"""
+    vocabulario = set()
+    while len(vocabulario) < tamano:
+        silabas = generador.randint(1, 4)
+        vocabulario.add(''.join(generador.choice(SILABAS) for _ in range(silabas)))
+    return sorted(vocabulario)
+
+def generar_corpus(palabras: int, semilla: int) -> List[List[str]]:
+    """Corpus de oraciones con distribución de Zipf y vocabulario según la ley de Heaps"""
+    generador = random.Random(semilla)
+    tamano_vocabulario = max(50, int(10 * palabras ** 0.6))
+    vocabulario = generar_vocabulario(tamano_vocabulario, generador)
+    pesos = [1.0 / rango for rango in range(1, len(vocabulario) + 1)]
+
+    muestra = generador.choices(vocabulario, weights=pesos, k=palabras)
+    oraciones, inicio = [], 0
+    while inicio < len(muestra):
+        largo = generador.randint(4, 16)
+        oraciones.append(muestra[inicio:inicio + largo])
+        inicio += largo
+    return oraciones
+
+def percentiles(duraciones_ns: List[int]) -> Dict:
+    """Throughput y percentiles exactos de una lista de duraciones"""
+    if not duraciones_ns:
+        return {'operaciones': 0}
+
+    ordenadas = sorted(duraciones_ns)
+    total_s = sum(ordenadas) / 1e9
+
+    def percentil(p):
+        return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p / 100))] / 1e6, 4)
+
+    return {
+        'operaciones': len(ordenadas),
+        'throughput_ops_s': round(len(ordenadas) / total_s, 1) if total_s else None,
+        'p50_ms': percentil(50),
+        'p99_ms': percentil(99),
+        'max_ms': round(ordenadas[-1] / 1e6, 4)
+    }
+
+def medir(operacion: Callable, argumentos: List[tuple]) -> List[int]:
+    """Ejecuta la operación con cada tupla de argumentos y devuelve las duraciones"""
+    duraciones = []
+    for args in argumentos:
+        inicio = time.perf_counter_ns()
+        operacion(*args)
+        duraciones.append(time.perf_counter_ns() - inicio)
+    return duraciones
+
+def medir_asignaciones(operacion: Callable, argumentos: List[tuple]) -> Dict:
+    """Memoria asignada por operación según tracemalloc (pasada separada, más lenta)"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    inicial, _ = tracemalloc.get_traced_memory()
+    bloques_iniciales = sys.getallocatedblocks()
+
+    for args in argumentos:
+        operacion(*args)
+
+    actual, pico = tracemalloc.get_traced_memory()
+    bloques = sys.getallocatedblocks() - bloques_iniciales
+    tracemalloc.stop()
+
+    n = max(1, len(argumentos))
+    return {
+        'operaciones': len(argumentos),
+        'pico_kb': round((pico - inicial) / 1024, 1),
+        'retenido_bytes_por_op': round((actual - inicial) / n, 1),
+        'bloques_retenidos_por_op': round(bloques / n, 2)
+    }
+
+def flujo_pulsaciones(oraciones: List[List[str]], pulsaciones: int, semilla: int) -> List[tuple]:
+    """Simula a varios usuarios escribiendo oraciones carácter por carácter"""
+    generador = random.Random(semilla + 1)
+    llamadas = []
+    while len(llamadas) < pulsaciones:
+        oracion = ' '.join(generador.choice(oraciones))
+        usuario = f"usuario_{generador.randint(1, 20)}"
+        contexto = generador.choice(CONTEXTOS)
+        for fin in range(1, len(oracion) + 1):
+            llamadas.append((oracion[:fin], usuario, contexto))
+    return llamadas[:pulsaciones]
+
+def preparar_datos(directorio: str, oraciones: List[List[str]], interacciones: int, semilla: int) -> str:
+    """Crea configuración, base de datos, léxico y modelo en un directorio temporal"""
+    from agente_core import AgentePredictivo
+    from modelo_ngramas import ModeloNgramas
+
+    ruta_config = os.path.join(directorio, 'configuracion.json')
+    with open(ruta_config, 'w', encoding='utf-8') as archivo:
+        json.dump({
+            'agente': {
+                'ruta_lexicon': os.path.join(directorio, 'lexicon.bin'),
+                'ruta_modelo_ngramas': os.path.join(directorio, 'modelo_ngramas.npz'),
+                'directorio_modelos_usuario': os.path.join(directorio, 'usuarios')
+            },
+            'base_datos': {'nombre_archivo': os.path.join(directorio, 'corpus.db')}
+        }, archivo)
+
+    frecuencias = Counter(palabra for oracion in oraciones for palabra in oracion)
+    ModeloNgramas.entrenar(' '.join(oracion) for oracion in oraciones).guardar(
+        os.path.join(directorio, 'modelo_ngramas.npz')
+    )
+
+    # Primera instancia: crea el esquema; luego se cargan palabras e interacciones
+    agente = AgentePredictivo(ruta_config)
+    generador = random.Random(semilla + 2)
+    agente.bd.ejecutar_muchos("""
+        INSERT OR IGNORE INTO palabras (palabra, frecuencia, contexto)
+        VALUES (?, ?, ?)
+    """, ((palabra, cuenta, generador.choice(CONTEXTOS)) for palabra, cuenta in frecuencias.items()))
+
+    vocabulario = list(frecuencias)
+    agente.bd.ejecutar_muchos("""
+        INSERT INTO interacciones (usuario_id, texto_entrada, sugerencia_mostrada, accion, contexto, timestamp)
+        VALUES (?, ?, ?, ?, ?, datetime('now', ?))
+    """, ((f"usuario_{generador.randint(1, 1000)}", generador.choice(vocabulario),
+           generador.choice(vocabulario), generador.choice(['acepta', 'rechaza', 'ignora']),
+           generador.choice(CONTEXTOS), f"-{generador.randint(0, 30 * 24 * 3600)} seconds")
+          for _ in range(interacciones)))
+    agente.cerrar()
+
+    # El léxico se recompila con el vocabulario completo en la siguiente instancia
+    os.remove(os.path.join(directorio, 'lexicon.bin'))
+    return ruta_config
+
+def ejecutar_escenario(palabras: int, interacciones: int, pulsaciones: int, semilla: int) -> Dict:
+    """Corre un escenario completo (se invoca en un proceso nuevo)"""
+    logging.disable(logging.INFO)
+    from agente_core import AgentePredictivo
+
+    oraciones = generar_corpus(palabras, semilla)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_config = preparar_datos(directorio, oraciones, interacciones, semilla)
+
+        inicio = time.perf_counter()
+        agente = AgentePredictivo(ruta_config)
+        arranque_s = time.perf_counter() - inicio
+
+        llamadas = flujo_pulsaciones(oraciones, pulsaciones, semilla)
+        generador = random.Random(semilla + 3)
+        eventos = [(f"usuario_{generador.randint(1, 20)}", ' '.join(generador.choice(oraciones)[:1]),
+                    generador.choice(['acepta', 'rechaza']), generador.choice(CONTEXTOS))
+                   for _ in range(max(1, pulsaciones // 10))]
+
+        resultado = {
+            'palabras_corpus': palabras,
+            'vocabulario': len(agente.lexicon) if agente.lexicon is not None else 0,
+            'interacciones': interacciones,
+            'arranque_s': round(arranque_s, 3),
+            'procesar_entrada': percentiles(medir(agente.procesar_entrada, llamadas)),
+            'registrar_feedback': percentiles(medir(agente.registrar_feedback, eventos))
+        }
+
+        agente.escritor_feedback.vaciar()
+        resultado['obtener_metricas_rendimiento'] = percentiles(
+            medir(agente.obtener_metricas_rendimiento, [()] * 20)
+        )
+        resultado['cache'] = agente.cache_sugerencias.estadisticas() if agente.cache_sugerencias else None
+
+        # Pasada aparte para asignaciones, con la caché vacía para medir el camino completo
+        if agente.cache_sugerencias is not None:
+            agente.cache_sugerencias.limpiar()
+        resultado['asignaciones_procesar_entrada'] = medir_asignaciones(
+            agente.procesar_entrada, llamadas[:min(200, len(llamadas))]
+        )
+
+        agente.cerrar()
+
+    logging.disable(logging.NOTSET)
+    resultado['rss_pico_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return resultado
+
+def metadatos(argumentos: argparse.Namespace) -> Dict:
+    """Entorno y parámetros de la corrida para comparar entre commits"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+
+    import numpy
+    return {
+        'commit': commit,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'plataforma': platform.platform(),
+        'semilla': argumentos.semilla,
+        'pulsaciones': argumentos.pulsaciones
+    }
+
+def comparar(actual: Dict, anterior: Dict):
+    """Imprime la variación de p50/p99 respecto a una corrida anterior"""
+    previos = {(r['palabras_corpus'], r['interacciones']): r for r in anterior.get('resultados', [])}
+    print(f"\n=== COMPARACIÓN CON {anterior.get('metadatos', {}).get('commit')} ===")
+
+    for resultado in actual['resultados']:
+        previo = previos.get((resultado['palabras_corpus'], resultado['interacciones']))
+        if previo is None:
+            continue
+        for operacion in ('procesar_entrada', 'registrar_feedback', 'obtener_metricas_rendimiento'):
+            for clave in ('p50_ms', 'p99_ms'):
+                antes, ahora = previo[operacion].get(clave), resultado[operacion].get(clave)
+                if antes:
+                    cambio = (ahora - antes) / antes * 100
+                    print(f"  {resultado['palabras_corpus']:>8} palabras / {resultado['interacciones']:>7} "
+                          f"interacciones  {operacion} {clave}: {antes} → {ahora} ({cambio:+.1f}%)")
+
+def main():
+    """Punto de entrada del benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark del agente de texto predictivo")
+    parser.add_argument('--tamanos', default='1000,100000,1000000',
+                        help="Tamaños de corpus en palabras, separados por comas")
+    parser.add_argument('--interacciones', default='0,100000',
+                        help="Tamaños del registro de interacciones, separados por comas")
+    parser.add_argument('--pulsaciones', type=int, default=2000,
+                        help="Pulsaciones simuladas por escenario")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', default='resultados_benchmark.json')
+    parser.add_argument('--comparar', help="Resultados anteriores para comparar")
+    argumentos = parser.parse_args()
+
+    escenarios = [(int(p), int(i)) for p in argumentos.tamanos.split(',')
+                  for i in argumentos.interacciones.split(',')]
+
+    resultados = []
+    contexto_mp = multiprocessing.get_context('spawn')
+    for palabras, interacciones in escenarios:
+        print(f"▶ Corpus de {palabras} palabras, {interacciones} interacciones...")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=contexto_mp) as ejecutor:
+            resultado = ejecutor.submit(
+                ejecutar_escenario, palabras, interacciones, argumentos.pulsaciones, argumentos.semilla
+            ).result()
+
+        entrada = resultado['procesar_entrada']
+        print(f"  procesar_entrada: {entrada['throughput_ops_s']} ops/s, "
+              f"p50 {entrada['p50_ms']} ms, p99 {entrada['p99_ms']} ms, RSS {resultado['rss_pico_mb']} MB")
+        resultados.append(resultado)
+
+    salida = {'metadatos': metadatos(argumentos), 'resultados': resultados}
+    with open(argumentos.salida, 'w', encoding='utf-8') as archivo:
+        json.dump(salida, archivo, indent=2, ensure_ascii=False)
+    print(f"\n📄 Resultados guardados en {argumentos.salida}")
+
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding='utf-8') as archivo:
+            comparar(salida, json.load(archivo))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Gestor de conexiones SQLite de larga vida para el agente
+Mantiene un pool de conexiones reutilizables (seguro con el servidor Flask
+en modo threaded, que crea un hilo por petición), con WAL, pragmas ajustados
+y caché de sentencias preparadas por conexión
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# WAL permite lecturas concurrentes mientras otro hilo escribe
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA foreign_keys = ON"
+)
+
+# Instrucciones de la VM de SQLite entre revisiones del límite de tiempo
+INSTRUCCIONES_POR_REVISION = 1000
+
+class GestorConexiones:
+    """Pool de conexiones SQLite; cada conexión la usa un solo hilo a la vez"""
+
+    def __init__(self, db_path: str, tamano_pool: int = 8, timeout: float = 5.0,
+                 sentencias_cacheadas: int = 256):
+        self.db_path = db_path
+        self.tamano_pool = tamano_pool
+        self.timeout = timeout
+        self.sentencias_cacheadas = sentencias_cacheadas
+
+        self._libres: queue.LifoQueue = queue.LifoQueue()
+        self._abiertas: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._cerrado = False
+
+    def _crear_conexion(self) -> sqlite3.Connection:
+        """Abre una conexión nueva y aplica los pragmas"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.sentencias_cacheadas
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+
+        with self._lock:
+            self._abiertas.append(conn)
+        return conn
+
+    def _descartar(self, conn: sqlite3.Connection):
+        """Cierra una conexión que no vuelve al pool"""
+        with self._lock:
+            if conn in self._abiertas:
+                self._abiertas.remove(conn)
+        conn.close()
+
+    @contextmanager
+    def conexion(self) -> Iterator[sqlite3.Connection]:
+        """Presta una conexión del pool durante el bloque with"""
+        if self._cerrado:
+            raise sqlite3.ProgrammingError("El gestor de conexiones está cerrado")
+
+        try:
+            conn = self._libres.get_nowait()
+        except queue.Empty:
+            conn = self._crear_conexion()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+            if self._cerrado or self._libres.qsize() >= self.tamano_pool:
+                self._descartar(conn)
+            else:
+                self._libres.put(conn)
+
+    @contextmanager
+    def transaccion(self) -> Iterator[sqlite3.Connection]:
+        """Conexión dentro de una transacción que se confirma al salir sin errores"""
+        with self.conexion() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    @staticmethod
+    @contextmanager
+    def _limite_tiempo(conn: sqlite3.Connection, limite_ms: Optional[float]) -> Iterator[None]:
+        """Interrumpe la consulta con sqlite3.OperationalError si supera limite_ms"""
+        if limite_ms is None:
+            yield
+            return
+
+        fin = time.perf_counter() + max(limite_ms, 0.0) / 1000.0
+        conn.set_progress_handler(lambda: time.perf_counter() > fin, INSTRUCCIONES_POR_REVISION)
+        try:
+            yield
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def consultar(self, sql: str, parametros: Sequence = (),
+                  limite_ms: Optional[float] = None) -> List[Tuple]:
+        """Ejecuta una consulta de lectura y devuelve todas las filas"""
+        with self.conexion() as conn, self._limite_tiempo(conn, limite_ms):
+            return conn.execute(sql, parametros).fetchall()
+
+    def consultar_uno(self, sql: str, parametros: Sequence = (),
+                      limite_ms: Optional[float] = None) -> Optional[Tuple]:
+        """Ejecuta una consulta de lectura y devuelve la primera fila"""
+        with self.conexion() as conn, self._limite_tiempo(conn, limite_ms):
+            return conn.execute(sql, parametros).fetchone()
+
+    def ejecutar(self, sql: str, parametros: Sequence = ()):
+        """Ejecuta una sentencia de escritura en su propia transacción"""
+        with self.transaccion() as conn:
+            conn.execute(sql, parametros)
+
+    def ejecutar_muchos(self, sql: str, filas: Iterable[Sequence]):
+        """Ejecuta una sentencia para muchas filas en una sola transacción"""
+        with self.transaccion() as conn:
+            conn.executemany(sql, filas)
+
+    def cerrar(self):
+        """Cierra todas las conexiones del pool"""
+        self._cerrado = True
+
+        with self._lock:
+            abiertas, self._abiertas = self._abiertas, []
+        for conn in abiertas:
+            conn.close()
+
+        while not self._libres.empty():
+            self._libres.get_nowait()
@@ -0,0 +1,270 @@
+"""
+Corrector ortográfico por borrado simétrico (estilo SymSpell)
+Se precalculan los borrados (hasta distancia 2) del prefijo de cada palabra
+sin tildes; una consulta solo genera los borrados del token y consulta el
+diccionario, por lo que su costo no crece con el tamaño del léxico.
+Los borrados del léxico se compilan a arreglos ordenados por huella
+(secciones del léxico binario); CorrectorSymSpell agrega encima las formas extra
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from utils import huellas, plegar_acentos
+
+# Sustituir una vocal por su versión con tilde es casi gratis
+COSTO_ACENTO = 0.1
+
+def _generar_borrados(palabra: str, distancia_maxima: int) -> Set[str]:
+    """Todas las cadenas obtenidas borrando hasta distancia_maxima caracteres"""
+    borrados = {palabra}
+    frontera = {palabra}
+    for _ in range(distancia_maxima):
+        siguiente = set()
+        for cadena in frontera:
+            for i in range(len(cadena)):
+                siguiente.add(cadena[:i] + cadena[i + 1:])
+        siguiente -= borrados
+        borrados |= siguiente
+        frontera = siguiente
+    return borrados
+
+def _rangos(claves: np.ndarray, buscadas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Inicio y fin de cada huella buscada en un arreglo ordenado de huellas"""
+    return np.searchsorted(claves, buscadas, side='left'), np.searchsorted(claves, buscadas, side='right')
+
+def compilar_borrados(palabras: Sequence[str], frecuencias: Sequence[int], distancia_maxima: int = 2,
+                      longitud_prefijo: int = 7) -> Dict[str, np.ndarray]:
+    """Arreglos del corrector para las formas del léxico (posición i = palabras[i])
+
+    Las formas que solo difieren en mayúsculas se unifican en la primera, con
+    la frecuencia mayor. Las entradas quedan ordenadas por la huella de su forma
+    en minúscula, y los borrados como huellas ordenadas con la lista de entradas
+    """
+    representantes: Dict[str, int] = {}
+    ids: List[int] = []
+    cuentas: List[int] = []
+    for i, palabra in enumerate(palabras):
+        clave = palabra.lower()
+        entrada = representantes.get(clave)
+        if entrada is None:
+            representantes[clave] = len(ids)
+            ids.append(i)
+            cuentas.append(int(frecuencias[i]))
+        else:
+            cuentas[entrada] = max(cuentas[entrada], int(frecuencias[i]))
+
+    huellas_claves = huellas(list(representantes))
+    orden = np.argsort(huellas_claves, kind='stable')
+
+    borrados: List[str] = []
+    entradas: List[int] = []
+    for posicion, entrada in enumerate(orden.tolist()):
+        prefijo = plegar_acentos(palabras[ids[entrada]])[:longitud_prefijo]
+        propios = _generar_borrados(prefijo, distancia_maxima)
+        borrados.extend(propios)
+        entradas.extend([posicion] * len(propios))
+
+    huellas_borrados = huellas(borrados)
+    orden_borrados = np.argsort(huellas_borrados, kind='stable')
+    huellas_borrados = huellas_borrados[orden_borrados]
+    unicas, inicios = np.unique(huellas_borrados, return_index=True)
+
+    return {
+        'corrector_huellas': huellas_claves[orden].astype('<u8'),
+        'corrector_ids': np.array(ids, dtype='<u4')[orden],
+        'corrector_frecuencias': np.array(cuentas, dtype='<u4')[orden],
+        'borrados_huellas': unicas.astype('<u8'),
+        'borrados_inicio': np.append(inicios, len(huellas_borrados)).astype('<u4'),
+        'borrados_entradas': np.array(entradas, dtype='<u4')[orden_borrados]
+    }
+
+class BorradosCompilados:
+    """Corrector de solo lectura sobre los arreglos de compilar_borrados()
+
+    Las huellas pueden chocar: toda coincidencia se confirma con la forma del
+    léxico. Los arreglos se leen de secciones en cada consulta (como en
+    PrefijosCompilados)
+    """
+
+    def __init__(self, secciones: Dict[str, np.ndarray], lexicon):
+        self.secciones = secciones
+        self.lexicon = lexicon
+
+    def __len__(self) -> int:
+        return len(self.secciones['corrector_ids'])
+
+    def forma(self, entrada: int) -> str:
+        """Forma (con sus mayúsculas y tildes) de la entrada"""
+        return self.lexicon.palabra(int(self.secciones['corrector_ids'][entrada]))
+
+    def frecuencia(self, entrada: int) -> int:
+        """Frecuencia compilada de la entrada"""
+        return int(self.secciones['corrector_frecuencias'][entrada])
+
+    def buscar_varias(self, claves: Sequence[str]) -> np.ndarray:
+        """Entrada de cada clave en minúscula (-1 si no está)"""
+        resultado = np.full(len(claves), -1, dtype=np.int64)
+        if not len(self) or not len(claves):
+            return resultado
+
+        inicios, fines = _rangos(self.secciones['corrector_huellas'], huellas(claves))
+        for posicion in np.flatnonzero(fines > inicios).tolist():
+            for entrada in range(int(inicios[posicion]), int(fines[posicion])):
+                if self.forma(entrada).lower() == claves[posicion]:
+                    resultado[posicion] = entrada
+                    break
+        return resultado
+
+    def buscar(self, clave: str) -> int:
+        """Entrada de la clave en minúscula (-1 si no está)"""
+        return int(self.buscar_varias([clave])[0])
+
+    def candidatos(self, borrados: Sequence[str]) -> Set[int]:
+        """Entradas que comparten alguno de los borrados"""
+        borrados_inicio = self.secciones['borrados_inicio']
+        entradas = self.secciones['borrados_entradas']
+        if not len(entradas):
+            return set()
+
+        inicios, fines = _rangos(self.secciones['borrados_huellas'], huellas(borrados))
+        encontradas: Set[int] = set()
+        for posicion in inicios[fines > inicios].tolist():
+            encontradas.update(entradas[borrados_inicio[posicion]:borrados_inicio[posicion + 1]].tolist())
+        return encontradas
+
+class CorrectorSymSpell:
+    """Índice de borrados simétricos con distancia ponderada para tildes
+
+    Con base (el corrector compilado del léxico) solo se indexan aquí las formas
+    que el léxico no tiene; para las que sí tiene se guarda la frecuencia mayor
+    """
+
+    def __init__(self, distancia_maxima: int = 2, longitud_prefijo: int = 7,
+                 tamano_cache: int = 4096, base: Optional[BorradosCompilados] = None):
+        self.distancia_maxima = distancia_maxima
+        self.longitud_prefijo = longitud_prefijo
+        self.base = base
+
+        self.palabras: List[str] = []
+        self.frecuencias: List[int] = []
+        self._ids: Dict[str, int] = {}
+        self._borrados: Dict[str, List[int]] = {}
+        # Entrada de la base -> frecuencia agregada mayor que la compilada
+        self._frecuencias_base: Dict[int, int] = {}
+
+        self._corregir_cache = lru_cache(maxsize=tamano_cache)(self._corregir)
+
+    def __len__(self) -> int:
+        return len(self.palabras) + (len(self.base) if self.base is not None else 0)
+
+    def agregar(self, palabra: str, frecuencia: int = 1):
+        """Agrega una forma al índice (las formas que solo difieren en mayúsculas se unifican)"""
+        self.agregar_varias([palabra], [frecuencia])
+
+    def agregar_varias(self, palabras: Sequence[str], frecuencias: Sequence[int]):
+        """Agrega varias formas; las del léxico compilado se resuelven en una sola búsqueda"""
+        claves = [palabra.lower() for palabra in palabras]
+        entradas = self.base.buscar_varias(claves) if self.base is not None else np.full(len(claves), -1)
+
+        for palabra, clave, frecuencia, entrada in zip(palabras, claves, frecuencias, entradas.tolist()):
+            frecuencia = int(frecuencia)
+            if entrada >= 0:
+                if frecuencia > self._frecuencia_base(entrada):
+                    self._frecuencias_base[entrada] = frecuencia
+                continue
+
+            palabra_id = self._ids.get(clave)
+            if palabra_id is not None:
+                self.frecuencias[palabra_id] = max(self.frecuencias[palabra_id], frecuencia)
+                continue
+
+            palabra_id = len(self.palabras)
+            self._ids[clave] = palabra_id
+            self.palabras.append(palabra)
+            self.frecuencias.append(frecuencia)
+
+            prefijo = plegar_acentos(palabra)[:self.longitud_prefijo]
+            for borrado in _generar_borrados(prefijo, self.distancia_maxima):
+                self._borrados.setdefault(borrado, []).append(palabra_id)
+
+        self._corregir_cache.cache_clear()
+
+    def _frecuencia_base(self, entrada: int) -> int:
+        """Frecuencia vigente de una entrada de la base"""
+        return self._frecuencias_base.get(entrada, self.base.frecuencia(entrada))
+
+    def agregadas(self) -> Iterator[Tuple[str, int]]:
+        """Formas agregadas sobre la base y formas de la base cuya frecuencia subió"""
+        yield from zip(self.palabras, self.frecuencias)
+        for entrada, frecuencia in self._frecuencias_base.items():
+            yield self.base.forma(entrada), frecuencia
+
+    def contiene(self, palabra: str) -> bool:
+        """Indica si la forma exacta (sin distinguir mayúsculas) está en el léxico"""
+        clave = palabra.lower()
+        return clave in self._ids or (self.base is not None and self.base.buscar(clave) >= 0)
+
+    def corregir(self, palabra: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Correcciones ordenadas por (distancia, frecuencia) como pares (palabra, distancia)"""
+        return self._corregir_cache(palabra.lower())[:k]
+
+    def _corregir(self, palabra: str) -> List[Tuple[str, float]]:
+        """Consulta sin caché sobre la palabra en minúscula"""
+        # En palabras cortas una distancia de 2 cambia demasiado la palabra
+        limite = self.distancia_maxima if len(palabra) > 4 else 1
+        limite += COSTO_ACENTO * len(palabra)
+
+        borrados = _generar_borrados(plegar_acentos(palabra)[:self.longitud_prefijo], self.distancia_maxima)
+        candidatos = set()
+        for borrado in borrados:
+            candidatos.update(self._borrados.get(borrado, ()))
+        formas = [(self.palabras[palabra_id], self.frecuencias[palabra_id]) for palabra_id in candidatos]
+        if self.base is not None:
+            formas.extend((self.base.forma(entrada), self._frecuencia_base(entrada))
+                          for entrada in self.base.candidatos(list(borrados)))
+
+        resultados = []
+        for forma, frecuencia in formas:
+            distancia = distancia_ponderada(palabra, forma.lower(), limite)
+            if distancia <= limite:
+                resultados.append((distancia, -frecuencia, forma))
+
+        resultados.sort()
+        return [(forma, round(distancia, 2)) for distancia, _, forma in resultados]
+
+def _costo_sustitucion(a: str, b: str) -> float:
+    """Costo de sustituir a por b (casi nulo si solo difieren en la tilde)"""
+    if a == b:
+        return 0.0
+    if plegar_acentos(a) == plegar_acentos(b):
+        return COSTO_ACENTO
+    return 1.0
+
+def distancia_ponderada(origen: str, destino: str, limite: float = float('inf')) -> float:
+    """Distancia de Damerau-Levenshtein (OSA) con sustitución de tildes barata"""
+    if abs(len(origen) - len(destino)) > limite:
+        return limite + 1
+
+    anterior_previa = None
+    anterior = [float(j) for j in range(len(destino) + 1)]
+
+    for i in range(1, len(origen) + 1):
+        actual = [float(i)] + [0.0] * len(destino)
+        for j in range(1, len(destino) + 1):
+            actual[j] = min(
+                anterior[j] + 1,
+                actual[j - 1] + 1,
+                anterior[j - 1] + _costo_sustitucion(origen[i - 1], destino[j - 1])
+            )
+            if (anterior_previa is not None and j > 1 and origen[i - 1] == destino[j - 2]
+                    and origen[i - 2] == destino[j - 1]):
+                actual[j] = min(actual[j], anterior_previa[j - 2] + 1)
+
+        if min(actual) > limite:
+            return limite + 1
+        anterior_previa, anterior = anterior, actual
+
+    return anterior[-1]
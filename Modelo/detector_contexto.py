@@ -0,0 +1,161 @@
+"""
+Detector de contexto con un autómata Aho-Corasick sobre palabras
+Los indicadores (palabras o expresiones de varias palabras) se compilan en un
+autómata cuyas transiciones son tokens, así que el texto se recorre una sola
+vez, solo hay coincidencias de palabras completas ("lol" no coincide dentro de
+"lola") y el costo no depende de cuántos indicadores haya
+"""
+
+import json
+import logging
+from collections import deque
+from typing import Dict, List, Sequence, Tuple
+
+from utils import plegar_acentos, tokenizar
+
+logger = logging.getLogger(__name__)
+
+# Orden de desempate cuando dos contextos tienen la misma cantidad de indicadores
+PRIORIDAD_CONTEXTOS = ('formal', 'informal', 'academico')
+_ORDEN = {contexto: i for i, contexto in enumerate(PRIORIDAD_CONTEXTOS)}
+
+class DetectorContexto:
+    """Autómata Aho-Corasick de indicadores de contexto sobre tokens sin tildes"""
+
+    def __init__(self):
+        # Nodo 0 es la raíz
+        self._hijos: List[Dict[str, int]] = [{}]
+        self._fallo: List[int] = [0]
+        self._salidas: List[Tuple[str, ...]] = [()]
+        self._construido = True
+        self.indicadores = 0
+
+    def __len__(self) -> int:
+        return self.indicadores
+
+    def agregar(self, indicador: str, contexto: str):
+        """Agrega un indicador (palabra o expresión) para el contexto dado"""
+        tokens = [plegar_acentos(token) for token in tokenizar(indicador)]
+        if not tokens:
+            return
+
+        nodo = 0
+        for token in tokens:
+            siguiente = self._hijos[nodo].get(token)
+            if siguiente is None:
+                siguiente = len(self._hijos)
+                self._hijos[nodo][token] = siguiente
+                self._hijos.append({})
+                self._fallo.append(0)
+                self._salidas.append(())
+            nodo = siguiente
+
+        if contexto not in self._salidas[nodo]:
+            self._salidas[nodo] += (contexto,)
+            self.indicadores += 1
+        self._construido = False
+
+    def construir(self):
+        """Calcula los enlaces de fallo (BFS) y hereda las salidas por esos enlaces"""
+        cola = deque()
+        for hijo in self._hijos[0].values():
+            self._fallo[hijo] = 0
+            cola.append(hijo)
+
+        while cola:
+            nodo = cola.popleft()
+            for token, hijo in self._hijos[nodo].items():
+                fallo = self._fallo[nodo]
+                while fallo and token not in self._hijos[fallo]:
+                    fallo = self._fallo[fallo]
+                self._fallo[hijo] = self._hijos[fallo].get(token, 0)
+
+                heredadas = tuple(c for c in self._salidas[self._fallo[hijo]] if c not in self._salidas[hijo])
+                self._salidas[hijo] += heredadas
+                cola.append(hijo)
+
+        self._construido = True
+
+    def avanzar(self, nodo: int, palabra: str) -> Tuple[int, Tuple[str, ...]]:
+        """Una transición del autómata: nuevo nodo y contextos de los indicadores que terminan ahí
+
+        Permite recorrer el texto de forma incremental guardando el nodo alcanzado
+        """
+        if not self._construido:
+            self.construir()
+
+        hijos = self._hijos
+        token = plegar_acentos(palabra)
+        while nodo and token not in hijos[nodo]:
+            nodo = self._fallo[nodo]
+        nodo = hijos[nodo].get(token, 0)
+        return nodo, self._salidas[nodo]
+
+    def contar(self, palabras: Sequence[str]) -> Dict[str, int]:
+        """Cantidad de indicadores de cada contexto en una secuencia de tokens"""
+        cuentas: Dict[str, int] = {}
+        nodo = 0
+
+        for palabra in palabras:
+            nodo, salidas = self.avanzar(nodo, palabra)
+            for contexto in salidas:
+                cuentas[contexto] = cuentas.get(contexto, 0) + 1
+
+        return cuentas
+
+    def detectar(self, palabras: Sequence[str]) -> Tuple[str, Dict[str, int]]:
+        """Contexto con más indicadores ('general' si no hay) y las cuentas por contexto"""
+        cuentas = self.contar(palabras)
+        return self.elegir(cuentas), cuentas
+
+    def resumir(self, palabras: Sequence[str], decaimiento: float) -> Dict[str, float]:
+        """Cuentas de indicadores ponderadas por recencia (ver ponderar())"""
+        contextos_por_token = []
+        nodo = 0
+        for palabra in palabras:
+            nodo, salidas = self.avanzar(nodo, palabra)
+            contextos_por_token.append(salidas)
+        return self.ponderar(contextos_por_token, decaimiento)
+
+    @staticmethod
+    def ponderar(contextos_por_token: Sequence[Tuple[str, ...]], decaimiento: float) -> Dict[str, float]:
+        """Suma de los indicadores de cada token con peso decaimiento**(tokens posteriores)
+
+        El último token pesa 1: lo escrito recientemente domina el contexto
+        """
+        resumen: Dict[str, float] = {}
+        total = len(contextos_por_token)
+        for posicion, contextos in enumerate(contextos_por_token):
+            if not contextos:
+                continue
+            peso = decaimiento ** (total - 1 - posicion)
+            for contexto in contextos:
+                resumen[contexto] = resumen.get(contexto, 0.0) + peso
+        return resumen
+
+    @staticmethod
+    def elegir(cuentas: Dict[str, float]) -> str:
+        """Contexto con más indicadores según las cuentas ('general' si no hay)"""
+        presentes = [contexto for contexto, cuenta in cuentas.items() if cuenta > 0]
+        if not presentes:
+            return 'general'
+        return min(presentes, key=lambda c: (-cuentas[c], _ORDEN.get(c, len(_ORDEN)), c))
+
+def cargar_reglas_flujo(ruta: str) -> List[Tuple[str, str]]:
+    """Pares (indicador, contexto) de las reglas del nodo detectar_contexto de flujo.JSON"""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as archivo:
+            flujo = json.load(archivo)
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudieron leer las reglas de contexto de {ruta}: {e}")
+        return []
+
+    reglas = []
+    for nodo in flujo.get('components', []):
+        if nodo.get('id') != 'detectar_contexto':
+            continue
+        for regla in nodo.get('logic', {}).get('rules', []):
+            contexto = regla.get('set', {}).get('contexto')
+            if contexto:
+                reglas.extend((indicador, contexto) for indicador in regla.get('if_contains', []))
+    return reglas
@@ -0,0 +1,156 @@
+"""
+Escritor asíncrono de feedback por lotes
+Los eventos se encolan en una cola acotada desde el hilo de la petición y un
+hilo en segundo plano los escribe con executemany, una transacción por lote,
+cuando se llena el lote o vence el intervalo
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from conexiones_bd import GestorConexiones
+
+logger = logging.getLogger(__name__)
+
+SQL_INSERTAR_FEEDBACK = """
+    INSERT INTO interacciones (usuario_id, sugerencia_mostrada, accion, contexto, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# Marca de fin para detener el hilo escritor
+_FIN = object()
+
+EventoFeedback = Tuple[str, str, str, str, str]
+
+class EscritorFeedback:
+    """Hilo escritor de feedback con cola acotada, lotes por tamaño y por tiempo"""
+
+    def __init__(self, bd: GestorConexiones, capacidad: int = 10000,
+                 tamano_lote: int = 256, intervalo_s: float = 0.5):
+        self.bd = bd
+        self.capacidad = capacidad
+        self.tamano_lote = tamano_lote
+        self.intervalo_s = intervalo_s
+
+        self._cola: queue.Queue = queue.Queue(maxsize=capacidad)
+        self._hilo = threading.Thread(target=self._ejecutar, name='escritor-feedback', daemon=True)
+        self._detenido = False
+
+        # Los contadores se actualizan desde los hilos de las peticiones y el escritor
+        self._lock = threading.Lock()
+        self.encolados = 0
+        self.rechazados = 0
+        self.escritos = 0
+        self.lotes = 0
+        self.errores = 0
+
+    def iniciar(self):
+        """Arranca el hilo escritor"""
+        self._hilo.start()
+
+    def encolar(self, usuario_id: str, sugerencia: str, accion: str, contexto: str) -> bool:
+        """Encola un evento sin bloquear; devuelve False si la cola está llena"""
+        if self._detenido:
+            return False
+
+        # La marca de tiempo es la del evento, no la de la escritura del lote
+        marca = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        try:
+            self._cola.put_nowait((usuario_id, sugerencia, accion, contexto, marca))
+        except queue.Full:
+            with self._lock:
+                self.rechazados += 1
+            return False
+
+        with self._lock:
+            self.encolados += 1
+        return True
+
+    def _ejecutar(self):
+        """Bucle del hilo: arma lotes y los escribe hasta recibir la marca de fin"""
+        terminar = False
+
+        while not terminar:
+            try:
+                evento = self._cola.get(timeout=self.intervalo_s)
+            except queue.Empty:
+                continue
+
+            lote: List[EventoFeedback] = []
+            limite = time.monotonic() + self.intervalo_s
+
+            while True:
+                if evento is _FIN:
+                    terminar = True
+                    self._cola.task_done()
+                    break
+
+                lote.append(evento)
+                if len(lote) >= self.tamano_lote:
+                    break
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    evento = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+
+            if lote:
+                self._escribir(lote)
+
+    def _escribir(self, lote: List[EventoFeedback]):
+        """Escribe un lote en una sola transacción"""
+        try:
+            self.bd.ejecutar_muchos(SQL_INSERTAR_FEEDBACK, lote)
+            with self._lock:
+                self.escritos += len(lote)
+                self.lotes += 1
+        except Exception as e:
+            with self._lock:
+                self.errores += len(lote)
+            logger.error(f"Error escribiendo lote de {len(lote)} eventos de feedback: {e}")
+        finally:
+            for _ in lote:
+                self._cola.task_done()
+
+    def vaciar(self, timeout: float = 5.0) -> bool:
+        """Espera a que se escriban los eventos pendientes"""
+        limite = time.monotonic() + timeout
+        while self._cola.unfinished_tasks and time.monotonic() < limite:
+            time.sleep(0.005)
+        return not self._cola.unfinished_tasks
+
+    def detener(self, timeout: float = 5.0):
+        """Deja de aceptar eventos, escribe los pendientes y termina el hilo"""
+        if self._detenido:
+            return
+        self._detenido = True
+
+        if self._hilo.is_alive():
+            # El hilo sigue vaciando la cola: la marca de fin entra en cuanto haya lugar
+            try:
+                self._cola.put(_FIN, timeout=timeout)
+            except queue.Full:
+                logger.warning("Cola de feedback llena al detener; el hilo escritor no se esperó")
+                return
+            self._hilo.join(timeout)
+
+    def estadisticas(self) -> Dict:
+        """Contadores del escritor, incluida la presión sobre la cola"""
+        pendientes = self._cola.qsize()
+        with self._lock:
+            return {
+                'pendientes': pendientes,
+                'capacidad': self.capacidad,
+                'ocupacion': round(pendientes / self.capacidad * 100, 2),
+                'encolados': self.encolados,
+                'rechazados': self.rechazados,
+                'escritos': self.escritos,
+                'lotes': self.lotes,
+                'errores': self.errores
+            }
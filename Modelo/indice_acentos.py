@@ -0,0 +1,150 @@
+"""
+Índice inverso de acentos: clave sin tildes y en minúscula → formas correctas
+("jose" → "José", "camion" → "camión"), ordenadas por frecuencia
+Las formas del léxico se compilan a arreglos ordenados por la huella de la clave
+(secciones del léxico binario); IndiceAcentos agrega encima las formas extra
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils import huellas, plegar_acentos
+
+# (forma, frecuencia)
+Forma = Tuple[str, int]
+
+def compilar_acentos(palabras: Sequence[str], frecuencias: Sequence[int]) -> Dict[str, np.ndarray]:
+    """Arreglos del índice: por huella de clave, sus formas de más a menos frecuente
+
+    palabras son formas ya unificadas por minúsculas; las listas guardan su posición
+    """
+    por_clave: Dict[str, List[int]] = {}
+    for i, palabra in enumerate(palabras):
+        por_clave.setdefault(plegar_acentos(palabra), []).append(i)
+
+    claves = list(por_clave)
+    huellas_claves = huellas(claves)
+    orden = np.argsort(huellas_claves, kind='stable')
+
+    inicio = [0]
+    formas: List[int] = []
+    for posicion in orden.tolist():
+        formas.extend(sorted(por_clave[claves[posicion]], key=lambda i: (-int(frecuencias[i]), palabras[i])))
+        inicio.append(len(formas))
+
+    return {
+        'acentos_huellas': huellas_claves[orden].astype('<u8'),
+        'acentos_inicio': np.array(inicio, dtype='<u4'),
+        'acentos_formas': np.array(formas, dtype='<u4')
+    }
+
+class AcentosCompilados:
+    """Índice de acentos de solo lectura sobre los arreglos de compilar_acentos()
+
+    Las posiciones de las formas son entradas del corrector compilado (forma y
+    frecuencia); los arreglos se leen de secciones en cada consulta
+    """
+
+    def __init__(self, secciones: Dict[str, np.ndarray], corrector):
+        self.secciones = secciones
+        self.corrector = corrector
+
+    def __len__(self) -> int:
+        return len(self.secciones['acentos_huellas'])
+
+    def formas(self, clave: str) -> List[Tuple[int, str, int]]:
+        """(entrada, forma, frecuencia) de la clave plegada, de más a menos frecuente"""
+        claves = self.secciones['acentos_huellas']
+        inicio = self.secciones['acentos_inicio']
+        huella = huellas([clave])[0]
+        posicion = int(np.searchsorted(claves, huella))
+        resultado = []
+        # Las huellas pueden chocar: solo se conservan las formas que se pliegan a la clave
+        while posicion < len(claves) and claves[posicion] == huella:
+            for entrada in self.secciones['acentos_formas'][inicio[posicion]:inicio[posicion + 1]].tolist():
+                forma = self.corrector.forma(entrada)
+                if plegar_acentos(forma) == clave:
+                    resultado.append((entrada, forma, self.corrector.frecuencia(entrada)))
+            posicion += 1
+        return resultado
+
+class IndiceAcentos:
+    """Índice de formas acentuadas por clave plegada
+
+    Con base (el índice compilado del léxico) las formas agregadas aquí se
+    combinan con las compiladas al consultar; una forma que ya está en la base
+    solo puede subir su frecuencia
+    """
+
+    def __init__(self, base: Optional[AcentosCompilados] = None, tamano_cache: int = 4096):
+        self.base = base
+        self._pendientes: Dict[str, Dict[str, int]] = {}
+        self._formas: Dict[str, Tuple[Forma, ...]] = {}
+
+        self._ordenadas_cache = lru_cache(maxsize=tamano_cache)(self._ordenadas)
+
+    def __len__(self) -> int:
+        return len(self._formas) + (len(self.base) if self.base is not None else 0)
+
+    def agregar(self, palabra: str, frecuencia: int = 1):
+        """Registra una forma (las que solo difieren en mayúsculas se unifican)"""
+        formas = self._pendientes.setdefault(plegar_acentos(palabra), {})
+        existente = next((forma for forma in formas if forma.lower() == palabra.lower()), None)
+        if existente is None:
+            formas[palabra] = frecuencia
+        else:
+            formas[existente] = max(formas[existente], frecuencia)
+
+    def construir(self):
+        """Ordena las formas agregadas por frecuencia"""
+        for clave, formas in self._pendientes.items():
+            previas = dict(self._formas.get(clave, ()))
+            for forma, frecuencia in formas.items():
+                previas[forma] = max(previas.get(forma, 0), frecuencia)
+            self._formas[clave] = tuple(sorted(previas.items(), key=lambda par: (-par[1], par[0])))
+
+        self._pendientes = {}
+        self._ordenadas_cache.cache_clear()
+
+    def _ordenadas(self, clave: str) -> Tuple[str, ...]:
+        """Formas de la clave (base y agregadas) de más a menos frecuente"""
+        propias = self._formas.get(clave, ())
+        if self.base is None:
+            return tuple(forma for forma, _ in propias)
+
+        compiladas = self.base.formas(clave)
+        if not propias:
+            return tuple(forma for _, forma, _ in compiladas)
+
+        unidas = {forma.lower(): (forma, frecuencia) for _, forma, frecuencia in compiladas}
+        for forma, frecuencia in propias:
+            previa = unidas.get(forma.lower())
+            unidas[forma.lower()] = (previa[0], max(previa[1], frecuencia)) if previa else (forma, frecuencia)
+        return tuple(forma for forma, _ in sorted(unidas.values(), key=lambda par: (-par[1], par[0])))
+
+    def formas(self, palabra: str) -> List[str]:
+        """Formas conocidas que se pliegan igual que la palabra, de más a menos frecuente"""
+        return list(self._ordenadas_cache(plegar_acentos(palabra)))
+
+    def forma_acentuada(self, palabra: str) -> Optional[str]:
+        """Forma con tildes que corresponde a la palabra (aunque ya esté bien escrita)"""
+        clave = plegar_acentos(palabra)
+        ordenadas = self._ordenadas_cache(clave)
+
+        # Si la clave sin tildes es una palabra válida ("esta"/"está") no se corrige
+        if not ordenadas or any(forma.lower() == clave for forma in ordenadas):
+            return None
+        return ordenadas[0]
+
+    def correccion(self, palabra: str) -> Optional[str]:
+        """Forma con tildes que corrige a la palabra, o None si ya es correcta"""
+        correccion = self.forma_acentuada(palabra)
+        if correccion is None or correccion.lower() == palabra.lower():
+            return None
+        return correccion
+
+    def tiene_tildes_correctas(self, palabra: str) -> bool:
+        """Indica si la palabra es una forma conocida que lleva tilde"""
+        return plegar_acentos(palabra) != palabra.lower() and palabra in self.formas(palabra)
@@ -0,0 +1,223 @@
+"""
+Índice de prefijos (trie) para completar la palabra que se está escribiendo
+Cada nodo guarda sus k mejores completaciones por contexto, de modo que
+una consulta cuesta O(longitud del prefijo) sin importar el tamaño del vocabulario.
+El trie del léxico se compila a arreglos (secciones del léxico binario) y se
+consulta sin reconstruirlo; IndicePrefijos agrega encima las expresiones extra
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils import plegar_acentos
+
+CONTEXTOS = ('general', 'formal', 'informal', 'academico')
+
+# (palabra, frecuencia, contexto) de una completación
+Completacion = Tuple[str, int, str]
+
+def compilar_prefijos(indice: 'IndicePrefijos') -> Dict[str, np.ndarray]:
+    """Arreglos del trie: hijos por nodo ordenados por carácter y top-k por nodo y contexto
+
+    Las listas iguales (nodos de cadena, contextos sin diferencias) se guardan una vez
+    """
+    if not indice._mejores:
+        indice.construir()
+
+    nodos = len(indice._hijos)
+    hijos_inicio = np.zeros(nodos + 1, dtype='<u4')
+    caracteres: List[int] = []
+    destinos: List[int] = []
+    for nodo, hijos in enumerate(indice._hijos):
+        for caracter in sorted(hijos):
+            caracteres.append(ord(caracter))
+            destinos.append(hijos[caracter])
+        hijos_inicio[nodo + 1] = len(caracteres)
+
+    posiciones: Dict[Tuple[int, ...], int] = {}
+    listas_inicio = [0]
+    listas_ids: List[int] = []
+    nodo_listas = np.zeros((nodos, len(CONTEXTOS)), dtype='<u4')
+    for nodo, por_contexto in enumerate(indice._mejores):
+        for columna, contexto in enumerate(CONTEXTOS):
+            lista = por_contexto.get(contexto, por_contexto['general'])
+            posicion = posiciones.get(lista)
+            if posicion is None:
+                posicion = posiciones[lista] = len(listas_inicio) - 1
+                listas_ids.extend(lista)
+                listas_inicio.append(len(listas_ids))
+            nodo_listas[nodo, columna] = posicion
+
+    return {
+        'prefijos_hijos_inicio': hijos_inicio,
+        'prefijos_caracteres': np.array(caracteres, dtype='<u4'),
+        'prefijos_destinos': np.array(destinos, dtype='<u4'),
+        'prefijos_nodo_listas': nodo_listas.ravel(),
+        'prefijos_listas_inicio': np.array(listas_inicio, dtype='<u4'),
+        'prefijos_listas_ids': np.array(listas_ids, dtype='<u4')
+    }
+
+class PrefijosCompilados:
+    """Trie de solo lectura sobre los arreglos de compilar_prefijos()
+
+    Los ids de las listas son posiciones del léxico, que da palabra, frecuencia y
+    contexto. Los arreglos se leen de secciones en cada consulta: al cerrar el
+    léxico no queda ninguna vista sobre su mapeo
+    """
+
+    def __init__(self, secciones: Dict[str, np.ndarray], lexicon):
+        self.secciones = secciones
+        self.lexicon = lexicon
+
+    def __len__(self) -> int:
+        return len(self.lexicon)
+
+    def completar(self, prefijo: str, contexto: str = 'general', k: int = 10) -> List[Completacion]:
+        """Mejores completaciones del léxico para el prefijo, de mejor a peor"""
+        hijos_inicio = self.secciones['prefijos_hijos_inicio']
+        caracteres = self.secciones['prefijos_caracteres']
+        listas_inicio = self.secciones['prefijos_listas_inicio']
+        if len(hijos_inicio) < 2:
+            return []
+
+        nodo = 0
+        for caracter in plegar_acentos(prefijo):
+            inicio, fin = int(hijos_inicio[nodo]), int(hijos_inicio[nodo + 1])
+            posicion = inicio + int(np.searchsorted(caracteres[inicio:fin], ord(caracter)))
+            if posicion == fin or caracteres[posicion] != ord(caracter):
+                return []
+            nodo = int(self.secciones['prefijos_destinos'][posicion])
+
+        columna = CONTEXTOS.index(contexto) if contexto in CONTEXTOS else 0
+        lista = int(self.secciones['prefijos_nodo_listas'][nodo * len(CONTEXTOS) + columna])
+        ids = self.secciones['prefijos_listas_ids'][listas_inicio[lista]:listas_inicio[lista + 1]][:k]
+        return [(self.lexicon.palabra(i), max(int(self.lexicon.frecuencias[i]), 1), self.lexicon.contexto(i))
+                for i in ids.tolist()]
+
+class IndicePrefijos:
+    """Trie sobre claves sin tildes con top-k precalculado por nodo y contexto"""
+
+    def __init__(self, k: int = 10, base: Optional[PrefijosCompilados] = None):
+        self.k = k
+        # Trie compilado del léxico; las palabras agregadas aquí se combinan con él al consultar
+        self.base = base
+
+        # Nodo 0 es la raíz; los hijos siempre tienen id mayor que su padre
+        self._hijos: List[Dict[str, int]] = [{}]
+        self._terminales: Dict[int, List[int]] = {}
+
+        # Top-k por nodo: 'general' siempre, los demás contextos solo si difieren
+        self._mejores: List[Dict[str, Tuple[int, ...]]] = []
+
+        self.palabras: List[str] = []
+        self.frecuencias: List[int] = []
+        self.contextos: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.palabras) + (len(self.base) if self.base is not None else 0)
+
+    def agregar(self, palabra: str, frecuencia: int = 1, contexto: str = 'general'):
+        """Agrega una palabra o expresión al índice"""
+        palabra_id = self._ids.get(palabra)
+        if palabra_id is not None:
+            if frecuencia > self.frecuencias[palabra_id]:
+                self.frecuencias[palabra_id] = frecuencia
+            if self.contextos[palabra_id] == 'general':
+                self.contextos[palabra_id] = contexto
+            return
+
+        palabra_id = len(self.palabras)
+        self._ids[palabra] = palabra_id
+        self.palabras.append(palabra)
+        self.frecuencias.append(frecuencia)
+        self.contextos.append(contexto)
+
+        nodo = 0
+        for caracter in plegar_acentos(palabra):
+            siguiente = self._hijos[nodo].get(caracter)
+            if siguiente is None:
+                siguiente = len(self._hijos)
+                self._hijos[nodo][caracter] = siguiente
+                self._hijos.append({})
+            nodo = siguiente
+
+        # Varias formas pueden plegarse a la misma clave ("mas"/"más")
+        self._terminales.setdefault(nodo, []).append(palabra_id)
+        self._mejores = []
+
+    def construir(self):
+        """Precalcula el top-k de cada nodo recorriendo el trie de hojas a raíz"""
+        total_nodos = len(self._hijos)
+        mejores: List[Dict[str, Tuple[int, ...]]] = [None] * total_nodos
+
+        for nodo in range(total_nodos - 1, -1, -1):
+            hijos = self._hijos[nodo]
+            terminales = self._terminales.get(nodo)
+
+            # Los nodos de cadena (un solo hijo, sin palabra) comparten el top-k del hijo
+            if terminales is None and len(hijos) == 1:
+                mejores[nodo] = mejores[next(iter(hijos.values()))]
+                continue
+
+            candidatos = set(terminales or ())
+            for hijo in hijos.values():
+                for lista in mejores[hijo].values():
+                    candidatos.update(lista)
+
+            por_contexto = {'general': self._top_k(candidatos, 'general')}
+            for contexto in CONTEXTOS[1:]:
+                lista = self._top_k(candidatos, contexto)
+                if lista != por_contexto['general']:
+                    por_contexto[contexto] = lista
+
+            mejores[nodo] = por_contexto
+
+        self._mejores = mejores
+
+    def _top_k(self, candidatos, contexto: str) -> Tuple[int, ...]:
+        """Ordena candidatos priorizando el contexto y luego la frecuencia"""
+        clave = _clave_orden(contexto)
+        orden = sorted(candidatos, key=lambda i: clave((self.palabras[i], self.frecuencias[i], self.contextos[i])))
+        return tuple(orden[:self.k])
+
+    def completar(self, prefijo: str, contexto: str = 'general', k: int = None) -> List[str]:
+        """Devuelve las mejores completaciones para el prefijo en el contexto dado"""
+        propias = self.completar_indices(prefijo, contexto, k)
+        if self.base is None:
+            return [self.palabras[i] for i in propias]
+
+        # Las dos listas siguen el mismo orden: basta fusionarlas (una palabra repetida se une)
+        unidas: Dict[str, Completacion] = {}
+        completaciones = self.base.completar(prefijo, contexto, k or self.k) + \
+            [(self.palabras[i], self.frecuencias[i], self.contextos[i]) for i in propias]
+        for palabra, frecuencia, contexto_palabra in completaciones:
+            previa = unidas.get(palabra)
+            if previa is not None:
+                frecuencia = max(frecuencia, previa[1])
+                contexto_palabra = previa[2] if previa[2] != 'general' else contexto_palabra
+            unidas[palabra] = (palabra, frecuencia, contexto_palabra)
+
+        return [palabra for palabra, _, _ in sorted(unidas.values(), key=_clave_orden(contexto))][:k or self.k]
+
+    def completar_indices(self, prefijo: str, contexto: str = 'general', k: int = None) -> Tuple[int, ...]:
+        """Como completar(), pero devuelve posiciones en self.palabras"""
+        if not self._mejores:
+            self.construir()
+
+        nodo = 0
+        for caracter in plegar_acentos(prefijo):
+            nodo = self._hijos[nodo].get(caracter)
+            if nodo is None:
+                return ()
+
+        por_contexto = self._mejores[nodo]
+        ids = por_contexto.get(contexto, por_contexto['general'])
+        return ids[:k or self.k]
+
+def _clave_orden(contexto: str):
+    """Clave de orden de completaciones: primero el contexto, luego la frecuencia"""
+    if contexto == 'general':
+        return lambda c: (-c[1], c[0])
+    return lambda c: (c[2] != contexto, -c[1], c[0])
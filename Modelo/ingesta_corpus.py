@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Ingesta de corpus de texto a la tabla palabras y al modelo de n-gramas
+Lee archivos UTF-8 (o directorios completos) por bloques y los reparte entre
+procesos que cuentan unigramas y n-gramas. Cada proceso vuelca a disco sus
+conteos parciales, ordenados, cuando superan su parte del presupuesto de
+memoria; al final los fragmentos se fusionan en flujo, se podan por frecuencia
+mínima y se cargan en SQLite por lotes grandes. Después se reescriben el
+modelo de n-gramas, leyendo la fusión directo a sus arreglos, y el léxico
+binario. Uso:
+
+    python ingesta_corpus.py corpus/ otro.txt --db corpus_colombiano.db \\
+        --procesos 4 --memoria-mb 512 [--minimo 2] [--maximo-vocabulario 200000] \\
+        [--maximo-ngramas 2000000]
+"""
+
+import argparse
+import heapq
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+from array import array
+from collections import Counter
+from itertools import groupby, islice
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agente_core import SQL_CREAR_PALABRAS
+from conexiones_bd import GestorConexiones
+from lexicon_binario import compilar_desde_conexion
+from modelo_ngramas import ORDEN_MAXIMO, ModeloNgramas
+from utils import plegar_acentos, tokenizar
+
+logger = logging.getLogger(__name__)
+
+# Costo aproximado en memoria de una entrada del contador (clave, cuenta y ranura)
+BYTES_POR_ENTRADA = 160
+
+# Caracteres del final de un bloque que se repiten al inicio del siguiente para
+# no perder los n-gramas que cruzan el corte
+SOLAPE_CARACTERES = 256
+
+SQL_CARGAR_PALABRA = """
+    INSERT INTO palabras (palabra, frecuencia, contexto, es_colombianismo, requiere_tilde)
+    VALUES (?, ?, 'general', FALSE, ?)
+    ON CONFLICT(palabra) DO UPDATE SET frecuencia = excluded.frecuencia
+"""
+
+_ESPACIO = re.compile(r'\s')
+
+# (texto previo al bloque para la historia de sus primeros n-gramas, texto del bloque)
+Bloque = Tuple[str, str]
+
+def listar_archivos(rutas: Sequence[str], extensiones: Sequence[str] = ('.txt',)) -> List[str]:
+    """Archivos dados y los de los directorios (recursivo), en orden estable"""
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for raiz, directorios, nombres in os.walk(ruta):
+                directorios.sort()
+                archivos.extend(os.path.join(raiz, nombre) for nombre in sorted(nombres)
+                                if nombre.lower().endswith(tuple(extensiones)))
+        else:
+            archivos.append(ruta)
+    return archivos
+
+def leer_bloques(ruta: str, tamano_bloque: int) -> Iterator[Bloque]:
+    """Bloques de unos tamano_bloque caracteres cortados en un espacio
+
+    Cada bloque lleva el final del anterior (desde un espacio) para que el
+    contador reconstruya la historia de sus primeros n-gramas
+    """
+    previo = ''
+    resto = ''
+    with open(ruta, 'r', encoding='utf-8', errors='replace') as archivo:
+        while True:
+            leido = archivo.read(tamano_bloque)
+            texto = resto + leido
+            if not leido:
+                if texto:
+                    yield previo, texto
+                return
+
+            corte = max(texto.rfind(' '), texto.rfind('\n'))
+            if corte <= 0:
+                # Sin espacios en todo el bloque: se sigue acumulando
+                resto = texto
+                continue
+
+            bloque, resto = texto[:corte], texto[corte:]
+            yield previo, bloque
+
+            # La cola del bloque, desde un espacio para no partir una palabra
+            if len(bloque) <= SOLAPE_CARACTERES:
+                previo = bloque
+            else:
+                espacio = _ESPACIO.search(bloque, len(bloque) - SOLAPE_CARACTERES)
+                previo = bloque[espacio.end():] if espacio else ''
+
+def contar_bloque(previo: str, texto: str, orden_maximo: int = ORDEN_MAXIMO) -> Tuple[Counter, int]:
+    """Conteos de n-gramas (claves con las palabras separadas por espacio) y tokens del bloque
+
+    Solo se cuentan los n-gramas que terminan dentro del bloque
+    """
+    historia = tokenizar(previo)[-(orden_maximo - 1):] if orden_maximo > 1 and previo else []
+    tokens = historia + tokenizar(texto)
+    propios = len(historia)
+
+    conteos: Counter = Counter()
+    for n in range(1, orden_maximo + 1):
+        desde = max(0, propios - n + 1)
+        conteos.update(' '.join(tokens[i:i + n]) for i in range(desde, len(tokens) - n + 1))
+    return conteos, len(tokens) - propios
+
+def escribir_fragmento(conteos: Counter, directorio: str, nombre: str) -> str:
+    """Vuelca los conteos ordenados por clave a un fragmento TSV"""
+    ruta = os.path.join(directorio, nombre)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.writelines(f'{clave}\t{cuenta}\n' for clave, cuenta in sorted(conteos.items()))
+    return ruta
+
+def leer_fragmento(ruta: str) -> Iterator[Tuple[str, int]]:
+    """Pares (clave, cuenta) de un fragmento, en orden"""
+    with open(ruta, 'r', encoding='utf-8') as archivo:
+        for linea in archivo:
+            clave, cuenta = linea.rstrip('\n').split('\t')
+            yield clave, int(cuenta)
+
+def fusionar_fragmentos(rutas: Sequence[str]) -> Iterator[Tuple[str, int]]:
+    """Fusión k-vías de fragmentos ordenados sumando las cuentas de cada clave"""
+    fusion = heapq.merge(*(leer_fragmento(ruta) for ruta in rutas), key=lambda par: par[0])
+    for clave, pares in groupby(fusion, key=lambda par: par[0]):
+        yield clave, sum(cuenta for _, cuenta in pares)
+
+def _trabajador(indice: int, cola_bloques, cola_resultados, directorio: str,
+                maximo_entradas: int, orden_maximo: int):
+    """Cuenta los bloques de la cola y vuelca fragmentos al superar maximo_entradas"""
+    parcial: Counter = Counter()
+    fragmentos = []
+    tokens = 0
+    error = None
+
+    def volcar():
+        if parcial:
+            fragmentos.append(escribir_fragmento(parcial, directorio, f'p{indice}_{len(fragmentos)}.tsv'))
+            parcial.clear()
+
+    # Tras un error se siguen sacando bloques para que la lectura no quede esperando
+    while True:
+        bloque = cola_bloques.get()
+        if bloque is None:
+            break
+        if error:
+            continue
+        try:
+            conteos, cantidad = contar_bloque(*bloque, orden_maximo)
+            parcial.update(conteos)
+            tokens += cantidad
+            if len(parcial) > maximo_entradas:
+                volcar()
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+
+    try:
+        volcar()
+    except Exception as e:
+        error = error or f'{type(e).__name__}: {e}'
+    cola_resultados.put((fragmentos, tokens, error))
+
+def contar_corpus(archivos: Sequence[str], directorio: str, procesos: int, maximo_entradas: int,
+                  tamano_bloque: int = 1 << 20, orden_maximo: int = ORDEN_MAXIMO) -> Tuple[List[str], int, int]:
+    """Fase de mapeo: fragmentos ordenados, tokens y bloques leídos
+
+    La cola de bloques es acotada, así que la lectura espera a los procesos y
+    nunca hay más de unos pocos bloques en memoria
+    """
+    contexto = multiprocessing.get_context()
+    cola_bloques = contexto.Queue(maxsize=2 * procesos)
+    cola_resultados = contexto.Queue()
+    trabajadores = [
+        contexto.Process(target=_trabajador, name=f'ingesta-{indice}',
+                         args=(indice, cola_bloques, cola_resultados, directorio,
+                               max(1, maximo_entradas // procesos), orden_maximo))
+        for indice in range(procesos)
+    ]
+    for trabajador in trabajadores:
+        trabajador.start()
+
+    bloques = 0
+    try:
+        for ruta in archivos:
+            for bloque in leer_bloques(ruta, tamano_bloque):
+                cola_bloques.put(bloque)
+                bloques += 1
+    finally:
+        for _ in trabajadores:
+            cola_bloques.put(None)
+
+    fragmentos, tokens, errores = [], 0, []
+    for _ in trabajadores:
+        propios, cantidad, error = cola_resultados.get()
+        fragmentos.extend(propios)
+        tokens += cantidad
+        if error:
+            errores.append(error)
+    for trabajador in trabajadores:
+        trabajador.join()
+
+    if errores:
+        raise RuntimeError(f"Fallaron procesos de conteo: {errores}")
+    return fragmentos, tokens, bloques
+
+def podar_y_fusionar(fragmentos: Sequence[str], ruta_fusion: str, minimo: int,
+                     maximo_vocabulario: Optional[int]) -> Dict[str, int]:
+    """Fase de reducción: escribe los n-gramas con cuenta >= minimo y devuelve el vocabulario
+
+    El vocabulario son los unigramas más frecuentes (hasta maximo_vocabulario),
+    elegidos durante la fusión con un montículo de ese tamaño
+    """
+    monticulo: List[Tuple[int, str]] = []
+    with open(ruta_fusion, 'w', encoding='utf-8') as archivo:
+        for clave, cuenta in fusionar_fragmentos(fragmentos):
+            if cuenta < minimo:
+                continue
+            if ' ' in clave:
+                archivo.write(f'{clave}\t{cuenta}\n')
+            elif not maximo_vocabulario or len(monticulo) < maximo_vocabulario:
+                heapq.heappush(monticulo, (cuenta, clave))
+            elif (cuenta, clave) > monticulo[0]:
+                heapq.heapreplace(monticulo, (cuenta, clave))
+
+    return {clave: cuenta for cuenta, clave in monticulo}
+
+def _mas_frecuentes(columnas: Tuple[array, array, array], maximo: int) -> Tuple[array, array, array]:
+    """Conserva los maximo n-gramas de mayor cuenta (en empate, los primeros leídos)"""
+    cuentas = np.frombuffer(columnas[2], dtype=np.int64)
+    conservar = np.sort(np.argsort(-cuentas, kind='stable')[:maximo])
+    return tuple(array('q', np.frombuffer(columna, dtype=np.int64)[conservar].tobytes())
+                 for columna in columnas)
+
+def construir_modelo(unigramas: Dict[str, int], ruta_fusion: str,
+                     maximo_ngramas: Optional[int] = None) -> ModeloNgramas:
+    """Modelo con el vocabulario y los n-gramas formados solo por él, leídos en flujo
+
+    Cada n-grama se codifica al leerlo en arreglos compactos por orden (sin
+    diccionario intermedio); con maximo_ngramas, cada orden se recorta a sus
+    n-gramas más frecuentes cuando dobla ese tamaño
+    """
+    vocabulario = sorted(unigramas)
+    ids = {palabra: i for i, palabra in enumerate(vocabulario)}
+    tamano = len(vocabulario)
+
+    # Por orden: historias, siguientes y cuentas como int64
+    columnas: Dict[int, Tuple[array, array, array]] = {}
+    for clave, cuenta in leer_fragmento(ruta_fusion):
+        palabras = clave.split(' ')
+        historia = 0
+        for palabra in palabras[:-1]:
+            palabra_id = ids.get(palabra)
+            if palabra_id is None:
+                break
+            historia = historia * tamano + palabra_id
+        else:
+            siguiente = ids.get(palabras[-1])
+            if siguiente is None:
+                continue
+
+            orden = len(palabras)
+            historias, siguientes, cuentas = columnas.setdefault(orden, (array('q'), array('q'), array('q')))
+            historias.append(historia)
+            siguientes.append(siguiente)
+            cuentas.append(cuenta)
+            if maximo_ngramas and len(cuentas) >= 2 * maximo_ngramas:
+                columnas[orden] = _mas_frecuentes(columnas[orden], maximo_ngramas)
+
+    ngramas = {}
+    for orden in sorted(columnas):
+        if maximo_ngramas and len(columnas[orden][2]) > maximo_ngramas:
+            columnas[orden] = _mas_frecuentes(columnas[orden], maximo_ngramas)
+        historias, siguientes, cuentas = (np.frombuffer(columna, dtype=np.int64) for columna in columnas[orden])
+        indice = np.lexsort((siguientes, historias))
+        ngramas[orden] = (historias[indice], siguientes[indice], cuentas[indice])
+
+    return ModeloNgramas(vocabulario, np.array([unigramas[palabra] for palabra in vocabulario], dtype=np.int64),
+                         ngramas)
+
+def cargar_palabras(bd: GestorConexiones, unigramas: Dict[str, int], tamano_lote: int = 50000) -> int:
+    """Inserta o actualiza la frecuencia de cada palabra, una transacción por lote"""
+    with bd.transaccion() as conn:
+        conn.execute(SQL_CREAR_PALABRAS)
+
+    filas = ((palabra, cuenta, plegar_acentos(palabra) != palabra) for palabra, cuenta in unigramas.items())
+    cargadas = 0
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        if not lote:
+            return cargadas
+        with bd.transaccion() as conn:
+            conn.executemany(SQL_CARGAR_PALABRA, lote)
+        cargadas += len(lote)
+
+def guardar_modelo(modelo: ModeloNgramas, ruta: str):
+    """Guarda el modelo reemplazando el anterior de una sola vez"""
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    temporal = ruta + '.tmp.npz'
+    modelo.guardar(temporal)
+    os.replace(temporal, ruta)
+
+def ingerir(rutas: Sequence[str], db_path: str, ruta_modelo: str, ruta_lexicon: str,
+            procesos: int = 0, memoria_mb: float = 512, minimo: int = 2,
+            maximo_vocabulario: Optional[int] = 200000, maximo_ngramas: Optional[int] = 2000000,
+            tamano_bloque: int = 1 << 20,
+            tamano_lote: int = 50000, extensiones: Sequence[str] = ('.txt',)) -> Dict:
+    """Ingesta completa: conteo en paralelo, fusión, carga en SQLite, modelo y léxico"""
+    inicio = time.perf_counter()
+    procesos = procesos or os.cpu_count() or 1
+    maximo_entradas = max(1000, int(memoria_mb * 1024 * 1024 // BYTES_POR_ENTRADA))
+
+    archivos = listar_archivos(rutas, extensiones)
+    if not archivos:
+        raise ValueError(f"No hay archivos para ingerir en {list(rutas)}")
+
+    directorio = tempfile.mkdtemp(prefix='ingesta_')
+    try:
+        fragmentos, tokens, bloques = contar_corpus(archivos, directorio, procesos, maximo_entradas, tamano_bloque)
+        logger.info(f"{len(archivos)} archivos, {bloques} bloques y {tokens} tokens en {len(fragmentos)} fragmentos")
+
+        ruta_fusion = os.path.join(directorio, 'fusion.tsv')
+        unigramas = podar_y_fusionar(fragmentos, ruta_fusion, minimo, maximo_vocabulario)
+        modelo = construir_modelo(unigramas, ruta_fusion, maximo_ngramas)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    bd = GestorConexiones(db_path)
+    try:
+        palabras = cargar_palabras(bd, unigramas, tamano_lote)
+        guardar_modelo(modelo, ruta_modelo)
+        with bd.conexion() as conn:
+            compilar_desde_conexion(conn, ruta_lexicon)
+    finally:
+        bd.cerrar()
+
+    return {
+        'archivos': len(archivos),
+        'bloques': bloques,
+        'tokens': tokens,
+        'fragmentos': len(fragmentos),
+        'palabras': palabras,
+        'ngramas': {orden: len(cuentas) for orden, cuentas in modelo.cuentas.items()},
+        'segundos': round(time.perf_counter() - inicio, 2)
+    }
+
+def main():
+    """Punto de entrada de la ingesta"""
+    parser = argparse.ArgumentParser(description="Ingesta de corpus al agente de texto predictivo")
+    parser.add_argument('rutas', nargs='+', help="Archivos o directorios de texto UTF-8")
+    parser.add_argument('--db', default='corpus_colombiano.db')
+    parser.add_argument('--modelo', default='data/modelo_ngramas.npz')
+    parser.add_argument('--lexicon', default='data/lexicon.bin')
+    parser.add_argument('--procesos', type=int, default=0, help="Procesos de conteo (0: uno por CPU)")
+    parser.add_argument('--memoria-mb', type=float, default=512,
+                        help="Memoria para conteos parciales, repartida entre los procesos")
+    parser.add_argument('--minimo', type=int, default=2, help="Cuenta mínima de cada n-grama")
+    parser.add_argument('--maximo-vocabulario', type=int, default=200000)
+    parser.add_argument('--maximo-ngramas', type=int, default=2000000, help="Máximo de n-gramas por orden")
+    parser.add_argument('--extensiones', default='.txt', help="Extensiones a leer en directorios, separadas por comas")
+    argumentos = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    resultado = ingerir(
+        argumentos.rutas, argumentos.db, argumentos.modelo, argumentos.lexicon,
+        procesos=argumentos.procesos,
+        memoria_mb=argumentos.memoria_mb,
+        minimo=argumentos.minimo,
+        maximo_vocabulario=argumentos.maximo_vocabulario,
+        maximo_ngramas=argumentos.maximo_ngramas,
+        extensiones=tuple(argumentos.extensiones.split(','))
+    )
+    print(f"✅ {resultado['tokens']} tokens de {resultado['archivos']} archivos en {resultado['segundos']} s: "
+          f"{resultado['palabras']} palabras, n-gramas {resultado['ngramas']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Instrumentación de latencia por etapa del pipeline PEAS
+Cada etapa se mide con perf_counter_ns y se acumula en histogramas
+logarítmicos (4 cubetas por octava, ~19% de resolución) por etapa y contexto
+
+Los histogramas no usan locks: los incrementos son operaciones sobre listas
+de enteros que, bajo el GIL, en el peor caso pierden alguna muestra aislada
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+# Valores 0-7 ns tienen cubeta propia; desde 8 ns, 4 cubetas por octava hasta 2^63
+_CUBETAS_LINEALES = 8
+_SUBCUBETAS = 4
+TOTAL_CUBETAS = _CUBETAS_LINEALES + _SUBCUBETAS * 61
+
+# Clave de contexto que agrega todas las mediciones de una etapa
+TODOS_LOS_CONTEXTOS = '*'
+
+def _cubeta(ns: int) -> int:
+    """Índice de cubeta logarítmica para una duración en nanosegundos"""
+    if ns < _CUBETAS_LINEALES:
+        return max(ns, 0)
+    bits = ns.bit_length()
+    sub = (ns >> (bits - 3)) & 3
+    return _CUBETAS_LINEALES + _SUBCUBETAS * (bits - 4) + sub
+
+def _valor_cubeta(indice: int) -> float:
+    """Valor representativo (punto medio) de una cubeta, en nanosegundos"""
+    if indice < _CUBETAS_LINEALES:
+        return float(indice)
+    bits = (indice - _CUBETAS_LINEALES) // _SUBCUBETAS + 4
+    sub = (indice - _CUBETAS_LINEALES) % _SUBCUBETAS
+    inferior = (4 + sub) << (bits - 3)
+    superior = (5 + sub) << (bits - 3)
+    return (inferior + superior) / 2.0
+
+class HistogramaLatencia:
+    """Histograma logarítmico de duraciones con percentiles aproximados"""
+
+    def __init__(self):
+        self.cuentas: List[int] = [0] * TOTAL_CUBETAS
+        self.total = 0
+        self.suma_ns = 0
+        self.maximo_ns = 0
+
+    def registrar(self, ns: int):
+        """Agrega una duración en nanosegundos"""
+        self.cuentas[_cubeta(ns)] += 1
+        self.total += 1
+        self.suma_ns += ns
+        if ns > self.maximo_ns:
+            self.maximo_ns = ns
+
+    def percentil(self, p: float) -> float:
+        """Percentil p (0-100) aproximado, en nanosegundos"""
+        cuentas = list(self.cuentas)
+        total = sum(cuentas)
+        if total == 0:
+            return 0.0
+
+        objetivo = max(1, int(round(total * p / 100.0)))
+        acumulado = 0
+        for indice, cuenta in enumerate(cuentas):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return min(_valor_cubeta(indice), float(self.maximo_ns))
+        return float(self.maximo_ns)
+
+    def resumen(self) -> Dict:
+        """Conteo, promedio, p50/p95/p99 y máximo en milisegundos"""
+        total = self.total
+        return {
+            'n': total,
+            'promedio_ms': round(self.suma_ns / total / 1e6, 3) if total else 0.0,
+            'p50_ms': round(self.percentil(50) / 1e6, 3),
+            'p95_ms': round(self.percentil(95) / 1e6, 3),
+            'p99_ms': round(self.percentil(99) / 1e6, 3),
+            'max_ms': round(self.maximo_ns / 1e6, 3)
+        }
+
+class InstrumentacionEtapas:
+    """Registro de spans por petición e histogramas por (etapa, contexto)"""
+
+    def __init__(self):
+        self._histogramas: Dict[Tuple[str, str], HistogramaLatencia] = {}
+        self._local = threading.local()
+
+    def iniciar_peticion(self):
+        """Empieza a acumular los spans de la petición del hilo actual"""
+        self._local.spans = []
+
+    @contextmanager
+    def medir(self, etapa: str) -> Iterator[None]:
+        """Mide la duración del bloque como un span de la petición en curso"""
+        inicio = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            spans = getattr(self._local, 'spans', None)
+            if spans is not None:
+                spans.append((etapa, time.perf_counter_ns() - inicio))
+
+    def finalizar_peticion(self, contexto: str, total_ns: int):
+        """Vuelca los spans de la petición en los histogramas de su contexto"""
+        spans = getattr(self._local, 'spans', None) or []
+        self._local.spans = None
+
+        spans.append(('total', total_ns))
+        for etapa, ns in spans:
+            self._histograma(etapa, contexto).registrar(ns)
+            self._histograma(etapa, TODOS_LOS_CONTEXTOS).registrar(ns)
+
+    def _histograma(self, etapa: str, contexto: str) -> HistogramaLatencia:
+        """Histograma de la etapa y contexto (setdefault es atómico bajo el GIL)"""
+        clave = (etapa, contexto)
+        histograma = self._histogramas.get(clave)
+        if histograma is None:
+            histograma = self._histogramas.setdefault(clave, HistogramaLatencia())
+        return histograma
+
+    def resumen(self) -> Dict[str, Dict[str, Dict]]:
+        """Resumen de percentiles por etapa y contexto ('*' agrega todos)"""
+        resultado: Dict[str, Dict[str, Dict]] = {}
+        for (etapa, contexto), histograma in list(self._histogramas.items()):
+            resultado.setdefault(etapa, {})[contexto] = histograma.resumen()
+        return resultado
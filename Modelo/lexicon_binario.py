@@ -0,0 +1,263 @@
+"""
+Léxico binario versionado, abierto con mmap y leído con NumPy
+El archivo se comparte entre procesos (mismas páginas físicas en caché)
+y abrirlo cuesta O(1): no se copia ni se decodifica nada al iniciar. Los
+índices del léxico (trie de completado, borrados del corrector y formas
+acentuadas) se compilan al escribirlo y se consultan sobre el mismo mapeo
+
+Formato (little-endian, secciones alineadas a 8 bytes):
+    cabecera   magic 'LXCO', versión u16, reservado u16, n u64, bytes_pool u64,
+               huella de la tabla palabras: filas u64, último rowid u64, suma de frecuencias u64
+    directorio (inicio u64, cantidad u64) de cada sección de SECCIONES_INDICES
+    offsets    u64[n + 1]  inicio de cada palabra en el pool
+    frecuencia u32[n]
+    contexto   u8[n]       índice en CONTEXTOS_LEXICON
+    banderas   u8[n]       bit 0: requiere tilde, bit 1: colombianismo
+    pool       utf-8       palabras ordenadas por sus bytes
+    índices    secciones de SECCIONES_INDICES, en ese orden
+"""
+
+import mmap
+import os
+import sqlite3
+import struct
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from corrector_ortografico import BorradosCompilados, compilar_borrados
+from indice_acentos import AcentosCompilados, compilar_acentos
+from indice_prefijos import IndicePrefijos, PrefijosCompilados, compilar_prefijos
+
+MAGIC = b'LXCO'
+VERSION_LEXICON = 2
+CABECERA = struct.Struct('<4sHHQQQQQ')
+CONTEXTOS_LEXICON = ('general', 'formal', 'informal', 'academico')
+
+BANDERA_TILDE = 1
+BANDERA_COLOMBIANISMO = 2
+
+# Secciones de índices precompilados y su tipo
+SECCIONES_INDICES = (
+    ('prefijos_hijos_inicio', '<u4'), ('prefijos_caracteres', '<u4'), ('prefijos_destinos', '<u4'),
+    ('prefijos_nodo_listas', '<u4'), ('prefijos_listas_inicio', '<u4'), ('prefijos_listas_ids', '<u4'),
+    ('corrector_huellas', '<u8'), ('corrector_ids', '<u4'), ('corrector_frecuencias', '<u4'),
+    ('borrados_huellas', '<u8'), ('borrados_inicio', '<u4'), ('borrados_entradas', '<u4'),
+    ('acentos_huellas', '<u8'), ('acentos_inicio', '<u4'), ('acentos_formas', '<u4')
+)
+DIRECTORIO = struct.Struct(f'<{2 * len(SECCIONES_INDICES)}Q')
+
+EntradaLexicon = Tuple[str, int, str, bool, bool]
+
+# (filas, último rowid, suma de frecuencias) de la tabla palabras al compilar
+HuellaPalabras = Tuple[int, int, int]
+
+SQL_HUELLA_PALABRAS = """
+    SELECT COUNT(*), COALESCE(MAX(rowid), 0), CAST(TOTAL(frecuencia) AS INTEGER) FROM palabras
+"""
+
+def _alinear(posicion: int) -> int:
+    """Redondea la posición al siguiente múltiplo de 8"""
+    return (posicion + 7) & ~7
+
+def _secciones(n: int) -> Tuple[int, int, int, int, int]:
+    """Posiciones de inicio de cada sección para n palabras"""
+    offsets = _alinear(CABECERA.size + DIRECTORIO.size)
+    frecuencias = _alinear(offsets + 8 * (n + 1))
+    contextos = _alinear(frecuencias + 4 * n)
+    banderas = _alinear(contextos + n)
+    pool = _alinear(banderas + n)
+    return offsets, frecuencias, contextos, banderas, pool
+
+def huella_palabras(conn: sqlite3.Connection) -> HuellaPalabras:
+    """Huella barata de la tabla palabras para saber si el léxico quedó desactualizado"""
+    return tuple(int(valor) for valor in conn.execute(SQL_HUELLA_PALABRAS).fetchone())
+
+def compilar_indices(palabras: List[str], frecuencias: np.ndarray,
+                     contextos: np.ndarray) -> Dict[str, np.ndarray]:
+    """Secciones de índices para las palabras del léxico (en su orden)"""
+    trie = IndicePrefijos()
+    for palabra, frecuencia, contexto in zip(palabras, frecuencias.tolist(), contextos.tolist()):
+        trie.agregar(palabra, max(frecuencia, 1), CONTEXTOS_LEXICON[contexto])
+    indices = compilar_prefijos(trie)
+
+    # El corrector y las formas acentuadas usan solo palabras sueltas; sus ids son posiciones del léxico
+    sueltas = np.array([i for i, palabra in enumerate(palabras) if ' ' not in palabra], dtype=np.int64)
+    corrector = compilar_borrados([palabras[i] for i in sueltas.tolist()],
+                                  np.maximum(frecuencias[sueltas], 1).tolist())
+    corrector['corrector_ids'] = sueltas[corrector['corrector_ids']].astype('<u4')
+    indices.update(corrector)
+
+    indices.update(compilar_acentos([palabras[i] for i in corrector['corrector_ids'].tolist()],
+                                    corrector['corrector_frecuencias'].tolist()))
+    return indices
+
+def escribir_lexicon(ruta: str, entradas: Iterable[EntradaLexicon], huella: HuellaPalabras = (0, 0, 0)):
+    """Escribe el léxico con sus índices de forma atómica (los lectores actuales no se ven afectados)"""
+    unicas = {}
+    for palabra, frecuencia, contexto, requiere_tilde, es_colombianismo in entradas:
+        unicas[palabra.encode('utf-8')] = (frecuencia, contexto, requiere_tilde, es_colombianismo)
+
+    claves = sorted(unicas)
+    n = len(claves)
+
+    offsets = np.zeros(n + 1, dtype='<u8')
+    offsets[1:] = np.cumsum([len(clave) for clave in claves], dtype=np.uint64)
+    frecuencias = np.array([unicas[c][0] or 0 for c in claves], dtype='<u4')
+    contextos = np.array(
+        [CONTEXTOS_LEXICON.index(unicas[c][1]) if unicas[c][1] in CONTEXTOS_LEXICON else 0 for c in claves],
+        dtype=np.uint8
+    )
+    banderas = np.array(
+        [(BANDERA_TILDE if unicas[c][2] else 0) | (BANDERA_COLOMBIANISMO if unicas[c][3] else 0) for c in claves],
+        dtype=np.uint8
+    )
+    pool = b''.join(claves)
+    indices = compilar_indices([clave.decode('utf-8') for clave in claves], frecuencias, contextos)
+
+    posiciones = _secciones(n)
+    directorio_indices = []
+    posicion = _alinear(posiciones[-1] + len(pool))
+    for nombre, tipo in SECCIONES_INDICES:
+        indices[nombre] = np.ascontiguousarray(indices[nombre], dtype=tipo)
+        directorio_indices.extend((posicion, len(indices[nombre])))
+        posicion = _alinear(posicion + indices[nombre].nbytes)
+    temporal = f'{ruta}.tmp{os.getpid()}'
+
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+
+    with open(temporal, 'wb') as archivo:
+        archivo.write(CABECERA.pack(MAGIC, VERSION_LEXICON, 0, n, len(pool), *huella))
+        archivo.write(DIRECTORIO.pack(*directorio_indices))
+        secciones = list(zip(posiciones, (offsets, frecuencias, contextos, banderas, pool)))
+        secciones += [(inicio, indices[nombre]) for inicio, (nombre, _) in
+                      zip(directorio_indices[::2], SECCIONES_INDICES)]
+        for posicion, datos in secciones:
+            archivo.write(b'\0' * (posicion - archivo.tell()))
+            archivo.write(datos if isinstance(datos, bytes) else datos.tobytes())
+
+    os.replace(temporal, ruta)
+
+def compilar_desde_conexion(conn: sqlite3.Connection, ruta: str):
+    """Exporta la tabla palabras de una conexión SQLite abierta al formato binario"""
+    huella = huella_palabras(conn)
+    cursor = conn.execute("""
+        SELECT palabra, frecuencia, contexto, requiere_tilde, es_colombianismo
+        FROM palabras
+    """)
+    escribir_lexicon(ruta, (
+        (palabra, frecuencia or 0, contexto or 'general', bool(tilde), bool(colombianismo))
+        for palabra, frecuencia, contexto, tilde, colombianismo in cursor
+    ), huella)
+
+def compilar_desde_sqlite(db_path: str, ruta: str):
+    """Exporta la tabla palabras de SQLite al formato binario"""
+    conn = sqlite3.connect(db_path)
+    try:
+        compilar_desde_conexion(conn, ruta)
+    finally:
+        conn.close()
+
+class LexiconBinario:
+    """Vista de solo lectura sobre un archivo de léxico mapeado en memoria"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        with open(ruta, 'rb') as archivo:
+            self._mmap = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < CABECERA.size + DIRECTORIO.size:
+            self.cerrar()
+            raise ValueError(f"{ruta} no es un léxico binario")
+
+        magic, version, _, n, bytes_pool, *huella = CABECERA.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.cerrar()
+            raise ValueError(f"{ruta} no es un léxico binario")
+        if version != VERSION_LEXICON:
+            self.cerrar()
+            raise ValueError(f"Versión de léxico {version} no soportada (se esperaba {VERSION_LEXICON})")
+
+        inicio_offsets, inicio_frecuencias, inicio_contextos, inicio_banderas, inicio_pool = _secciones(n)
+        if len(self._mmap) < inicio_pool + bytes_pool:
+            self.cerrar()
+            raise ValueError(f"Léxico {ruta} truncado")
+
+        self.offsets = np.frombuffer(self._mmap, dtype='<u8', count=n + 1, offset=inicio_offsets)
+        self.frecuencias = np.frombuffer(self._mmap, dtype='<u4', count=n, offset=inicio_frecuencias)
+        self.contextos = np.frombuffer(self._mmap, dtype=np.uint8, count=n, offset=inicio_contextos)
+        self.banderas = np.frombuffer(self._mmap, dtype=np.uint8, count=n, offset=inicio_banderas)
+        self._inicio_pool = inicio_pool
+        self._n = n
+        self.huella: HuellaPalabras = tuple(huella)
+
+        # Índices precompilados: vistas sobre el mapeo, sin reconstruir nada
+        directorio = DIRECTORIO.unpack_from(self._mmap, CABECERA.size)
+        self.secciones: Dict[str, np.ndarray] = {}
+        for (nombre, tipo), inicio, cantidad in zip(SECCIONES_INDICES, directorio[::2], directorio[1::2]):
+            if inicio + cantidad * np.dtype(tipo).itemsize > len(self._mmap):
+                self.cerrar()
+                raise ValueError(f"Léxico {ruta} truncado")
+            self.secciones[nombre] = np.frombuffer(self._mmap, dtype=tipo, count=cantidad, offset=inicio)
+
+        self.prefijos = PrefijosCompilados(self.secciones, self)
+        self.borrados = BorradosCompilados(self.secciones, self)
+        self.acentos = AcentosCompilados(self.secciones, self.borrados)
+
+    @classmethod
+    def abrir(cls, ruta: str) -> 'LexiconBinario':
+        """Abre un léxico existente"""
+        return cls(ruta)
+
+    def cerrar(self):
+        """Libera el mapeo de memoria"""
+        self.offsets = self.frecuencias = self.contextos = self.banderas = None
+        if hasattr(self, 'secciones'):
+            self.secciones.clear()
+        self._mmap.close()
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _bytes(self, i: int) -> bytes:
+        """Bytes UTF-8 de la palabra en la posición i"""
+        inicio = self._inicio_pool + int(self.offsets[i])
+        fin = self._inicio_pool + int(self.offsets[i + 1])
+        return self._mmap[inicio:fin]
+
+    def palabra(self, i: int) -> str:
+        """Palabra en la posición i"""
+        return self._bytes(i).decode('utf-8')
+
+    def contexto(self, i: int) -> str:
+        """Contexto de la palabra en la posición i"""
+        return CONTEXTOS_LEXICON[self.contextos[i]]
+
+    def requiere_tilde(self, i: int) -> bool:
+        """Indica si la palabra en la posición i lleva tilde"""
+        return bool(self.banderas[i] & BANDERA_TILDE)
+
+    def es_colombianismo(self, i: int) -> bool:
+        """Indica si la palabra en la posición i es un colombianismo"""
+        return bool(self.banderas[i] & BANDERA_COLOMBIANISMO)
+
+    def buscar(self, palabra: str) -> int:
+        """Posición de la palabra por búsqueda binaria sobre el pool (-1 si no existe)"""
+        clave = palabra.encode('utf-8')
+        inicio, fin = 0, self._n
+        while inicio < fin:
+            medio = (inicio + fin) // 2
+            if self._bytes(medio) < clave:
+                inicio = medio + 1
+            else:
+                fin = medio
+        if inicio < self._n and self._bytes(inicio) == clave:
+            return inicio
+        return -1
+
+    def __iter__(self) -> Iterator[EntradaLexicon]:
+        for i in range(self._n):
+            yield (self.palabra(i), int(self.frecuencias[i]), self.contexto(i),
+                   self.requiere_tilde(i), self.es_colombianismo(i))
@@ -0,0 +1,237 @@
+"""
+Modelo de lenguaje de n-gramas (unigramas, bigramas y trigramas)
+Los n-gramas se guardan en arreglos NumPy ordenados por historia y se
+consultan con búsqueda binaria, sin diccionarios por n-grama
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils import tokenizar
+
+ORDEN_MAXIMO = 3
+
+class ModeloNgramas:
+    """Modelo de n-gramas con suavizado 'stupid backoff' sobre arreglos ordenados"""
+
+    FACTOR_RETROCESO = 0.4
+
+    def __init__(self, vocabulario: List[str], unigramas: np.ndarray,
+                 ngramas: Optional[Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None):
+        self.vocabulario = vocabulario
+        self.ids = {palabra: i for i, palabra in enumerate(vocabulario)}
+        self.unigramas = unigramas.astype(np.int64, copy=False)
+
+        # Por orden n: historias (int64 ordenadas), siguiente palabra (int32) y cuentas
+        self.historias: Dict[int, np.ndarray] = {}
+        self.siguientes: Dict[int, np.ndarray] = {}
+        self.cuentas: Dict[int, np.ndarray] = {}
+        self._acumulado: Dict[int, np.ndarray] = {}
+
+        for orden, (historias, siguientes, cuentas) in (ngramas or {}).items():
+            self.historias[orden] = historias.astype(np.int64, copy=False)
+            self.siguientes[orden] = siguientes.astype(np.int32, copy=False)
+            self.cuentas[orden] = cuentas.astype(np.int64, copy=False)
+            self._acumulado[orden] = np.concatenate(([0], np.cumsum(self.cuentas[orden])))
+
+        maximo = int(self.unigramas.max()) if len(self.unigramas) else 0
+        self._log_maximo = np.log1p(maximo) if maximo > 0 else 1.0
+
+        # Frecuencia 0-100 precalculada por id: frecuencia() y puntajes() leen la misma columna
+        self._frecuencias = 100.0 * np.log1p(self.unigramas) / self._log_maximo
+
+    def __len__(self) -> int:
+        return len(self.vocabulario)
+
+    @classmethod
+    def entrenar(cls, textos: Iterable[str], unigramas_extra: Optional[Dict[str, int]] = None,
+                 orden_maximo: int = ORDEN_MAXIMO) -> 'ModeloNgramas':
+        """Entrena el modelo contando n-gramas sobre un corpus de textos"""
+        conteos: Counter = Counter()
+
+        for texto in textos:
+            tokens = tuple(tokenizar(texto))
+            for n in range(1, orden_maximo + 1):
+                for i in range(len(tokens) - n + 1):
+                    conteos[tokens[i:i + n]] += 1
+
+        for palabra, frecuencia in (unigramas_extra or {}).items():
+            conteos[(palabra.lower(),)] += frecuencia
+
+        return cls.desde_conteos(conteos)
+
+    @classmethod
+    def desde_conteos(cls, conteos: Dict[Tuple[str, ...], int]) -> 'ModeloNgramas':
+        """Construye los arreglos ordenados a partir de conteos de n-gramas"""
+        vocabulario = sorted({palabra for ngrama in conteos for palabra in ngrama})
+        ids = {palabra: i for i, palabra in enumerate(vocabulario)}
+        tamano = len(vocabulario)
+
+        unigramas = np.zeros(tamano, dtype=np.int64)
+        filas: Dict[int, List[Tuple[int, int, int]]] = {}
+
+        for ngrama, cuenta in conteos.items():
+            if len(ngrama) == 1:
+                unigramas[ids[ngrama[0]]] += cuenta
+                continue
+
+            historia = 0
+            for palabra in ngrama[:-1]:
+                historia = historia * tamano + ids[palabra]
+            filas.setdefault(len(ngrama), []).append((historia, ids[ngrama[-1]], cuenta))
+
+        ngramas = {}
+        for orden, datos in filas.items():
+            arreglo = np.array(datos, dtype=np.int64).reshape(-1, 3)
+            indice = np.lexsort((arreglo[:, 1], arreglo[:, 0]))
+            arreglo = arreglo[indice]
+            ngramas[orden] = (arreglo[:, 0], arreglo[:, 1], arreglo[:, 2])
+
+        return cls(vocabulario, unigramas, ngramas)
+
+    def guardar(self, ruta: str):
+        """Guarda el modelo en un archivo .npz sin compresión"""
+        arreglos = {
+            'vocabulario': np.frombuffer('\n'.join(self.vocabulario).encode('utf-8'), dtype=np.uint8),
+            'unigramas': self.unigramas
+        }
+        for orden in self.historias:
+            arreglos[f'historias_{orden}'] = self.historias[orden]
+            arreglos[f'siguientes_{orden}'] = self.siguientes[orden]
+            arreglos[f'cuentas_{orden}'] = self.cuentas[orden]
+
+        np.savez(ruta, **arreglos)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> 'ModeloNgramas':
+        """Carga un modelo guardado con guardar()"""
+        with np.load(ruta) as datos:
+            texto = datos['vocabulario'].tobytes().decode('utf-8')
+            vocabulario = texto.split('\n') if texto else []
+
+            ngramas = {}
+            for orden in range(2, ORDEN_MAXIMO + 1):
+                if f'historias_{orden}' in datos:
+                    ngramas[orden] = (datos[f'historias_{orden}'],
+                                      datos[f'siguientes_{orden}'],
+                                      datos[f'cuentas_{orden}'])
+
+            return cls(vocabulario, datos['unigramas'], ngramas)
+
+    def _codificar_historia(self, ids: List[int]) -> int:
+        """Codifica una historia de ids como un entero int64"""
+        historia = 0
+        for palabra_id in ids:
+            historia = historia * len(self.vocabulario) + palabra_id
+        return historia
+
+    def _rango(self, orden: int, ids: List[int]) -> Tuple[int, int]:
+        """Rango [inicio, fin) de las entradas con la historia dada (búsqueda binaria)"""
+        historias = self.historias.get(orden)
+        if historias is None:
+            return 0, 0
+
+        historia = self._codificar_historia(ids)
+        inicio = int(np.searchsorted(historias, historia, side='left'))
+        fin = int(np.searchsorted(historias, historia, side='right'))
+        return inicio, fin
+
+    def _ids_historia(self, historia: List[str]) -> List[int]:
+        """Convierte las últimas palabras de la historia en ids (-1 si son desconocidas)"""
+        return [self.ids.get(palabra.lower(), -1) for palabra in historia[-(ORDEN_MAXIMO - 1):]]
+
+    def frecuencia(self, palabra: str) -> float:
+        """Frecuencia de unigrama en escala logarítmica 0-100"""
+        palabra_id = self.ids.get(palabra.lower())
+        if palabra_id is None:
+            return 0.0
+        return float(self._frecuencias[palabra_id])
+
+    def puntaje(self, palabra: str, historia: List[str]) -> float:
+        """Puntaje 0-100 de la palabra dada la historia con 'stupid backoff'"""
+        palabra_id = self.ids.get(palabra.lower())
+        if palabra_id is None:
+            return 0.0
+
+        ids = self._ids_historia(historia)
+        factor = 1.0
+
+        while ids:
+            if -1 not in ids:
+                orden = len(ids) + 1
+                inicio, fin = self._rango(orden, ids)
+                if fin > inicio:
+                    siguientes = self.siguientes[orden][inicio:fin]
+                    posicion = int(np.searchsorted(siguientes, palabra_id))
+                    if posicion < len(siguientes) and siguientes[posicion] == palabra_id:
+                        total = self._acumulado[orden][fin] - self._acumulado[orden][inicio]
+                        cuenta = self.cuentas[orden][inicio + posicion]
+                        return float(100.0 * factor * cuenta / total)
+            factor *= self.FACTOR_RETROCESO
+            ids = ids[1:]
+
+        return factor * self.frecuencia(palabra)
+
+    def puntajes(self, ids: np.ndarray, ids_historia: Sequence[int]) -> np.ndarray:
+        """puntaje() en bloque para un arreglo de ids del modelo (-1 si es desconocida)
+
+        ids_historia son ids del modelo de la historia (-1 para palabras desconocidas)
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        resultado = np.zeros(len(ids), dtype=np.float64)
+        pendientes = ids >= 0
+
+        ids_historia = [int(i) for i in ids_historia[-(ORDEN_MAXIMO - 1):]] if len(ids_historia) else []
+        factor = 1.0
+
+        while ids_historia and pendientes.any():
+            if -1 not in ids_historia:
+                orden = len(ids_historia) + 1
+                inicio, fin = self._rango(orden, ids_historia)
+                if fin > inicio:
+                    siguientes = self.siguientes[orden][inicio:fin]
+                    posiciones = np.minimum(np.searchsorted(siguientes, ids), len(siguientes) - 1)
+                    encontrados = pendientes & (siguientes[posiciones] == ids)
+
+                    total = self._acumulado[orden][fin] - self._acumulado[orden][inicio]
+                    cuentas = self.cuentas[orden][inicio + posiciones[encontrados]]
+                    resultado[encontrados] = 100.0 * factor * cuentas / total
+                    pendientes &= ~encontrados
+            factor *= self.FACTOR_RETROCESO
+            ids_historia = ids_historia[1:]
+
+        resultado[pendientes] = factor * self._frecuencias[ids[pendientes]]
+        return resultado
+
+    def siguientes_palabras(self, historia: List[str], k: int = 10) -> List[Tuple[str, float]]:
+        """Las k palabras más probables después de la historia, de mayor a menor"""
+        return [(self.vocabulario[i], puntaje) for i, puntaje in self.siguientes_ids(self._ids_historia(historia), k)]
+
+    def siguientes_ids(self, ids_historia: Sequence[int], k: int = 10) -> List[Tuple[int, float]]:
+        """Como siguientes_palabras(), con historia e ids del modelo"""
+        ids = [int(i) for i in ids_historia[-(ORDEN_MAXIMO - 1):]] if len(ids_historia) else []
+        resultado: Dict[int, float] = {}
+        factor = 1.0
+
+        while ids and len(resultado) < k:
+            if -1 not in ids:
+                orden = len(ids) + 1
+                inicio, fin = self._rango(orden, ids)
+                if fin > inicio:
+                    cuentas = self.cuentas[orden][inicio:fin]
+                    total = float(cuentas.sum())
+                    if len(cuentas) > k:
+                        mejores = np.argpartition(-cuentas, k)[:k]
+                    else:
+                        mejores = np.arange(len(cuentas))
+                    for posicion in mejores:
+                        palabra_id = int(self.siguientes[orden][inicio + posicion])
+                        if palabra_id not in resultado:
+                            resultado[palabra_id] = 100.0 * factor * cuentas[posicion] / total
+            factor *= self.FACTOR_RETROCESO
+            ids = ids[1:]
+
+        ordenados = sorted(resultado.items(), key=lambda item: -item[1])[:k]
+        return [(i, float(puntaje)) for i, puntaje in ordenados]
@@ -0,0 +1,438 @@
+"""
+Modelos de lenguaje por usuario (unigramas y bigramas) que se interpolan con
+el modelo global al puntuar
+Se aprenden de las sugerencias aceptadas y del texto escrito. Viven en memoria
+con desalojo LRU bajo un presupuesto global de bytes; los usuarios desalojados
+se guardan en disco desde un hilo en segundo plano y se cargan de nuevo al
+volver. La lectura y escritura de archivos nunca ocurre con el lock del gestor
+tomado, así que cargar o desalojar a un usuario no frena a los demás
+"""
+
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from modelo_ngramas import ModeloNgramas
+from vocabulario import VOCABULARIO
+
+logger = logging.getLogger(__name__)
+
+# Costo aproximado en memoria de una entrada de diccionario (clave, valor y ranura)
+BYTES_POR_ENTRADA = 120
+
+# Peso máximo del modelo del usuario y total de eventos con el que, sin bigramas
+# de la palabra previa, llega a la mitad de ese máximo
+PESO_MAXIMO = 0.8
+TOTAL_MEDIO = 50.0
+
+# Marca de fin para detener el hilo escritor
+_FIN = object()
+
+def _clave_bigrama(previo: int, siguiente: int) -> int:
+    return (previo << 32) | siguiente
+
+class _Tablas:
+    """Cuentas de un modelo y sus derivados; podar() publica unas nuevas en un solo cambio de referencia"""
+
+    __slots__ = ('unigramas', 'bigramas', 'salidas', 'siguientes', 'total', 'maximo_unigrama')
+
+    def __init__(self, unigramas: Optional[Dict[int, float]] = None, bigramas: Optional[Dict[int, float]] = None):
+        self.unigramas: Dict[int, float] = unigramas or {}
+        self.bigramas: Dict[int, float] = bigramas or {}
+        # Total de bigramas por palabra previa y siguientes conocidas de cada una
+        self.salidas: Dict[int, float] = {}
+        self.siguientes: Dict[int, List[int]] = {}
+        self.total = float(sum(self.unigramas.values()))
+        self.maximo_unigrama = max(self.unigramas.values(), default=0.0)
+
+        for clave, cuenta in self.bigramas.items():
+            previo, siguiente = clave >> 32, clave & 0xFFFFFFFF
+            self.salidas[previo] = self.salidas.get(previo, 0.0) + cuenta
+            self.siguientes.setdefault(previo, []).append(siguiente)
+
+class ModeloUsuario:
+    """Cuentas de unigramas y bigramas de un usuario sobre ids del vocabulario global
+
+    Las escrituras toman self.lock; las lecturas no: toman self.tablas una
+    vez y, como observar() agrega cada bigrama antes de listarlo en
+    siguientes, nunca ven una palabra siguiente sin su cuenta
+    """
+
+    def __init__(self, tablas: Optional[_Tablas] = None):
+        self.tablas = tablas or _Tablas()
+        self.lock = threading.Lock()
+        self.modificado = False
+
+    def __len__(self) -> int:
+        tablas = self.tablas
+        return len(tablas.unigramas) + len(tablas.bigramas)
+
+    @property
+    def total(self) -> float:
+        """Eventos observados (suma de pesos)"""
+        return self.tablas.total
+
+    def bytes_estimados(self) -> int:
+        """Memoria aproximada del modelo"""
+        tablas = self.tablas
+        return BYTES_POR_ENTRADA * (len(tablas.unigramas) + 2 * len(tablas.bigramas) + len(tablas.salidas))
+
+    def peso(self, previo: int = -1) -> float:
+        """Peso del modelo en la interpolación, según la evidencia que tiene para previo
+
+        Con bigramas de previo es el de Witten-Bell, c(previo) / (c(previo) + siguientes
+        distintos); sin ellos crece con el total de eventos observados
+        """
+        tablas = self.tablas
+        salidas = tablas.salidas.get(previo, 0.0) if previo >= 0 else 0.0
+        if salidas:
+            return PESO_MAXIMO * salidas / (salidas + len(tablas.siguientes.get(previo, ())))
+        return PESO_MAXIMO * tablas.total / (tablas.total + TOTAL_MEDIO)
+
+    def observar(self, ids: Sequence[int], peso: float = 1.0, previo: int = -1):
+        """Suma una secuencia de palabras; previo es la palabra anterior a la secuencia"""
+        with self.lock:
+            tablas = self.tablas
+            for palabra_id in ids:
+                palabra_id = int(palabra_id)
+                if palabra_id < 0:
+                    previo = -1
+                    continue
+
+                cuenta = tablas.unigramas.get(palabra_id, 0.0) + peso
+                tablas.unigramas[palabra_id] = cuenta
+                tablas.maximo_unigrama = max(tablas.maximo_unigrama, cuenta)
+                tablas.total += peso
+
+                if previo >= 0:
+                    clave = _clave_bigrama(previo, palabra_id)
+                    nuevo = clave not in tablas.bigramas
+                    tablas.bigramas[clave] = tablas.bigramas.get(clave, 0.0) + peso
+                    tablas.salidas[previo] = tablas.salidas.get(previo, 0.0) + peso
+                    if nuevo:
+                        tablas.siguientes.setdefault(previo, []).append(palabra_id)
+                previo = palabra_id
+
+            self.modificado = True
+
+    def puntajes(self, ids: np.ndarray, previo: int) -> np.ndarray:
+        """Puntaje 0-100 de cada id en la escala del modelo global ('stupid backoff')"""
+        tablas = self.tablas
+        salidas = tablas.salidas.get(previo, 0.0) if previo >= 0 else 0.0
+        if salidas:
+            bigramas = tablas.bigramas
+            base = previo << 32
+            cuentas = np.fromiter((bigramas.get(base | palabra_id, 0.0) for palabra_id in ids.tolist()),
+                                  dtype=np.float64, count=len(ids))
+            if cuentas.any():
+                respaldo = self._puntajes_unigrama(tablas, ids) * ModeloNgramas.FACTOR_RETROCESO
+                return np.where(cuentas > 0, 100.0 * cuentas / salidas, respaldo)
+
+        factor = ModeloNgramas.FACTOR_RETROCESO if previo >= 0 else 1.0
+        return self._puntajes_unigrama(tablas, ids) * factor
+
+    @staticmethod
+    def _puntajes_unigrama(tablas: _Tablas, ids: np.ndarray) -> np.ndarray:
+        """Frecuencia 0-100 en escala logarítmica, como ModeloNgramas.frecuencia()"""
+        maximo = tablas.maximo_unigrama
+        if not maximo:
+            return np.zeros(len(ids), dtype=np.float64)
+        unigramas = tablas.unigramas
+        cuentas = np.fromiter((unigramas.get(palabra_id, 0.0) for palabra_id in ids.tolist()),
+                              dtype=np.float64, count=len(ids))
+        return 100.0 * np.log1p(cuentas) / np.log1p(maximo)
+
+    def siguientes_ids(self, previo: int, k: int = 10) -> List[int]:
+        """Las k palabras que el usuario más escribe después de previo"""
+        tablas = self.tablas
+        siguientes = tablas.siguientes.get(previo)
+        if not siguientes:
+            return []
+        bigramas = tablas.bigramas
+        base = previo << 32
+        return sorted(list(siguientes), key=lambda palabra_id: -bigramas.get(base | palabra_id, 0.0))[:k]
+
+    def podar(self, maximo: int):
+        """Si supera maximo entradas, conserva la mitad más frecuente de cada tabla"""
+        if len(self) <= maximo:
+            return
+
+        def mitad_superior(cuentas: Dict[int, float]) -> Dict[int, float]:
+            conservar = sorted(cuentas.items(), key=lambda item: -item[1])[:max(1, len(cuentas) // 2)]
+            return dict(conservar)
+
+        with self.lock:
+            tablas = self.tablas
+            self.tablas = _Tablas(mitad_superior(tablas.unigramas), mitad_superior(tablas.bigramas))
+            self.modificado = True
+
+    def _instantanea(self) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """Copia de las cuentas para escribirlas sin el lock; el modelo queda como guardado"""
+        with self.lock:
+            tablas = self.tablas
+            self.modificado = False
+            return dict(tablas.unigramas), dict(tablas.bigramas)
+
+    def guardar(self, ruta: str):
+        """Guarda el modelo con las palabras como texto (los ids son propios del proceso)"""
+        unigramas, bigramas = self._instantanea()
+        try:
+            ids = sorted(set(unigramas) | {clave >> 32 for clave in bigramas} |
+                         {clave & 0xFFFFFFFF for clave in bigramas})
+            local = {palabra_id: i for i, palabra_id in enumerate(ids)}
+
+            claves = list(bigramas)
+            temporal = ruta + '.tmp'
+            with open(temporal, 'wb') as archivo:
+                np.savez(
+                    archivo,
+                    vocabulario=np.frombuffer('\n'.join(VOCABULARIO.palabras(ids)).encode('utf-8'), dtype=np.uint8),
+                    unigramas_ids=np.array([local[i] for i in unigramas], dtype=np.int32),
+                    unigramas_cuentas=np.array(list(unigramas.values()), dtype=np.float64),
+                    bigramas_previos=np.array([local[clave >> 32] for clave in claves], dtype=np.int32),
+                    bigramas_siguientes=np.array([local[clave & 0xFFFFFFFF] for clave in claves], dtype=np.int32),
+                    bigramas_cuentas=np.array([bigramas[clave] for clave in claves], dtype=np.float64)
+                )
+            os.replace(temporal, ruta)
+        except Exception:
+            self.modificado = True
+            raise
+
+    @classmethod
+    def cargar(cls, ruta: str) -> 'ModeloUsuario':
+        """Carga un modelo guardado con guardar()"""
+        with np.load(ruta) as datos:
+            texto = datos['vocabulario'].tobytes().decode('utf-8')
+            ids = VOCABULARIO.ids(texto.split('\n') if texto else [])
+
+            unigramas = dict(zip(ids[datos['unigramas_ids']].tolist(), datos['unigramas_cuentas'].tolist()))
+            previos = ids[datos['bigramas_previos']].astype(np.int64)
+            siguientes = ids[datos['bigramas_siguientes']].astype(np.int64)
+            bigramas = dict(zip(((previos << 32) | siguientes).tolist(), datos['bigramas_cuentas'].tolist()))
+
+        # Palabras que ya no caben en el vocabulario global quedan con id (y clave) negativo
+        return cls(_Tablas({i: c for i, c in unigramas.items() if i >= 0},
+                           {k: c for k, c in bigramas.items() if k >= 0}))
+
+class GestorModelosUsuario:
+    """Modelos por usuario en memoria (LRU con presupuesto de bytes) con respaldo en disco
+
+    El lock solo protege la contabilidad. Un usuario que se está cargando o
+    escribiendo queda marcado con un evento: quien lo pida espera ese evento,
+    sin bloquear a los demás usuarios
+    """
+
+    def __init__(self, directorio: str, presupuesto_bytes: int = 64 * 1024 * 1024,
+                 maximo_entradas_usuario: int = 50_000):
+        self.directorio = directorio
+        self.presupuesto_bytes = presupuesto_bytes
+        self.maximo_entradas_usuario = maximo_entradas_usuario
+
+        self._modelos: 'OrderedDict[str, ModeloUsuario]' = OrderedDict()
+        self._bytes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._ocupados: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+        self._cola: queue.Queue = queue.Queue()
+        self._hilo = threading.Thread(target=self._ejecutar, name='escritor-modelos-usuario', daemon=True)
+        self._detenido = False
+
+        self.cargados = 0
+        self.guardados = 0
+        self.errores = 0
+
+    def __len__(self) -> int:
+        return len(self._modelos)
+
+    def iniciar(self):
+        """Arranca el hilo que escribe en disco a los usuarios desalojados"""
+        self._hilo.start()
+
+    def _ruta(self, usuario: str) -> str:
+        nombre = hashlib.sha1(usuario.encode('utf-8')).hexdigest()
+        return os.path.join(self.directorio, f'{nombre}.npz')
+
+    def obtener(self, usuario: str) -> ModeloUsuario:
+        """Modelo del usuario: en memoria, desde disco o vacío"""
+        while True:
+            with self._lock:
+                modelo = self._modelos.get(usuario)
+                if modelo is not None:
+                    self._modelos.move_to_end(usuario)
+                    return modelo
+                ocupado = self._ocupados.get(usuario)
+                if ocupado is None:
+                    ocupado = self._ocupados[usuario] = threading.Event()
+                    break
+            # Otro hilo lo está cargando o escribiendo: se espera y se reintenta
+            ocupado.wait()
+
+        desalojados: List[Tuple[str, ModeloUsuario]] = []
+        try:
+            modelo = self._cargar(usuario)
+            with self._lock:
+                self._modelos[usuario] = modelo
+                self._actualizar_bytes(usuario, modelo)
+                del self._ocupados[usuario]
+                desalojados = self._desalojar()
+        except BaseException:
+            with self._lock:
+                self._ocupados.pop(usuario, None)
+            raise
+        finally:
+            ocupado.set()
+
+        self._encolar(desalojados)
+        return modelo
+
+    def _cargar(self, usuario: str) -> ModeloUsuario:
+        """Carga perezosa de un usuario que no está en memoria (sin el lock)"""
+        ruta = self._ruta(usuario)
+        if os.path.exists(ruta):
+            try:
+                modelo = ModeloUsuario.cargar(ruta)
+                with self._lock:
+                    self.cargados += 1
+                return modelo
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Modelo de usuario ilegible en {ruta}, se reinicia: {e}")
+        return ModeloUsuario()
+
+    def aprender(self, usuario: str, ids: Sequence[int], peso: float = 1.0, previo: int = -1):
+        """Suma palabras al modelo del usuario y aplica el presupuesto de memoria
+
+        Otro hilo puede desalojar el modelo entre obtener() y observar(): si quedó
+        fuera con cambios sin guardar, vuelve a memoria; si ya se recargó una
+        copia del disco, las palabras se aprenden de nuevo sobre ella
+        """
+        modelo = self.obtener(usuario)
+        modelo.observar(ids, peso, previo)
+        modelo.podar(self.maximo_entradas_usuario)
+
+        while True:
+            with self._lock:
+                actual = self._modelos.get(usuario)
+                ocupado = self._ocupados.get(usuario)
+                if actual is modelo or (modelo.modificado and actual is None and ocupado is None):
+                    self._modelos[usuario] = modelo
+                    self._actualizar_bytes(usuario, modelo)
+                    desalojados = self._desalojar()
+                    break
+                if not modelo.modificado:
+                    # El hilo escritor ya guardó lo aprendido
+                    return
+
+            if actual is not None:
+                return self.aprender(usuario, ids, peso, previo)
+            # Se está escribiendo o cargando: se espera y se vuelve a revisar
+            ocupado.wait()
+
+        self._encolar(desalojados)
+
+    def _actualizar_bytes(self, usuario: str, modelo: ModeloUsuario):
+        tamano = modelo.bytes_estimados()
+        self._total_bytes += tamano - self._bytes.get(usuario, 0)
+        self._bytes[usuario] = tamano
+
+    def _desalojar(self) -> List[Tuple[str, ModeloUsuario]]:
+        """Saca de memoria a los usuarios menos recientes sobre el presupuesto (con el lock tomado)
+
+        Devuelve los modificados, que quedan marcados hasta que el hilo escritor los guarde
+        """
+        desalojados = []
+        while self._total_bytes > self.presupuesto_bytes and len(self._modelos) > 1:
+            usuario, modelo = self._modelos.popitem(last=False)
+            self._total_bytes -= self._bytes.pop(usuario, 0)
+            if modelo.modificado:
+                self._ocupados[usuario] = threading.Event()
+                desalojados.append((usuario, modelo))
+        return desalojados
+
+    def _encolar(self, desalojados: List[Tuple[str, ModeloUsuario]]):
+        for desalojado in desalojados:
+            self._cola.put(desalojado)
+
+    def _ejecutar(self):
+        """Bucle del hilo escritor"""
+        while True:
+            elemento = self._cola.get()
+            try:
+                if elemento is _FIN:
+                    return
+                self._escribir_desalojado(*elemento)
+            finally:
+                self._cola.task_done()
+
+    def _escribir_desalojado(self, usuario: str, modelo: ModeloUsuario):
+        """Guarda un usuario desalojado; si falla, vuelve a memoria para no perderlo"""
+        guardado = self._guardar(usuario, modelo)
+        # Un hilo que ya tenía el modelo pudo aprender después de la copia
+        while guardado and modelo.modificado:
+            guardado = self._guardar(usuario, modelo)
+        with self._lock:
+            if not guardado:
+                self._modelos[usuario] = modelo
+                self._actualizar_bytes(usuario, modelo)
+            ocupado = self._ocupados.pop(usuario, None)
+        if ocupado is not None:
+            ocupado.set()
+
+    def _guardar(self, usuario: str, modelo: ModeloUsuario) -> bool:
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            modelo.guardar(self._ruta(usuario))
+            with self._lock:
+                self.guardados += 1
+            return True
+        except Exception as e:
+            with self._lock:
+                self.errores += 1
+            logger.error(f"No se pudo guardar el modelo del usuario {usuario}: {e}")
+            return False
+
+    def vaciar(self, timeout: float = 5.0) -> bool:
+        """Espera a que se escriban los usuarios desalojados pendientes"""
+        limite = time.monotonic() + timeout
+        while self._cola.unfinished_tasks and time.monotonic() < limite:
+            time.sleep(0.005)
+        return not self._cola.unfinished_tasks
+
+    def detener(self, timeout: float = 5.0):
+        """Escribe los desalojados pendientes y los modelos modificados en memoria (al cerrar el agente)"""
+        if self._detenido:
+            return
+        self._detenido = True
+
+        if self._hilo.is_alive():
+            self._cola.put(_FIN)
+            self._hilo.join(timeout)
+        else:
+            while not self._cola.empty():
+                elemento = self._cola.get_nowait()
+                if elemento is not _FIN:
+                    self._escribir_desalojado(*elemento)
+
+        with self._lock:
+            modificados = [(usuario, modelo) for usuario, modelo in self._modelos.items() if modelo.modificado]
+        for usuario, modelo in modificados:
+            self._guardar(usuario, modelo)
+
+    def estadisticas(self) -> Dict:
+        """Ocupación de memoria y movimientos a disco"""
+        return {
+            'en_memoria': len(self._modelos),
+            'bytes': self._total_bytes,
+            'presupuesto_bytes': self.presupuesto_bytes,
+            'escrituras_pendientes': self._cola.qsize(),
+            'cargados_de_disco': self.cargados,
+            'guardados_en_disco': self.guardados,
+            'errores': self.errores
+        }
@@ -0,0 +1,106 @@
+"""
+Monitor de salud del agente para las sondas de liveness/readiness
+Un hilo en segundo plano revisa periódicamente los componentes (base de datos,
+léxico, cola de feedback, última predicción) y publica una instantánea que las
+sondas leen sin hacer trabajo: cada consulta es O(1)
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ocupación de la cola de feedback a partir de la cual el agente no está listo
+OCUPACION_MAXIMA_COLA = 90.0
+
+class MonitorSalud:
+    """Hilo que refresca el estado de los componentes del agente"""
+
+    def __init__(self, agente, intervalo_s: float = 5.0):
+        self.agente = agente
+        self.intervalo_s = intervalo_s
+
+        self._estado: Dict = {'listo': False, 'componentes': {}, 'actualizado': None}
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._ejecutar, name='monitor-salud', daemon=True)
+
+    def iniciar(self):
+        """Hace una primera revisión y arranca el hilo"""
+        self.revisar()
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        """Detiene el hilo de revisión"""
+        self._parar.set()
+        if self._hilo.is_alive():
+            self._hilo.join(timeout)
+
+    def _ejecutar(self):
+        """Bucle del hilo: revisa cada intervalo hasta que se detenga"""
+        while not self._parar.wait(self.intervalo_s):
+            self.revisar()
+
+    def revisar(self) -> Dict:
+        """Revisa los componentes y publica la instantánea (reemplazo atómico)"""
+        componentes = {
+            'base_datos': self._revisar_base_datos(),
+            'lexicon': self._revisar_lexicon(),
+            'cola_feedback': self._revisar_cola_feedback(),
+            'ultima_prediccion': self._revisar_ultima_prediccion()
+        }
+
+        estado = {
+            'listo': all(componente['ok'] for componente in componentes.values()),
+            'componentes': componentes,
+            'actualizado': time.time()
+        }
+        self._estado = estado
+        return estado
+
+    def _revisar_base_datos(self) -> Dict:
+        """Comprueba que la base de datos responde"""
+        inicio = time.perf_counter()
+        try:
+            self.agente.bd.consultar_uno("SELECT 1")
+            return {'ok': True, 'latencia_ms': round((time.perf_counter() - inicio) * 1000, 3)}
+        except Exception as e:
+            logger.warning(f"Base de datos no accesible: {e}")
+            return {'ok': False, 'error': str(e)}
+
+    def _revisar_lexicon(self) -> Dict:
+        """Comprueba que el léxico binario está cargado"""
+        lexicon = self.agente.lexicon
+        if lexicon is None:
+            return {'ok': False, 'palabras': 0}
+        return {'ok': len(lexicon) > 0, 'palabras': len(lexicon)}
+
+    def _revisar_cola_feedback(self) -> Dict:
+        """Profundidad de la cola de feedback y estado del hilo escritor"""
+        estadisticas = self.agente.escritor_feedback.estadisticas()
+        return {
+            'ok': estadisticas['ocupacion'] < OCUPACION_MAXIMA_COLA,
+            'pendientes': estadisticas['pendientes'],
+            'ocupacion': estadisticas['ocupacion']
+        }
+
+    def _revisar_ultima_prediccion(self) -> Dict:
+        """Latencia y antigüedad de la última predicción exitosa (informativo)"""
+        ultima = self.agente.ultima_prediccion
+        if ultima is None:
+            return {'ok': True, 'latencia_ms': None, 'hace_s': None}
+
+        latencia_ms, marca = ultima
+        return {'ok': True, 'latencia_ms': round(latencia_ms, 3), 'hace_s': round(time.time() - marca, 1)}
+
+    def vivo(self) -> bool:
+        """Liveness: el hilo de revisión sigue corriendo"""
+        return self._hilo.is_alive()
+
+    def estado(self) -> Dict:
+        """Última instantánea publicada, marcada como no lista si está desactualizada"""
+        estado = self._estado
+        actualizado: Optional[float] = estado['actualizado']
+        vigente = actualizado is not None and time.time() - actualizado < 3 * self.intervalo_s
+        return dict(estado, listo=estado['listo'] and vigente, vigente=vigente)
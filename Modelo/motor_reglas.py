@@ -0,0 +1,363 @@
+"""
+Motor de encadenamiento hacia adelante incremental para los axiomas FOL
+Cada axioma ("A(x,y) ∧ ¬B(x) → C(y,x)") se compila en planes de join, uno por
+átomo desde el que puede llegar un hecho nuevo. Las conclusiones se
+materializan con su número de soportes: al afirmar o retirar un hecho solo se
+recorren los enlaces que lo contienen (estilo Rete) y consultar una conclusión
+es un acceso a la relación derivada
+"""
+
+import json
+import logging
+import re
+import threading
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from base_hechos import ConjuntoBits, Relacion
+
+logger = logging.getLogger(__name__)
+
+Almacen = Union[ConjuntoBits, Relacion]
+
+_PATRON_ATOMO = re.compile(r'^(¬|!|~|not\s+)?\s*(\w+)\s*\(([^)]*)\)$')
+_CONJUNCION = re.compile(r'\s*(?:∧|\^|&|\band\b)\s*')
+_IMPLICACION = re.compile(r'\s*(?:→|->|=>)\s*')
+
+class Atomo(NamedTuple):
+    """Predicado aplicado a variables, posiblemente negado"""
+    predicado: str
+    variables: Tuple[str, ...]
+    negado: bool = False
+
+def parsear_atomo(texto: str) -> Atomo:
+    """Átomo a partir de su texto ("¬Concordancia(p1,p2)")"""
+    coincidencia = _PATRON_ATOMO.match(texto.strip())
+    if not coincidencia:
+        raise ValueError(f"Átomo inválido: {texto!r}")
+    negacion, predicado, argumentos = coincidencia.groups()
+    variables = tuple(argumento.strip() for argumento in argumentos.split(',') if argumento.strip())
+    return Atomo(predicado, variables, negacion is not None)
+
+class Regla:
+    """Axioma compilado: condiciones, conclusión y un plan de join por átomo semilla"""
+
+    def __init__(self, texto: str, condiciones: List[Atomo], conclusion: Atomo):
+        self.texto = texto
+        self.condiciones = condiciones
+        self.conclusion = conclusion
+        self.positivas = [atomo for atomo in condiciones if not atomo.negado]
+        # (semilla o None) -> orden de las condiciones positivas restantes
+        self.planes: Dict[Optional[int], List[Atomo]] = {}
+
+    def __repr__(self) -> str:
+        return f"Regla({self.texto!r})"
+
+    @classmethod
+    def compilar(cls, texto: str) -> 'Regla':
+        """Compila el texto de un axioma"""
+        partes = _IMPLICACION.split(texto.strip())
+        if len(partes) != 2:
+            raise ValueError(f"El axioma debe tener una implicación: {texto!r}")
+
+        condiciones = [parsear_atomo(parte) for parte in _CONJUNCION.split(partes[0]) if parte.strip()]
+        conclusion = parsear_atomo(partes[1])
+        if conclusion.negado:
+            raise ValueError(f"La conclusión no puede ser negada: {texto!r}")
+
+        regla = cls(texto, condiciones, conclusion)
+        ligables = {variable for atomo in regla.positivas for variable in atomo.variables}
+        libres = [variable for atomo in condiciones + [conclusion] for variable in atomo.variables
+                  if variable not in ligables]
+        if libres:
+            raise ValueError(f"Variables sin condición positiva en {texto!r}: {libres}")
+        return regla
+
+    def planificar(self, es_funcion: Callable[[str], bool]):
+        """Ordena los joins para cada semilla: primero el átomo con más variables ya ligadas"""
+        atomos = [atomo for atomo in self.positivas if not es_funcion(atomo.predicado)]
+        semillas: List[Optional[int]] = [None] + [
+            i for i, atomo in enumerate(self.condiciones) if not es_funcion(atomo.predicado)
+        ]
+
+        for semilla in semillas:
+            ligadas = set(self.condiciones[semilla].variables) if semilla is not None else set()
+            restantes = [atomo for atomo in atomos
+                         if semilla is None or atomo is not self.condiciones[semilla]]
+            plan = []
+            while restantes:
+                siguiente = max(restantes, key=lambda a: (sum(v in ligadas for v in a.variables), -len(a.variables)))
+                restantes.remove(siguiente)
+                plan.append(siguiente)
+                ligadas.update(siguiente.variables)
+            self.planes[semilla] = plan
+
+class MotorReglas:
+    """Encadenamiento hacia adelante incremental sobre almacenes de hechos
+
+    hechos son los predicados base (ConjuntoBits para los unarios, Relacion
+    para el resto) y funciones los predicados calculados, que deben ser fijos:
+    se evalúan como filtros cuando sus variables ya están ligadas. Cada
+    predicado aparece a lo sumo una vez por regla y las reglas no son recursivas
+    """
+
+    def __init__(self, hechos: Dict[str, Almacen],
+                 funciones: Optional[Dict[str, Callable[..., bool]]] = None):
+        self.hechos = hechos
+        self.funciones = funciones or {}
+        self.reglas: List[Regla] = []
+        self.derivados: Dict[str, Relacion] = {}
+        self._soportes: Dict[str, Dict[Tuple[int, ...], int]] = {}
+        # predicado -> [(regla, índice de la condición que lo usa)]
+        self._dependientes: Dict[str, List[Tuple[Regla, int]]] = {}
+        self._lock = threading.RLock()
+
+    def agregar_regla(self, texto: str) -> Regla:
+        """Compila un axioma y materializa sus conclusiones con los hechos actuales"""
+        regla = Regla.compilar(texto)
+        conocidos = set(self.hechos) | set(self.funciones) | set(self.derivados)
+
+        predicados = [atomo.predicado for atomo in regla.condiciones]
+        for predicado in predicados:
+            if predicado not in conocidos:
+                raise ValueError(f"Predicado desconocido {predicado} en {texto!r}")
+        if len(set(predicados)) != len(predicados):
+            raise ValueError(f"Un predicado aparece más de una vez en {texto!r}")
+
+        destino = regla.conclusion.predicado
+        if destino in self.hechos or destino in self.funciones:
+            raise ValueError(f"La conclusión {destino} ya es un predicado base")
+        if destino in predicados or self._depende_de(predicados, destino):
+            raise ValueError(f"Regla recursiva: {texto!r}")
+
+        ligables = {variable for atomo in regla.positivas if not self._es_funcion(atomo.predicado)
+                    for variable in atomo.variables}
+        if any(variable not in ligables for atomo in regla.condiciones + [regla.conclusion]
+               for variable in atomo.variables):
+            raise ValueError(f"Todas las variables deben aparecer en un hecho positivo: {texto!r}")
+
+        regla.planificar(self._es_funcion)
+        with self._lock:
+            if destino not in self.derivados:
+                self.derivados[destino] = Relacion(len(regla.conclusion.variables))
+                self._soportes[destino] = {}
+            for i, atomo in enumerate(regla.condiciones):
+                if not self._es_funcion(atomo.predicado):
+                    self._dependientes.setdefault(atomo.predicado, []).append((regla, i))
+            self.reglas.append(regla)
+
+            # Las conclusiones nuevas se propagan a las reglas que ya las usan
+            for enlace in list(self._enlaces(regla, None, ())):
+                self._sumar_soporte(regla, enlace, 1, propagar=True)
+
+        logger.debug(f"Regla compilada: {texto}")
+        return regla
+
+    def _depende_de(self, predicados: Sequence[str], destino: str) -> bool:
+        """Indica si algún predicado derivado de la lista depende de destino"""
+        pendientes = [p for p in predicados if p in self.derivados]
+        vistos = set()
+        while pendientes:
+            predicado = pendientes.pop()
+            if predicado in vistos:
+                continue
+            vistos.add(predicado)
+            for regla in self.reglas:
+                if regla.conclusion.predicado == predicado:
+                    for atomo in regla.condiciones:
+                        if atomo.predicado == destino:
+                            return True
+                        if atomo.predicado in self.derivados:
+                            pendientes.append(atomo.predicado)
+        return False
+
+    def _es_funcion(self, predicado: str) -> bool:
+        return predicado in self.funciones
+
+    def _almacen(self, predicado: str) -> Almacen:
+        almacen = self.hechos.get(predicado)
+        return almacen if almacen is not None else self.derivados[predicado]
+
+    @staticmethod
+    def _contiene(almacen: Almacen, tupla: Tuple[int, ...]) -> bool:
+        if isinstance(almacen, ConjuntoBits):
+            return tupla[0] in almacen
+        return tupla in almacen
+
+    @staticmethod
+    def _coincidencias(almacen: Almacen, patron: Tuple[Optional[int], ...]) -> List[Tuple[int, ...]]:
+        if isinstance(almacen, ConjuntoBits):
+            if patron[0] is not None:
+                return [patron] if patron[0] in almacen else []
+            return [(palabra_id,) for palabra_id in almacen]
+        return almacen.tuplas(patron)
+
+    def cumple(self, predicado: str, tupla: Sequence[int]) -> bool:
+        """Indica si el hecho (base o derivado) es verdadero; un acceso a diccionario"""
+        tupla = tuple(int(valor) for valor in tupla)
+        if predicado in self.funciones:
+            return bool(self.funciones[predicado](*tupla))
+        return self._contiene(self._almacen(predicado), tupla)
+
+    def afirmar(self, predicado: str, tupla: Sequence[int]) -> bool:
+        """Agrega un hecho base y propaga sus consecuencias; False si ya estaba"""
+        tupla = tuple(int(valor) for valor in tupla)
+        almacen = self.hechos[predicado]
+        if self._contiene(almacen, tupla):
+            return False
+
+        with self._lock:
+            if self._contiene(almacen, tupla):
+                return False
+            self._cambiar(predicado, tupla, True)
+            return True
+
+    def retirar(self, predicado: str, tupla: Sequence[int]) -> bool:
+        """Quita un hecho base y retira las conclusiones que se quedan sin soporte"""
+        tupla = tuple(int(valor) for valor in tupla)
+        with self._lock:
+            if not self._contiene(self.hechos[predicado], tupla):
+                return False
+            self._cambiar(predicado, tupla, False)
+            return True
+
+    def _cambiar(self, predicado: str, tupla: Tuple[int, ...], agregar: bool):
+        """Aplica el cambio de un hecho y ajusta los soportes de las reglas que lo usan
+
+        Un enlace que contiene al hecho cuenta cuando el átomo positivo está
+        presente o el negado ausente: los que se pierden se enumeran antes del
+        cambio y los que se ganan después
+        """
+        dependientes = self._dependientes.get(predicado, [])
+        perdidos = [(regla, enlace) for regla, i in dependientes
+                    if regla.condiciones[i].negado == agregar
+                    for enlace in self._enlaces(regla, i, tupla)]
+
+        almacen = self._almacen(predicado)
+        if isinstance(almacen, ConjuntoBits):
+            if agregar:
+                almacen.agregar(tupla[0])
+            else:
+                almacen.descartar(tupla[0])
+        elif agregar:
+            almacen.agregar(*tupla)
+        else:
+            almacen.quitar(*tupla)
+
+        ganados = [(regla, enlace) for regla, i in dependientes
+                   if regla.condiciones[i].negado != agregar
+                   for enlace in self._enlaces(regla, i, tupla)]
+
+        for regla, enlace in perdidos:
+            self._sumar_soporte(regla, enlace, -1, propagar=True)
+        for regla, enlace in ganados:
+            self._sumar_soporte(regla, enlace, 1, propagar=True)
+
+    def _sumar_soporte(self, regla: Regla, enlace: Dict[str, int], delta: int, propagar: bool = False):
+        """Ajusta los soportes de la conclusión; materializa o retira al cruzar cero"""
+        destino = regla.conclusion.predicado
+        conclusion = tuple(enlace[variable] for variable in regla.conclusion.variables)
+        soportes = self._soportes[destino]
+
+        anterior = soportes.get(conclusion, 0)
+        actual = anterior + delta
+        if actual > 0:
+            soportes[conclusion] = actual
+        else:
+            soportes.pop(conclusion, None)
+
+        if anterior == 0 and actual > 0:
+            if propagar:
+                self._cambiar(destino, conclusion, True)
+            else:
+                self.derivados[destino].agregar(*conclusion)
+        elif anterior > 0 and actual <= 0:
+            self._cambiar(destino, conclusion, False)
+
+    def _enlaces(self, regla: Regla, semilla: Optional[int], tupla: Tuple[int, ...]) -> Iterator[Dict[str, int]]:
+        """Enlaces de variables que satisfacen la regla, con la condición semilla fija en tupla"""
+        enlace: Dict[str, int] = {}
+        if semilla is not None:
+            if not self._ligar(enlace, regla.condiciones[semilla].variables, tupla):
+                return
+        yield from self._unir(regla, regla.planes[semilla], 0, enlace)
+
+    @staticmethod
+    def _ligar(enlace: Dict[str, int], variables: Tuple[str, ...], tupla: Tuple[int, ...]) -> bool:
+        """Liga las variables a la tupla; False si contradice un valor ya ligado"""
+        for variable, valor in zip(variables, tupla):
+            ligado = enlace.get(variable)
+            if ligado is None:
+                enlace[variable] = valor
+            elif ligado != valor:
+                return False
+        return True
+
+    def _unir(self, regla: Regla, plan: List[Atomo], paso: int,
+              enlace: Dict[str, int]) -> Iterator[Dict[str, int]]:
+        """Recorre el plan de joins y al final aplica funciones y negaciones"""
+        if paso == len(plan):
+            if self._filtros(regla, enlace):
+                yield dict(enlace)
+            return
+
+        atomo = plan[paso]
+        patron = tuple(enlace.get(variable) for variable in atomo.variables)
+        for tupla in self._coincidencias(self._almacen(atomo.predicado), patron):
+            extendido = dict(enlace)
+            if self._ligar(extendido, atomo.variables, tupla):
+                yield from self._unir(regla, plan, paso + 1, extendido)
+
+    def _filtros(self, regla: Regla, enlace: Dict[str, int]) -> bool:
+        """Funciones y condiciones negadas, con todas las variables ya ligadas"""
+        for atomo in regla.condiciones:
+            es_funcion = self._es_funcion(atomo.predicado)
+            if not (es_funcion or atomo.negado):
+                continue
+            valores = tuple(enlace[variable] for variable in atomo.variables)
+            if es_funcion:
+                verdadero = bool(self.funciones[atomo.predicado](*valores))
+            else:
+                verdadero = self._contiene(self._almacen(atomo.predicado), valores)
+            if verdadero == atomo.negado:
+                return False
+        return True
+
+    def recalcular(self):
+        """Recalcula todas las conclusiones desde los hechos base (p. ej. si cambió una función)"""
+        with self._lock:
+            for destino, relacion in self.derivados.items():
+                self.derivados[destino] = Relacion(relacion.aridad)
+                self._soportes[destino] = {}
+
+            # Sin propagar: cada regla se evalúa completa después de las que derivan sus condiciones
+            for regla in self._orden_reglas():
+                for enlace in list(self._enlaces(regla, None, ())):
+                    self._sumar_soporte(regla, enlace, 1)
+
+    def _orden_reglas(self) -> List[Regla]:
+        """Reglas en orden topológico según los predicados derivados que usan"""
+        ordenadas: List[Regla] = []
+        pendientes = list(self.reglas)
+        while pendientes:
+            for regla in pendientes:
+                condiciones = {atomo.predicado for atomo in regla.condiciones}
+                if not any(otra.conclusion.predicado in condiciones for otra in pendientes):
+                    pendientes.remove(regla)
+                    ordenadas.append(regla)
+                    break
+        return ordenadas
+
+def cargar_axiomas_flujo(ruta: str) -> List[str]:
+    """Axiomas del nodo reglas_fol_correcciones de flujo.JSON"""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as archivo:
+            flujo = json.load(archivo)
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudieron leer los axiomas de {ruta}: {e}")
+        return []
+
+    axiomas = []
+    for nodo in flujo.get('components', []):
+        if nodo.get('id') == 'reglas_fol_correcciones':
+            axiomas.extend(nodo.get('logic', {}).get('axioms', []))
+    return axiomas
@@ -0,0 +1,137 @@
+"""
+Preferencias aprendidas del feedback: contadores Acepta/Rechaza por
+(usuario, palabra) con decaimiento exponencial en el tiempo
+Cada usuario guarda sus contadores en arreglos NumPy ordenados por id de
+palabra (consulta de todos los candidatos con searchsorted). La memoria está
+acotada: un tope de palabras por usuario, que desaloja la más fría, y un tope
+global de entradas, que desaloja a los usuarios usados hace más tiempo
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+class _ContadoresUsuario:
+    """Arreglos paralelos ordenados por id de palabra"""
+
+    __slots__ = ('ids', 'acepta', 'rechaza', 'marca')
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int32)
+        self.acepta = np.empty(0, dtype=np.float32)
+        self.rechaza = np.empty(0, dtype=np.float32)
+        self.marca = np.empty(0, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+class PreferenciasUsuario:
+    """Contadores con decaimiento por (usuario, id de palabra) y memoria acotada"""
+
+    def __init__(self, vida_media_s: float = 7 * 24 * 3600.0, maximo_por_usuario: int = 256,
+                 maximo_entradas: int = 500_000):
+        self.vida_media_s = vida_media_s
+        self.maximo_por_usuario = maximo_por_usuario
+        self.maximo_entradas = maximo_entradas
+
+        self._usuarios: 'OrderedDict[str, _ContadoresUsuario]' = OrderedDict()
+        self._entradas = 0
+        self._lock = threading.Lock()
+        self.eventos = 0
+        self.palabras_desalojadas = 0
+        self.usuarios_desalojados = 0
+
+    def __len__(self) -> int:
+        return self._entradas
+
+    def _factor(self, marca: np.ndarray, ahora: float) -> np.ndarray:
+        """Factor de decaimiento desde cada marca de tiempo hasta ahora"""
+        return np.exp2(-(ahora - marca) / self.vida_media_s)
+
+    def registrar(self, usuario: str, palabra_id: int, acepta: bool, ahora: Optional[float] = None):
+        """Suma un evento de aceptación o rechazo"""
+        if palabra_id < 0:
+            return
+        ahora = time.time() if ahora is None else ahora
+
+        with self._lock:
+            contadores = self._usuarios.get(usuario)
+            if contadores is None:
+                contadores = self._usuarios[usuario] = _ContadoresUsuario()
+            else:
+                self._usuarios.move_to_end(usuario)
+
+            posicion = int(np.searchsorted(contadores.ids, palabra_id))
+            if posicion == len(contadores) or contadores.ids[posicion] != palabra_id:
+                if len(contadores) >= self.maximo_por_usuario:
+                    self._desalojar_palabra(contadores, ahora)
+                    posicion = int(np.searchsorted(contadores.ids, palabra_id))
+
+                contadores.ids = np.insert(contadores.ids, posicion, palabra_id)
+                contadores.acepta = np.insert(contadores.acepta, posicion, 0.0)
+                contadores.rechaza = np.insert(contadores.rechaza, posicion, 0.0)
+                contadores.marca = np.insert(contadores.marca, posicion, ahora)
+                self._entradas += 1
+
+            # Se lleva el contador al instante actual antes de sumar
+            factor = float(self._factor(contadores.marca[posicion], ahora))
+            contadores.acepta[posicion] *= factor
+            contadores.rechaza[posicion] *= factor
+            contadores.marca[posicion] = ahora
+            if acepta:
+                contadores.acepta[posicion] += 1.0
+            else:
+                contadores.rechaza[posicion] += 1.0
+            self.eventos += 1
+
+            while self._entradas > self.maximo_entradas and len(self._usuarios) > 1:
+                _, frio = self._usuarios.popitem(last=False)
+                self._entradas -= len(frio)
+                self.usuarios_desalojados += 1
+
+    def _desalojar_palabra(self, contadores: _ContadoresUsuario, ahora: float):
+        """Quita la palabra con menos eventos vigentes (con el lock tomado)"""
+        pesos = (contadores.acepta + contadores.rechaza) * self._factor(contadores.marca, ahora)
+        fria = int(np.argmin(pesos))
+        contadores.ids = np.delete(contadores.ids, fria)
+        contadores.acepta = np.delete(contadores.acepta, fria)
+        contadores.rechaza = np.delete(contadores.rechaza, fria)
+        contadores.marca = np.delete(contadores.marca, fria)
+        self._entradas -= 1
+        self.palabras_desalojadas += 1
+
+    def ajustes(self, usuario: str, ids: np.ndarray, ahora: Optional[float] = None) -> np.ndarray:
+        """Preferencia en [-1, 1] de cada id: (acepta - rechaza) / (acepta + rechaza + 1)"""
+        resultado = np.zeros(len(ids), dtype=np.float64)
+        if usuario not in self._usuarios:
+            return resultado
+        ahora = time.time() if ahora is None else ahora
+
+        with self._lock:
+            contadores = self._usuarios.get(usuario)
+            if contadores is None or not len(contadores) or not len(ids):
+                return resultado
+
+            posiciones = np.minimum(np.searchsorted(contadores.ids, ids), len(contadores) - 1)
+            encontrados = contadores.ids[posiciones] == ids
+            posiciones = posiciones[encontrados]
+            factor = self._factor(contadores.marca[posiciones], ahora)
+            acepta = contadores.acepta[posiciones] * factor
+            rechaza = contadores.rechaza[posiciones] * factor
+
+        resultado[encontrados] = (acepta - rechaza) / (acepta + rechaza + 1.0)
+        return resultado
+
+    def estadisticas(self) -> Dict:
+        """Tamaño y desalojos para las métricas"""
+        return {
+            'usuarios': len(self._usuarios),
+            'entradas': self._entradas,
+            'maximo_entradas': self.maximo_entradas,
+            'eventos': self.eventos,
+            'palabras_desalojadas': self.palabras_desalojadas,
+            'usuarios_desalojados': self.usuarios_desalojados
+        }
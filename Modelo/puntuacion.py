@@ -0,0 +1,105 @@
+"""
+Núcleo de puntuación vectorizada para la búsqueda de sugerencias
+Cada candidato se representa con su id del vocabulario global y sus rasgos estáticos
+(longitud, tilde, pertenencia a las listas del corpus, id y frecuencia en el
+modelo) viven en columnas NumPy; g(n) y h(n) se calculan para todo el conjunto
+de candidatos con operaciones sobre arreglos
+"""
+
+import threading
+from typing import Callable, Dict, List, NamedTuple
+
+import numpy as np
+
+from vocabulario import Vocabulario
+
+class Rasgos(NamedTuple):
+    """Rasgos estáticos de un candidato"""
+    longitud: int
+    tilde: bool
+    informal: bool
+    formal: bool
+    id_modelo: int
+    frecuencia: float
+
+class TablaRasgos:
+    """Columnas de rasgos indexadas por id del vocabulario global
+
+    Las filas se calculan al vuelo la primera vez que aparece un id. Las
+    consultas no toman lock: el relleno escribe las filas (creciendo las
+    columnas si hace falta) antes de publicar el nuevo número de filas llenas
+    """
+
+    def __init__(self, extraer: Callable[[str], Rasgos], vocabulario: Vocabulario,
+                 capacidad: int = 1024):
+        self.extraer = extraer
+        self.vocabulario = vocabulario
+        self._llenas = 0
+        self._lock = threading.Lock()
+        self._columnas = self._columnas_vacias(capacidad)
+
+    def __len__(self) -> int:
+        return self._llenas
+
+    @staticmethod
+    def _columnas_vacias(capacidad: int) -> Dict[str, np.ndarray]:
+        """Columnas sin datos con la capacidad indicada"""
+        return {
+            'longitud': np.zeros(capacidad, dtype=np.float64),
+            'tilde': np.zeros(capacidad, dtype=bool),
+            'informal': np.zeros(capacidad, dtype=bool),
+            'formal': np.zeros(capacidad, dtype=bool),
+            'id_modelo': np.full(capacidad, -1, dtype=np.int64),
+            'frecuencia': np.zeros(capacidad, dtype=np.float64)
+        }
+
+    def _llenar(self, hasta: int):
+        """Calcula los rasgos de los ids pendientes hasta 'hasta' (exclusivo)"""
+        with self._lock:
+            desde = self._llenas
+            if hasta <= desde:
+                return
+
+            columnas = self._columnas
+            capacidad = len(columnas['longitud'])
+            if hasta > capacidad:
+                while capacidad < hasta:
+                    capacidad *= 2
+                nuevas = self._columnas_vacias(capacidad)
+                for nombre, columna in columnas.items():
+                    nuevas[nombre][:desde] = columna[:desde]
+                self._columnas = columnas = nuevas
+
+            for palabra_id in range(desde, hasta):
+                rasgos = self.extraer(self.vocabulario.palabra(palabra_id))
+                for nombre, valor in zip(Rasgos._fields, rasgos):
+                    columnas[nombre][palabra_id] = valor
+
+            self._llenas = hasta
+
+    def columnas(self, ids: np.ndarray) -> Dict[str, np.ndarray]:
+        """Columnas que cubren todos los ids dados (no negativos)"""
+        if len(ids):
+            maximo = int(ids.max())
+            if maximo >= self._llenas:
+                self._llenar(maximo + 1)
+        return self._columnas
+
+def seleccionar_mejores(puntajes: np.ndarray, textos: Callable[[int], str], k: int) -> List[int]:
+    """Índices de los k menores puntajes, en orden y desempatando por texto como heapq
+
+    textos(i) da el texto del candidato i; solo se pide para los seleccionados
+    """
+    if k <= 0 or len(puntajes) == 0:
+        return []
+
+    if k < len(puntajes):
+        # argpartition da k menores arbitrarios ante empates: se incluyen todos los empatados
+        umbral = puntajes[np.argpartition(puntajes, k - 1)[:k]].max()
+        seleccion = np.flatnonzero(puntajes <= umbral)
+    else:
+        seleccion = np.arange(len(puntajes))
+
+    valores = puntajes.tolist()
+    ordenados = sorted(seleccion.tolist(), key=lambda i: (valores[i], textos(i)))
+    return ordenados[:k]
@@ -0,0 +1,200 @@
+"""
+Estado incremental por sesión de escritura
+Cada sesión (identificada por el cliente) guarda los tokens del texto ya
+procesado con su posición, el nodo del detector de contexto alcanzado después
+de cada token (y los contextos que emitió) y las correcciones ya verificadas.
+En cada pulsación solo se reprocesa la cola del texto que cambió; las sesiones
+inactivas expiran por TTL
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from detector_contexto import DetectorContexto
+from utils import PATRON_PALABRA, inicio_cola
+from vocabulario import DESCONOCIDA, Vocabulario
+
+class TokenSesion(NamedTuple):
+    """Token procesado de una sesión"""
+    fin: int
+    palabra: str
+    palabra_id: int
+    nodo: int
+    contextos: Tuple[str, ...]
+    correccion_id: int
+
+def prefijo_comun(anterior: str, nuevo: str) -> int:
+    """Longitud del prefijo común de dos textos (comparaciones de bloques, no carácter a carácter)"""
+    if nuevo.startswith(anterior):
+        return len(anterior)
+
+    bajo, alto = 0, min(len(anterior), len(nuevo))
+    while bajo < alto:
+        medio = (bajo + alto + 1) // 2
+        if anterior[:medio] == nuevo[:medio]:
+            bajo = medio
+        else:
+            alto = medio - 1
+    return bajo
+
+class EstadoSesion:
+    """Tokens procesados y correcciones verificadas de una sesión
+
+    Solo se tokenizan los últimos caracteres_cola caracteres del texto (la
+    misma cola que sin sesión). Las operaciones deben hacerse con self.lock
+    tomado: el servidor puede recibir pulsaciones de la misma sesión en paralelo
+    """
+
+    def __init__(self, caracteres_cola: int = 8192, maximo_verificadas: int = 4096):
+        self.caracteres_cola = caracteres_cola
+        self.maximo_verificadas = maximo_verificadas
+        self.texto = ''
+        self.tokens: List[TokenSesion] = []
+        self._fines: List[int] = []
+        # Palabra -> id de su corrección (DESCONOCIDA si no tiene), LRU acotado
+        self.verificadas: 'OrderedDict[str, int]' = OrderedDict()
+        # Posición hasta la que las palabras terminadas ya se aprendieron
+        self.fin_aprendido = 0
+        self.ultimo_acceso = time.monotonic()
+        self.lock = threading.Lock()
+
+    def actualizar(self, texto: str, detector: DetectorContexto, corregir: Callable[[str], Optional[str]],
+                   vocabulario: Vocabulario, conocida: Callable[[str], bool]) -> int:
+        """Sincroniza el estado con el texto nuevo y devuelve cuántos tokens se reprocesaron
+
+        Solo las palabras conocidas se internan en el vocabulario; las demás
+        quedan con ids temporales (negativos) de esta actualización
+        """
+        comun = prefijo_comun(self.texto, texto)
+
+        # Un token que termina antes del primer cambio no cambió: el carácter que lo cierra es común
+        conservar = bisect_left(self._fines, comun)
+        del self.tokens[conservar:]
+        del self._fines[conservar:]
+        self.fin_aprendido = min(self.fin_aprendido, comun)
+
+        # Lo anterior a la cola nunca se tokeniza; los tokens que quedaron fuera se descartan por bloques
+        corte = inicio_cola(texto, self.caracteres_cola)
+        fuera = bisect_right(self._fines, corte)
+        if fuera > len(self.tokens) // 2:
+            del self.tokens[:fuera]
+            del self._fines[:fuera]
+
+        inicio = self._fines[-1] if self._fines else corte
+        nodo = self.tokens[-1].nodo if self.tokens else 0
+        reprocesados = 0
+
+        coincidencias = list(PATRON_PALABRA.finditer(texto, inicio))
+        palabras = [coincidencia.group().lower() for coincidencia in coincidencias]
+        ids = vocabulario.ids_texto(palabras, conocida).tolist()
+
+        for coincidencia, palabra, palabra_id in zip(coincidencias, palabras, ids):
+            nodo, contextos = detector.avanzar(nodo, palabra)
+
+            correccion_id = self.verificadas.get(palabra)
+            if correccion_id is None:
+                correccion = corregir(palabra)
+                correccion_id = vocabulario.id(correccion) if correccion else DESCONOCIDA
+                self.verificadas[palabra] = correccion_id
+                if len(self.verificadas) > self.maximo_verificadas:
+                    self.verificadas.popitem(last=False)
+            else:
+                self.verificadas.move_to_end(palabra)
+
+            token = TokenSesion(coincidencia.end(), palabra, palabra_id, nodo, contextos, correccion_id)
+            self.tokens.append(token)
+            self._fines.append(token.fin)
+            reprocesados += 1
+
+        self.texto = texto
+        return reprocesados
+
+    def por_aprender(self, vocabulario: Vocabulario) -> Tuple[int, List[int]]:
+        """Id de la palabra previa y ids de las palabras terminadas aún no aprendidas
+
+        Una palabra está terminada si la sigue algún carácter; avanza la marca.
+        Las aprendidas pasan a ser palabras del modelo del usuario: se internan
+        y sus tokens toman el id permanente
+        """
+        terminados = bisect_left(self._fines, len(self.texto))
+        desde = bisect_left(self._fines, self.fin_aprendido + 1)
+        if desde >= terminados:
+            return DESCONOCIDA, []
+
+        for posicion in range(desde, terminados):
+            token = self.tokens[posicion]
+            if token.palabra_id < 0:
+                self.tokens[posicion] = token._replace(palabra_id=vocabulario.id(token.palabra))
+
+        previo = self.tokens[desde - 1].palabra_id if desde > 0 else DESCONOCIDA
+        self.fin_aprendido = self._fines[terminados - 1]
+        return previo, [token.palabra_id for token in self.tokens[desde:terminados]]
+
+class GestorSesiones:
+    """Sesiones por (usuario, id de sesión) con expiración por inactividad y tope de cantidad"""
+
+    def __init__(self, ttl_s: float = 1800.0, maximo: int = 10000, caracteres_cola: int = 8192,
+                 maximo_verificadas: int = 4096):
+        self.ttl_s = ttl_s
+        self.maximo = maximo
+        self.caracteres_cola = caracteres_cola
+        self.maximo_verificadas = maximo_verificadas
+        self._sesiones: 'OrderedDict[Tuple[str, str], EstadoSesion]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.creadas = 0
+        self.expiradas = 0
+        self.desalojadas = 0
+
+    def __len__(self) -> int:
+        return len(self._sesiones)
+
+    def obtener(self, usuario_id: str, sesion_id: str) -> EstadoSesion:
+        """Sesión existente o nueva; de paso expira las inactivas"""
+        clave = (usuario_id, sesion_id)
+        ahora = time.monotonic()
+
+        with self._lock:
+            self._expirar(ahora)
+
+            sesion = self._sesiones.get(clave)
+            if sesion is None:
+                sesion = EstadoSesion(self.caracteres_cola, self.maximo_verificadas)
+                self._sesiones[clave] = sesion
+                self.creadas += 1
+                while len(self._sesiones) > self.maximo:
+                    self._sesiones.popitem(last=False)
+                    self.desalojadas += 1
+            else:
+                self._sesiones.move_to_end(clave)
+
+            sesion.ultimo_acceso = ahora
+            return sesion
+
+    def _expirar(self, ahora: float):
+        """Elimina las sesiones inactivas (las más antiguas están al inicio)"""
+        while self._sesiones:
+            clave, sesion = next(iter(self._sesiones.items()))
+            if ahora - sesion.ultimo_acceso < self.ttl_s:
+                break
+            del self._sesiones[clave]
+            self.expiradas += 1
+
+    def descartar(self, usuario_id: str, sesion_id: str):
+        """Elimina una sesión (por ejemplo, al cerrar el documento)"""
+        with self._lock:
+            self._sesiones.pop((usuario_id, sesion_id), None)
+
+    def estadisticas(self) -> Dict:
+        """Estado de las sesiones para las métricas"""
+        with self._lock:
+            self._expirar(time.monotonic())
+            return {
+                'activas': len(self._sesiones),
+                'creadas': self.creadas,
+                'expiradas': self.expiradas,
+                'desalojadas': self.desalojadas,
+                'ttl_s': self.ttl_s
+            }
@@ -9,6 +9,8 @@ import time
 import requests
 import json
 from agente_core import AgentePredictivo
+from utils import tokenizar, prefijo_en_curso
+from vocabulario import VOCABULARIO
 
 def test_agente_core():
     """Prueba el núcleo del agente"""
@@ -161,6 +163,1221 @@ def test_corpus_colombiano():
         print(f"❌ Error en corpus: {e}")
         return False
 
+def test_indice_prefijos():
+    """Prueba el completado de la palabra en curso con el trie"""
+    print("🧪 Probando índice de prefijos...")
+
+    try:
+        from indice_prefijos import IndicePrefijos
+
+        indice = IndicePrefijos(k=3)
+        indice.agregar('chévere', 85, 'informal')
+        indice.agregar('chequear', 40, 'general')
+        indice.agregar('cordialmente', 60, 'formal')
+        indice.agregar('casa', 95, 'general')
+        indice.construir()
+
+        if indice.completar('che')[0] != 'chévere':
+            print("  ❌ 'che' no se completa como 'chévere'")
+            return False
+
+        if indice.completar('chequ') != ['chequear'] or indice.completar('xyz'):
+            print("  ❌ Completaciones incorrectas para prefijos específicos")
+            return False
+
+        if indice.completar('c')[0] != 'casa' or indice.completar('c', 'formal')[0] != 'cordialmente':
+            print("  ❌ El contexto no prioriza las completaciones")
+            return False
+
+        print("  ✅ Completaciones por prefijo y contexto")
+        print("✅ Índice de prefijos funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en índice de prefijos: {e}")
+        return False
+
+def test_modelo_ngramas():
+    """Prueba el modelo de n-gramas sobre arreglos ordenados"""
+    print("🧪 Probando modelo de n-gramas...")
+
+    try:
+        import os
+        import tempfile
+        from modelo_ngramas import ModeloNgramas
+
+        modelo = ModeloNgramas.entrenar([
+            "nos permitimos informar que",
+            "nos permitimos solicitar",
+            "quedamos atentos a su respuesta"
+        ])
+
+        siguientes = [palabra for palabra, _ in modelo.siguientes_palabras(['nos'])]
+        if siguientes[:1] != ['permitimos']:
+            print(f"  ❌ Siguiente palabra incorrecta: {siguientes}")
+            return False
+
+        if modelo.puntaje('informar', ['nos', 'permitimos']) <= modelo.puntaje('atentos', ['nos', 'permitimos']):
+            print("  ❌ El trigrama visto no supera al no visto")
+            return False
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'modelo.npz')
+            modelo.guardar(ruta)
+            cargado = ModeloNgramas.cargar(ruta)
+
+        if cargado.puntaje('informar', ['nos', 'permitimos']) != modelo.puntaje('informar', ['nos', 'permitimos']):
+            print("  ❌ El modelo cargado no coincide con el guardado")
+            return False
+
+        print(f"  ✅ Modelo con {len(modelo)} palabras, guardado y cargado")
+        print("✅ Modelo de n-gramas funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en modelo de n-gramas: {e}")
+        return False
+
+def test_lexicon_binario():
+    """Prueba el léxico binario mapeado en memoria"""
+    print("🧪 Probando léxico binario...")
+
+    try:
+        import os
+        import tempfile
+        from lexicon_binario import LexiconBinario, escribir_lexicon
+
+        entradas = [
+            ('chévere', 85, 'informal', False, True),
+            ('camión', 65, 'general', True, False),
+            ('cordialmente', 90, 'formal', False, False)
+        ]
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'lexicon.bin')
+            escribir_lexicon(ruta, entradas)
+            lexicon = LexiconBinario.abrir(ruta)
+
+            i = lexicon.buscar('chévere')
+            if i < 0 or lexicon.frecuencias[i] != 85 or not lexicon.es_colombianismo(i):
+                print("  ❌ Datos de 'chévere' incorrectos")
+                return False
+
+            j = lexicon.buscar('camión')
+            if not lexicon.requiere_tilde(j) or lexicon.contexto(j) != 'general':
+                print("  ❌ Banderas de 'camión' incorrectas")
+                return False
+
+            if lexicon.buscar('camion') != -1 or sorted(lexicon) != sorted(entradas):
+                print("  ❌ Búsqueda o recorrido del léxico incorrectos")
+                return False
+
+            # Índices precompilados en el mismo archivo, con formas extra encima
+            from corrector_ortografico import CorrectorSymSpell
+            from indice_acentos import IndiceAcentos
+            from indice_prefijos import IndicePrefijos
+            prefijos = IndicePrefijos(base=lexicon.prefijos)
+            prefijos.agregar('chequear', 40)
+            corrector = CorrectorSymSpell(base=lexicon.borrados)
+            corrector.agregar_varias(['camion', 'Chévere', 'cosa'], [1, 99, 5])
+            acentos = IndiceAcentos(base=lexicon.acentos)
+            for palabra, frecuencia in corrector.agregadas():
+                acentos.agregar(palabra, frecuencia)
+            acentos.construir()
+            if prefijos.completar('che') != ['chévere', 'chequear'] or prefijos.completar('c', 'formal')[0] != 'cordialmente':
+                print(f"  ❌ Trie compilado incorrecto: {prefijos.completar('che')}")
+                return False
+            if corrector.corregir('cordialmnte')[0][0] != 'cordialmente' or not corrector.contiene('CHÉVERE') or \
+                    corrector.corregir('coza')[0][0] != 'cosa':
+                print(f"  ❌ Corrector compilado incorrecto: {corrector.corregir('cordialmnte')}")
+                return False
+            if acentos.formas('camion') != ['camión', 'camion'] or not acentos.tiene_tildes_correctas('chévere'):
+                print(f"  ❌ Índice de acentos compilado incorrecto: {acentos.formas('camion')}")
+                return False
+
+            lexicon.cerrar()
+
+            # Un léxico compilado antes de cambiar la tabla palabras se recompila
+            ruta_config = os.path.join(directorio, 'configuracion.json')
+            with open(ruta_config, 'w', encoding='utf-8') as archivo:
+                json.dump({'agente': {'ruta_lexicon': ruta, 'directorio_modelos_usuario': directorio},
+                           'base_datos': {'nombre_archivo': os.path.join(directorio, 'corpus.db')}}, archivo)
+            agente = AgentePredictivo(ruta_config)
+            agente.bd.ejecutar("INSERT INTO palabras (palabra, frecuencia, contexto) VALUES ('zorblaxeo', 500, 'general')")
+            agente.cerrar()
+            agente = AgentePredictivo(ruta_config)
+            completado = agente.indice_prefijos.completar('zorb')
+            agente.cerrar()
+            if completado != ['zorblaxeo']:
+                print(f"  ❌ El léxico no se recompiló tras cambiar palabras: {completado}")
+                return False
+
+        print(f"  ✅ Léxico con {len(entradas)} entradas escrito y mapeado")
+        print("✅ Léxico binario funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en léxico binario: {e}")
+        return False
+
+def test_corrector_ortografico():
+    """Prueba el corrector por borrado simétrico"""
+    print("🧪 Probando corrector ortográfico...")
+
+    try:
+        from corrector_ortografico import CorrectorSymSpell
+
+        corrector = CorrectorSymSpell()
+        for palabra, frecuencia in [('también', 95), ('análisis', 60), ('tampoco', 40), ('José', 70)]:
+            corrector.agregar(palabra, frecuencia)
+
+        casos = {'tanbien': 'también', 'anlisis': 'análisis', 'jose': 'José', 'tampoko': 'tampoco'}
+        for entrada, esperado in casos.items():
+            correcciones = corrector.corregir(entrada)
+            if not correcciones or correcciones[0][0] != esperado:
+                print(f"  ❌ '{entrada}' → {correcciones} (se esperaba '{esperado}')")
+                return False
+
+        if corrector.corregir('xyzxyz'):
+            print("  ❌ Se corrigió una palabra sin candidatos cercanos")
+            return False
+
+        print(f"  ✅ {len(casos)} correcciones de tildes y errores de tecleo")
+        print("✅ Corrector ortográfico funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en corrector ortográfico: {e}")
+        return False
+
+def test_indice_acentos():
+    """Prueba el índice inverso de acentos"""
+    print("🧪 Probando índice de acentos...")
+
+    try:
+        from indice_acentos import IndiceAcentos
+
+        indice = IndiceAcentos()
+        for palabra, frecuencia in [('José', 70), ('camión', 65), ('está', 90), ('esta', 80), ('más', 50)]:
+            indice.agregar(palabra, frecuencia)
+        indice.construir()
+
+        casos = {'jose': 'José', 'camion': 'camión', 'mas': 'más', 'esta': None, 'camión': None}
+        for entrada, esperado in casos.items():
+            if indice.correccion(entrada) != esperado:
+                print(f"  ❌ '{entrada}' → {indice.correccion(entrada)} (se esperaba {esperado})")
+                return False
+
+        if indice.formas('ESTA') != ['está', 'esta'] or not indice.tiene_tildes_correctas('camión'):
+            print("  ❌ Formas u orden por frecuencia incorrectos")
+            return False
+
+        print(f"  ✅ {len(indice)} claves sin tildes indexadas")
+        print("✅ Índice de acentos funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en índice de acentos: {e}")
+        return False
+
+def test_cache_sugerencias():
+    """Prueba la caché LRU de sugerencias"""
+    print("🧪 Probando caché de sugerencias...")
+
+    try:
+        agente = AgentePredictivo()
+        cache = agente.cache_sugerencias
+
+        # Solo la ventana final de tokens forma parte de la clave
+        final = "hola parce nos vemos mañana en la rumba que"
+        primera = agente.procesar_entrada(f"Bueno, {final}", "usuario_cache", "informal")
+        segunda = agente.procesar_entrada(f"Listo, {final}", "usuario_cache", "informal")
+        if cache.aciertos != 1 or [s.texto for s in primera] != [s.texto for s in segunda]:
+            print(f"  ❌ Ventana final igual no reutiliza la caché: {cache.estadisticas()}")
+            return False
+
+        agente.registrar_feedback("usuario_cache", "chévere", "acepta", "informal")
+        agente.procesar_entrada(f"Bueno, {final}", "usuario_cache", "informal")
+        if cache.aciertos != 1:
+            print("  ❌ El feedback no invalidó la caché del usuario")
+            return False
+
+        # Dos usuarios con la misma versión no comparten sus listas personalizadas
+        texto = "Nos vemos en la"
+        for _ in range(6):
+            agente.registrar_feedback("cache_a", "de", "rechaza")
+            agente.registrar_feedback("cache_b", "que", "rechaza")
+        agente.aprendizaje.vaciar()
+        if agente._versiones_usuario["cache_a"] != agente._versiones_usuario["cache_b"]:
+            print("  ❌ Los dos usuarios deben tener la misma versión")
+            return False
+
+        lista_a = [s.texto for s in agente.procesar_entrada(texto, "cache_a")]
+        lista_b = [s.texto for s in agente.procesar_entrada(texto, "cache_b")]
+        cache.limpiar()
+        real_b = [s.texto for s in agente.procesar_entrada(texto, "cache_b")]
+        if lista_a == lista_b or lista_b != real_b:
+            print(f"  ❌ La caché mezcla usuarios: A={lista_a} B={lista_b} real B={real_b}")
+            return False
+
+        # Un flujo de feedback de otros usuarios sobre otras palabras no vacía la caché
+        cache.limpiar()
+        cacheadas = [s.texto for s in agente.procesar_entrada(texto, "cache_c")]
+        ajena = next(palabra for palabra in ('bacano', 'chévere', 'parce', 'rumba') if palabra not in cacheadas)
+        aciertos = cache.aciertos
+        for i in range(40):
+            agente.registrar_feedback(f"flujo{i % 4}", ajena, "acepta" if i % 3 else "rechaza", "informal")
+            if i % 10 == 9:
+                agente.aprendizaje.vaciar()
+                agente.procesar_entrada(texto, "cache_c")
+        # Solo una deriva de la heurística mayor que la tolerancia puede cambiar la versión
+        if cache.aciertos - aciertos < 3:
+            print(f"  ❌ El feedback ajeno invalida la caché: {cache.estadisticas()} {agente.aprendizaje.estadisticas()}")
+            return False
+
+        print(f"  ✅ Estadísticas: {cache.estadisticas()}")
+        print("✅ Caché de sugerencias funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en caché de sugerencias: {e}")
+        return False
+
+def test_conexiones_bd():
+    """Prueba el pool de conexiones SQLite con varios hilos"""
+    print("🧪 Probando pool de conexiones...")
+
+    try:
+        import os
+        import tempfile
+        import threading
+        from conexiones_bd import GestorConexiones
+
+        with tempfile.TemporaryDirectory() as directorio:
+            gestor = GestorConexiones(os.path.join(directorio, 'prueba.db'), tamano_pool=4)
+            gestor.ejecutar("CREATE TABLE eventos (hilo INTEGER, n INTEGER)")
+
+            def escribir(hilo):
+                for n in range(25):
+                    gestor.ejecutar("INSERT INTO eventos VALUES (?, ?)", (hilo, n))
+                    gestor.consultar("SELECT COUNT(*) FROM eventos WHERE hilo = ?", (hilo,))
+
+            hilos = [threading.Thread(target=escribir, args=(i,)) for i in range(8)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+            total = gestor.consultar_uno("SELECT COUNT(*) FROM eventos")[0]
+            modo = gestor.consultar_uno("PRAGMA journal_mode")[0]
+            abiertas = len(gestor._abiertas)
+            gestor.cerrar()
+
+        if total != 200 or modo != 'wal' or abiertas > 4:
+            print(f"  ❌ total={total}, journal_mode={modo}, conexiones={abiertas}")
+            return False
+
+        print(f"  ✅ 8 hilos, {total} escrituras, {abiertas} conexiones reutilizadas en WAL")
+        print("✅ Pool de conexiones funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en pool de conexiones: {e}")
+        return False
+
+def test_escritor_feedback():
+    """Prueba el escritor de feedback por lotes"""
+    print("🧪 Probando escritor de feedback...")
+
+    try:
+        import os
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor
+        from conexiones_bd import GestorConexiones
+        from escritor_feedback import EscritorFeedback
+
+        with tempfile.TemporaryDirectory() as directorio:
+            gestor = GestorConexiones(os.path.join(directorio, 'prueba.db'))
+            gestor.ejecutar("""
+                CREATE TABLE interacciones (
+                    id INTEGER PRIMARY KEY, usuario_id TEXT, texto_entrada TEXT,
+                    sugerencia_mostrada TEXT, accion TEXT, contexto TEXT, timestamp TIMESTAMP
+                )
+            """)
+
+            escritor = EscritorFeedback(gestor, capacidad=100, tamano_lote=50, intervalo_s=0.05)
+            escritor.iniciar()
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                aceptados = sum(executor.map(lambda _: escritor.encolar('u', 'chévere', 'acepta', 'informal'),
+                                             range(80)))
+            escritor.detener()
+
+            escritos = gestor.consultar_uno("SELECT COUNT(*) FROM interacciones")[0]
+            estadisticas = escritor.estadisticas()
+            gestor.cerrar()
+
+        if aceptados + estadisticas['rechazados'] != 80 or estadisticas['encolados'] != aceptados or \
+                escritos != aceptados or estadisticas['lotes'] > 80:
+            print(f"  ❌ aceptados={aceptados}, escritos={escritos}, {estadisticas}")
+            return False
+
+        # Detener con la cola llena y el escritor ocupado no debe lanzar queue.Full
+        class BaseLenta:
+            def ejecutar_muchos(self, sql, filas):
+                time.sleep(0.3)
+
+        lento = EscritorFeedback(BaseLenta(), capacidad=2, tamano_lote=1, intervalo_s=0.05)
+        lento.iniciar()
+        while lento.encolar('u', 'chévere', 'acepta', 'informal'):
+            pass
+        lento.detener(timeout=0.01)
+
+        print(f"  ✅ {escritos} eventos escritos en {estadisticas['lotes']} lotes")
+        print("✅ Escritor de feedback funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en escritor de feedback: {e}")
+        return False
+
+def test_esquema_indices():
+    """Prueba el esquema versionado y los planes de consulta"""
+    print("🧪 Probando esquema e índices...")
+
+    try:
+        from agente_core import VERSION_ESQUEMA
+
+        agente = AgentePredictivo()
+        version = agente.bd.consultar_uno("PRAGMA user_version")[0]
+        indices = {fila[0] for fila in agente.bd.consultar(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+        )}
+
+        if version != VERSION_ESQUEMA or len(indices) < 3:
+            print(f"  ❌ Versión {version}, índices {sorted(indices)}")
+            return False
+
+        agente._verificar_planes_consulta()
+
+        print(f"  ✅ Esquema v{version} con {len(indices)} índices usados por las consultas frecuentes")
+        print("✅ Esquema e índices funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en esquema e índices: {e}")
+        return False
+
+def test_instrumentacion():
+    """Prueba los histogramas de latencia por etapa"""
+    print("🧪 Probando instrumentación de latencia...")
+
+    try:
+        from instrumentacion import HistogramaLatencia
+
+        histograma = HistogramaLatencia()
+        for ms in range(1, 1001):
+            histograma.registrar(ms * 1_000_000)
+
+        resumen = histograma.resumen()
+        for clave, esperado in (('p50_ms', 500), ('p95_ms', 950), ('p99_ms', 990)):
+            if abs(resumen[clave] - esperado) / esperado > 0.2:
+                print(f"  ❌ {clave}={resumen[clave]} (se esperaba ~{esperado})")
+                return False
+
+        agente = AgentePredictivo()
+        agente.procesar_entrada("Hola parce, como", "test_user", "general")
+        etapas = agente.obtener_metricas_rendimiento()['latencias_por_etapa']
+
+        esperadas = {'procesar_sensores', 'detectar_contexto', 'razonamiento_fol',
+                     'buscar_mejores_sugerencias', 'total'}
+        if not esperadas <= set(etapas) or 'informal' not in etapas['total']:
+            print(f"  ❌ Etapas medidas: {sorted(etapas)}")
+            return False
+
+        print(f"  ✅ Percentiles: {resumen}")
+        print("✅ Instrumentación de latencia funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en instrumentación de latencia: {e}")
+        return False
+
+def test_procesar_lote():
+    """Prueba el procesamiento por lotes y el endpoint /api/predict/batch"""
+    print("🧪 Probando predicción por lotes...")
+
+    try:
+        import api_server
+
+        agente = AgentePredictivo()
+        peticiones = [
+            {"texto": "Hola parce, como", "usuario_id": "lote", "contexto": "informal"},
+            {"usuario_id": "lote"},
+            {"texto": "Estimado señor", "usuario_id": "lote", "contexto": "formal"},
+            {"texto": "Hola parce, como", "usuario_id": "lote", "contexto": "informal"}
+        ]
+
+        resultados = agente.procesar_lote(peticiones)
+        if 'error' not in resultados[1] or any('error' in resultados[i] for i in (0, 2, 3)):
+            print(f"  ❌ Errores por elemento incorrectos: {resultados}")
+            return False
+
+        individuales = [agente.procesar_entrada(p['texto'], p['usuario_id'], p['contexto'])
+                        for p in (peticiones[0], peticiones[2])]
+        if [s.texto for s in resultados[0]['sugerencias']] != [s.texto for s in individuales[0]] or \
+           [s.texto for s in resultados[2]['sugerencias']] != [s.texto for s in individuales[1]]:
+            print("  ❌ El lote no coincide con las predicciones individuales")
+            return False
+
+        invalidas = [
+            {"texto": "Hola parce, como", "usuario_id": "lote", "contexto": None},
+            {"texto": "Hola parce, como", "usuario_id": "lote", "contexto": 5},
+            {"texto": "Hola parce, como", "usuario_id": "lote", "contexto": ["x"]},
+            {"texto": "Hola parce, como", "usuario_id": {"id": 1}},
+            peticiones[0]
+        ]
+        resultados = agente.procesar_lote(invalidas)
+        if any('error' not in r for r in resultados[:4]) or 'error' in resultados[4]:
+            print(f"  ❌ Un elemento inválido afecta al lote: {resultados}")
+            return False
+
+        api_server.agente = agente
+        respuesta = api_server.app.test_client().post('/api/predict/batch', json={'peticiones': peticiones})
+        cuerpo = respuesta.get_json()
+        if respuesta.status_code != 200 or [r['status'] for r in cuerpo['resultados']] != \
+                ['success', 'error', 'success', 'success']:
+            print(f"  ❌ Respuesta del endpoint: {respuesta.status_code} {cuerpo}")
+            return False
+
+        print(f"  ✅ {cuerpo['total']} resultados en orden, {cuerpo['errores']} con error")
+        print("✅ Predicción por lotes funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en predicción por lotes: {e}")
+        return False
+
+def test_monitor_salud():
+    """Prueba las sondas de liveness y readiness"""
+    print("🧪 Probando monitor de salud...")
+
+    try:
+        import api_server
+        from monitor_salud import MonitorSalud
+
+        agente = AgentePredictivo()
+        agente.procesar_entrada("Hola parce, como", "test_user", "informal")
+
+        monitor = MonitorSalud(agente, intervalo_s=0.05)
+        monitor.iniciar()
+        api_server.agente, api_server.monitor = agente, monitor
+        cliente = api_server.app.test_client()
+
+        vivo = cliente.get('/api/health/live')
+        listo = cliente.get('/api/health/ready')
+        componentes = listo.get_json()['componentes']
+        if vivo.status_code != 200 or listo.status_code != 200:
+            print(f"  ❌ Sondas: live {vivo.status_code}, ready {listo.status_code} {componentes}")
+            return False
+        if componentes['ultima_prediccion']['latencia_ms'] is None:
+            print("  ❌ No se registró la última predicción")
+            return False
+
+        monitor.detener()
+        time.sleep(0.2)
+        if cliente.get('/api/health/ready').status_code != 503:
+            print("  ❌ Una instantánea vencida debería marcar el agente como no listo")
+            return False
+
+        print(f"  ✅ Componentes: {sorted(componentes)}")
+        print("✅ Monitor de salud funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en monitor de salud: {e}")
+        return False
+
+def test_plazos():
+    """Prueba la búsqueda con plazo (tiempo_limite_ms) y las respuestas degradadas"""
+    print("🧪 Probando plazos de respuesta...")
+
+    try:
+        import sqlite3
+
+        agente = AgentePredictivo()
+        normales = agente.procesar_entrada("Hola parce, como", "test_user", "informal")
+        if not normales or any(s.metadata.get('degradada') for s in normales):
+            print("  ❌ Con presupuesto holgado la respuesta no debe degradarse")
+            return False
+
+        agente.config['tiempo_limite_ms'] = 0.001
+        degradadas = agente.procesar_entrada("Estimado señor, le escribo", "test_user", "formal")
+        if not degradadas or not all(s.metadata.get('degradada') for s in degradadas):
+            print("  ❌ Con el plazo vencido se esperaba una respuesta degradada")
+            return False
+
+        plazos = agente.obtener_metricas_rendimiento()['plazos']
+        if plazos['vencidos'] < 1 or plazos['respuestas_degradadas'] < 1:
+            print(f"  ❌ Contadores de plazos: {plazos}")
+            return False
+
+        try:
+            agente.bd.consultar("""
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n)
+                SELECT COUNT(*) FROM n
+            """, (), limite_ms=5)
+            print("  ❌ La consulta debía interrumpirse al superar su límite")
+            return False
+        except sqlite3.OperationalError:
+            pass
+
+        print(f"  ✅ Contadores: {plazos}")
+        print("✅ Plazos de respuesta funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en plazos de respuesta: {e}")
+        return False
+
+def test_puntuacion_vectorizada():
+    """Prueba que el núcleo vectorizado reproduce la heurística candidato por candidato"""
+    print("🧪 Probando puntuación vectorizada...")
+
+    try:
+        agente = AgentePredictivo()
+        algoritmo = agente.algoritmo_busqueda
+
+        casos = [
+            ("Hola parce, como", "informal"),
+            ("Estimado señor, le escribo", "formal"),
+            ("El analisis de los datos", "academico"),
+            ("que", "general"),
+            ("Vamos a la rumba con el cami", "informal")
+        ]
+
+        for texto, contexto in casos:
+            palabras = tokenizar(texto)
+            prefijo = prefijo_en_curso(texto)
+            historia = palabras[:-1] if prefijo else palabras
+
+            ids_previos = VOCABULARIO.ids(palabras)
+            ids_historia = ids_previos[:-1] if prefijo else ids_previos
+            correccion = agente.base_conocimiento.sugerir_correccion(palabras[-1])
+
+            ids = algoritmo._generar_candidatos(contexto, palabras, prefijo, ids_previos, correccion)
+            f_scores, _ = algoritmo._puntuar_candidatos(ids, contexto, ids_previos, ids_historia, correccion)
+            candidatos = VOCABULARIO.palabras(ids)
+            esperados = [algoritmo._costo_real(c, palabras) + algoritmo._heuristica(c, contexto, palabras, historia)
+                         for c in candidatos]
+
+            if f_scores.tolist() != esperados:
+                print(f"  ❌ Puntajes distintos para '{texto}'")
+                return False
+
+            ranking = [s.texto for s in algoritmo.buscar_mejores_sugerencias(contexto, palabras, 5, prefijo)]
+            referencia = [c for _, c in sorted(zip(esperados, candidatos))][:5]
+            if ranking != referencia:
+                print(f"  ❌ Ranking distinto para '{texto}': {ranking} vs {referencia}")
+                return False
+
+        print(f"  ✅ {len(casos)} casos idénticos a la heurística escalar")
+        print("✅ Puntuación vectorizada funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en puntuación vectorizada: {e}")
+        return False
+
+def test_vocabulario():
+    """Prueba el vocabulario global de ids"""
+    print("🧪 Probando vocabulario global...")
+
+    try:
+        from vocabulario import Vocabulario, DESCONOCIDA
+
+        vocabulario = Vocabulario(maximo=3)
+        ids = vocabulario.ids(['parce', 'que', 'parce', 'más'])
+        if ids.tolist() != [0, 1, 0, 2] or str(ids.dtype) != 'int32':
+            print(f"  ❌ Ids inesperados: {ids}")
+            return False
+
+        if vocabulario.palabras(ids) != ['parce', 'que', 'parce', 'más'] or vocabulario.buscar('nuevo') != DESCONOCIDA:
+            print("  ❌ Traducción de ids incorrecta")
+            return False
+
+        if vocabulario.id('otra') != DESCONOCIDA or len(vocabulario) != 3:
+            print("  ❌ El vocabulario lleno no debe crecer")
+            return False
+
+        temporales = Vocabulario().ids_texto(['qwxz', 'casa', 'qwxz', 'zzyq'], lambda palabra: palabra == 'casa')
+        if temporales.tolist() != [-2, 0, -2, -3]:
+            print(f"  ❌ Ids temporales inesperados: {temporales}")
+            return False
+
+        agente = AgentePredictivo()
+        sugerencias = agente.procesar_entrada("Hola parce, como", "test_user", "informal")
+        if not all(s.texto in VOCABULARIO for s in sugerencias):
+            print("  ❌ Las sugerencias deben venir de palabras internadas")
+            return False
+
+        # El texto propio del usuario no crece el vocabulario global: solo lo que aprende su modelo
+        agente.procesar_entrada("mi gato xqzwv come", "test_user", "general")
+        agente.procesar_entrada("hola yyqkt", "test_user", "general", sesion_id="s1")
+        agente.registrar_feedback("test_user", "wqzzk", "rechaza")
+        if any(palabra in VOCABULARIO for palabra in ('xqzwv', 'yyqkt', 'wqzzk')):
+            print("  ❌ Las palabras que solo escribe el usuario no deben internarse")
+            return False
+
+        agente.procesar_entrada("hola yyqkt ", "test_user", "general", sesion_id="s1")
+        if 'yyqkt' not in VOCABULARIO:
+            print("  ❌ Las palabras que aprende el modelo del usuario deben internarse")
+            return False
+
+        print(f"  ✅ {len(VOCABULARIO)} palabras internadas en el vocabulario global")
+        print("✅ Vocabulario global funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en vocabulario global: {e}")
+        return False
+
+def test_detector_contexto():
+    """Prueba el detector de contexto Aho-Corasick"""
+    print("🧪 Probando detector de contexto...")
+
+    try:
+        from detector_contexto import DetectorContexto
+
+        detector = DetectorContexto()
+        for i in range(5000):
+            detector.agregar(f"indicador{i}", 'academico')
+        detector.agregar('lol', 'informal')
+        detector.agregar('nos permitimos informar', 'formal')
+        detector.agregar('permitimos', 'formal')
+        detector.construir()
+
+        if detector.contar(tokenizar("Lola y el lolo")):
+            print("  ❌ Solo deben contar palabras completas")
+            return False
+
+        contexto, cuentas = detector.detectar(tokenizar("Nos permitimos informar, lol"))
+        if contexto != 'formal' or cuentas != {'formal': 2, 'informal': 1}:
+            print(f"  ❌ Detección incorrecta: {contexto} {cuentas}")
+            return False
+
+        agente = AgentePredictivo()
+        if agente._detectar_contexto(tokenizar("El analisis de la investigacion"))[0] != 'academico':
+            print("  ❌ Los indicadores deben coincidir sin importar las tildes")
+            return False
+
+        print(f"  ✅ {len(detector)} indicadores, cuentas {cuentas}")
+        print("✅ Detector de contexto funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en detector de contexto: {e}")
+        return False
+
+def test_sesiones():
+    """Prueba el procesamiento incremental por sesión"""
+    print("🧪 Probando sesiones incrementales...")
+
+    try:
+        from sesiones import GestorSesiones
+
+        agente = AgentePredictivo()
+        texto = "Parce, el analisis de la investigacion esta listo y la reunion es manana, bacano"
+        for i in range(1, len(texto) + 1):
+            agente.procesar_entrada(texto[:i], 'sesion_user', sesion_id='doc1')
+
+        reprocesados = agente.metricas['tokens_reprocesados']
+        if reprocesados > 2 * len(texto):
+            print(f"  ❌ Se reprocesaron demasiados tokens: {reprocesados}")
+            return False
+
+        # Una edición en medio del texto debe dejar el mismo estado que procesarlo de cero
+        editado = texto.replace("esta listo", "ya esta terminado")
+        incremental = agente.procesar_entrada(editado, 'sesion_user', sesion_id='doc1')
+        completo = agente.procesar_entrada(editado, 'sesion_user')
+        if [s.texto for s in incremental] != [s.texto for s in completo]:
+            print("  ❌ Las sugerencias incrementales difieren de las completas")
+            return False
+
+        sesion = agente.sesiones.obtener('sesion_user', 'doc1')
+        if [t.palabra for t in sesion.tokens] != tokenizar(editado):
+            print("  ❌ Los tokens de la sesión no coinciden con el texto")
+            return False
+        cuentas = agente._procesar_sensores_sesion(editado, 'sesion_user', 'general', 'doc1')['indicadores_contexto']
+        if cuentas != agente._procesar_sensores(editado, 'sesion_user', 'general')['indicadores_contexto']:
+            print(f"  ❌ Cuentas de contexto incorrectas: {cuentas}")
+            return False
+
+        # La primera petición de un documento largo solo tokeniza y verifica la cola
+        largo = " ".join(f"palabra{i}" for i in range(20000)) + " bacano"
+        sesion = GestorSesiones(caracteres_cola=2048, maximo_verificadas=64).obtener('u', 'largo')
+        reprocesados_largo = sesion.actualizar(largo, agente.detector_contexto,
+                                               agente.base_conocimiento.sugerir_correccion, VOCABULARIO,
+                                               agente.base_conocimiento.palabra_conocida)
+        if reprocesados_largo > 2048 // 5 or sesion.tokens[-1].palabra != 'bacano':
+            print(f"  ❌ La primera petición debe procesar solo la cola: {reprocesados_largo} tokens")
+            return False
+        if len(sesion.verificadas) > 64:
+            print(f"  ❌ Las correcciones verificadas deben estar acotadas: {len(sesion.verificadas)}")
+            return False
+
+        gestor = GestorSesiones(ttl_s=0.0)
+        gestor.obtener('u', 's1')
+        gestor.obtener('u', 's2')
+        if len(gestor) != 1 or gestor.estadisticas()['expiradas'] < 1:
+            print("  ❌ Las sesiones inactivas deben expirar")
+            return False
+
+        print(f"  ✅ {len(texto)} pulsaciones con {int(reprocesados)} tokens reprocesados")
+        print("✅ Sesiones incrementales funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en sesiones: {e}")
+        return False
+
+def test_ventana_analisis():
+    """Prueba la ventana de análisis acotada y los límites de tamaño"""
+    print("🧪 Probando ventana de análisis para textos largos...")
+
+    try:
+        import api_server
+
+        agente = AgentePredictivo()
+        ventana = agente.config['ventana_analisis_tokens']
+
+        # El texto formal del inicio queda fuera de la ventana de contexto
+        largo = ("Estimado señor, cordialmente le informamos. " * 1200 + "el dato de la tabla " * 200 +
+                 "parce, que chimba, bacano, ")
+        entrada = agente._procesar_sensores(largo, 'ventana_user', 'general')
+        if len(entrada['palabras']) > ventana or entrada['palabras'][-1] != 'bacano':
+            print(f"  ❌ Ventana incorrecta: {len(entrada['palabras'])} palabras")
+            return False
+        if entrada['contexto'] != 'informal':
+            print(f"  ❌ El contexto debe seguir lo reciente: {entrada['contexto']}")
+            return False
+
+        inicio = time.perf_counter()
+        agente.procesar_entrada(largo + "mas", 'ventana_user')
+        tiempo_largo = (time.perf_counter() - inicio) * 1000
+
+        api_server.agente = agente
+        cliente = api_server.app.test_client()
+        respuesta = cliente.post('/api/predict', json={'texto': 'a' * (agente.config['max_caracteres_entrada'] + 1)})
+        if respuesta.status_code != 413:
+            print(f"  ❌ Texto demasiado largo debe dar 413: {respuesta.status_code}")
+            return False
+        respuesta = cliente.post('/api/predict', data='x' * (api_server.MAX_BYTES_PREDICCION + 1),
+                                 content_type='application/json')
+        if respuesta.status_code != 413:
+            print(f"  ❌ Cuerpo demasiado grande debe dar 413: {respuesta.status_code}")
+            return False
+
+        print(f"  ✅ {len(largo)} caracteres resueltos en {tiempo_largo:.1f}ms con {ventana} tokens")
+        print("✅ Ventana de análisis funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en ventana de análisis: {e}")
+        return False
+
+def test_base_hechos():
+    """Prueba el almacén compacto de hechos FOL"""
+    print("🧪 Probando almacén de hechos con bitsets...")
+
+    try:
+        import numpy as np
+        from base_hechos import ConjuntoBits, Relacion
+
+        generador = np.random.default_rng(3)
+        a_ids = generador.integers(0, 5000, 800)
+        b_ids = generador.integers(0, 7000, 800)
+        a, b = ConjuntoBits(), ConjuntoBits()
+        a.agregar_varios(a_ids)
+        b.agregar_varios(b_ids)
+
+        consulta = np.arange(-5, 7100)
+        esperado = np.isin(consulta, np.intersect1d(a_ids, b_ids))
+        if not np.array_equal((a & b).contiene(consulta), esperado) or len(a) != len(set(a_ids.tolist())):
+            print("  ❌ Operaciones de bitsets incorrectas")
+            return False
+
+        precede = Relacion(3)
+        for fila in generador.integers(0, 50, (2000, 3)).tolist():
+            precede.agregar(*fila)
+        filas = precede.consultar((7, None, 3))
+        esperadas = [t for t in zip(*(precede.columna(i).tolist() for i in range(3))) if t[0] == 7 and t[2] == 3]
+        if sorted(zip(*(precede.columna(i)[filas].tolist() for i in range(3)))) != sorted(esperadas):
+            print("  ❌ Consulta por posición incorrecta")
+            return False
+
+        base = AgentePredictivo().base_conocimiento
+        candidatos = VOCABULARIO.ids(base.corpus_colombiano['expresiones_informales'] + ['hola', 'casa'])
+        base.predicados['Usuario'].agregar(base.constantes.id('hechos_user'))
+        base.predicados['Texto'].agregar(base.constantes.id('hola parce'))
+        for nombre in ('Palabra', 'EspanolColombia'):
+            base.predicados[nombre].agregar_varios(candidatos)
+        base.propiedades['Frecuente'].agregar_varios(candidatos[::2])
+
+        mascara = base.filtrar_sugerencia_basica('hechos_user', 'hola parce', candidatos, 'informal')
+        escalar = [base._regla_sugerencia_basica('hechos_user', 'hola parce', c, 'informal') for c in candidatos.tolist()]
+        if mascara.tolist() != escalar or not any(escalar):
+            print("  ❌ La regla vectorizada difiere de la escalar")
+            return False
+
+        print(f"  ✅ {len(a & b)} ids en la intersección, {len(precede)} tuplas en Precede")
+        print("✅ Almacén de hechos funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en almacén de hechos: {e}")
+        return False
+
+def test_motor_reglas():
+    """Prueba el motor de reglas incremental"""
+    print("🧪 Probando motor de reglas incremental...")
+
+    try:
+        import random
+        from base_hechos import ConjuntoBits, Relacion
+        from motor_reglas import MotorReglas
+
+        motor = MotorReglas({'A': ConjuntoBits(), 'R': Relacion(2), 'N': Relacion(2)},
+                            {'Par': lambda x: x % 2 == 0})
+        motor.agregar_regla('A(x) ∧ R(x,y) ∧ ¬N(x,y) → D(y,x)')
+        motor.agregar_regla('D(y,x) ∧ A(y) ∧ Par(x) → E(y)')
+
+        def conclusiones():
+            return {nombre: set(relacion.tuplas((None,) * relacion.aridad))
+                    for nombre, relacion in motor.derivados.items()}
+
+        aleatorio = random.Random(11)
+        for paso in range(600):
+            predicado = aleatorio.choice(['A', 'R', 'N'])
+            tupla = (aleatorio.randrange(12),) if predicado == 'A' else (aleatorio.randrange(12), aleatorio.randrange(12))
+            if aleatorio.random() < 0.7:
+                motor.afirmar(predicado, tupla)
+            else:
+                motor.retirar(predicado, tupla)
+
+            if paso % 100 == 99:
+                incrementales = conclusiones()
+                motor.recalcular()
+                if conclusiones() != incrementales:
+                    print(f"  ❌ Conclusiones incrementales distintas en el paso {paso}")
+                    return False
+
+        agente = AgentePredictivo()
+        base = agente.base_conocimiento
+        for palabra in ('tambien', 'también', 'camion', 'esta', 'casa', 'analisis'):
+            esperado = base.indice_acentos.correccion(palabra)
+            if base.corregir_tilde(palabra) != esperado:
+                print(f"  ❌ CorregirTilde difiere del índice para {palabra}")
+                return False
+
+        el, casa = VOCABULARIO.id('el'), VOCABULARIO.id('casa')
+        if not base._regla_concordancia(el, casa, 'el casa'):
+            print("  ❌ CorregirConcordancia debe derivarse")
+            return False
+        base.motor.afirmar('Concordancia', (el, casa))
+        if base.motor.cumple('CorregirConcordancia', (casa, el)):
+            print("  ❌ Un hecho negado nuevo debe retirar la conclusión")
+            return False
+
+        print(f"  ✅ {len(base.motor.reglas)} axiomas compilados, {len(motor.derivados['D'])} hechos D derivados")
+        print("✅ Motor de reglas funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en motor de reglas: {e}")
+        return False
+
+def test_preferencias_usuario():
+    """Prueba los contadores de preferencias con decaimiento y memoria acotada"""
+    print("🧪 Probando preferencias por usuario...")
+
+    try:
+        import numpy as np
+        from preferencias_usuario import PreferenciasUsuario
+
+        preferencias = PreferenciasUsuario(vida_media_s=100.0, maximo_por_usuario=4, maximo_entradas=20)
+        for usuario in range(100):
+            for palabra_id in range(10):
+                preferencias.registrar(f"u{usuario}", palabra_id, palabra_id % 2 == 0, ahora=0.0)
+        if len(preferencias) > 20 or preferencias.estadisticas()['usuarios'] > 5:
+            print(f"  ❌ La memoria debe quedar acotada: {preferencias.estadisticas()}")
+            return False
+
+        ajustes = preferencias.ajustes('u99', np.array([6, 7, 8, 9, 50]), ahora=0.0)
+        recientes = preferencias.ajustes('u99', np.array([8]), ahora=2000.0)
+        if not (ajustes[0] > 0 > ajustes[1] and ajustes[4] == 0 and abs(recientes[0]) < 1e-3):
+            print(f"  ❌ Ajustes incorrectos: {ajustes} {recientes}")
+            return False
+
+        agente = AgentePredictivo()
+        texto = "Nos vemos en la"
+        iniciales = [s.texto for s in agente.procesar_entrada(texto, 'pref_user')]
+        elegida = iniciales[-1]
+        for _ in range(5):
+            agente.registrar_feedback('pref_user', elegida, 'acepta')
+
+        propias = [s.texto for s in agente.procesar_entrada(texto, 'pref_user')]
+        ajenas = [s.texto for s in agente.procesar_entrada(texto, 'otro_user')]
+        if propias[0] != elegida or ajenas[0] == elegida:
+            print(f"  ❌ El ranking no usa las preferencias: {iniciales} -> {propias}")
+            return False
+
+        print(f"  ✅ '{elegida}' sube al primer lugar solo para su usuario")
+        print("✅ Preferencias por usuario funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en preferencias por usuario: {e}")
+        return False
+
+def test_modelo_usuario():
+    """Prueba el modelo de n-gramas por usuario con presupuesto de memoria y disco"""
+    print("🧪 Probando modelo de n-gramas por usuario...")
+
+    try:
+        import os
+        import tempfile
+        import numpy as np
+        from modelo_usuario import GestorModelosUsuario
+        from vocabulario import VOCABULARIO
+
+        ids = VOCABULARIO.ids([f"palabra{i}" for i in range(20)]).tolist()
+        with tempfile.TemporaryDirectory() as directorio:
+            gestor = GestorModelosUsuario(directorio, presupuesto_bytes=4000)
+            gestor.iniciar()
+            for usuario in range(10):
+                gestor.aprender(f"u{usuario}", [ids[1], ids[2], ids[3], ids[2], ids[3], ids[usuario + 10]])
+            gestor.vaciar()
+            estadisticas = gestor.estadisticas()
+            if estadisticas['bytes'] > 4000 or estadisticas['guardados_en_disco'] == 0:
+                print(f"  ❌ El presupuesto no se respeta: {estadisticas}")
+                return False
+
+            modelo = gestor.obtener('u0')
+            puntajes = modelo.puntajes(np.array([ids[3], ids[10], ids[19]]), ids[2])
+            if gestor.cargados != 1 or modelo.siguientes_ids(ids[2]) != [ids[3]] or not puntajes[0] > puntajes[1] > 0 == puntajes[2]:
+                print(f"  ❌ El usuario no se recupera del disco: {modelo.siguientes_ids(ids[2])} {puntajes}")
+                return False
+            gestor.detener()
+
+            # Otro usuario desaloja a 'a' (aún sin cambios) entre obtener() y observar()
+            class GestorConCarrera(GestorModelosUsuario):
+                def obtener(self, usuario):
+                    modelo = super().obtener(usuario)
+                    if usuario == 'a':
+                        super().obtener('b')
+                    return modelo
+
+            anterior = GestorModelosUsuario(os.path.join(directorio, 'carrera'))
+            anterior.aprender('b', [ids[3], ids[4]])
+            anterior.detener()
+            carrera = GestorConCarrera(os.path.join(directorio, 'carrera'), presupuesto_bytes=1)
+            carrera.iniciar()
+            carrera.aprender('a', [ids[1], ids[2]])
+            carrera.detener()
+            recuperado = GestorModelosUsuario(os.path.join(directorio, 'carrera')).obtener('a')
+            if recuperado.siguientes_ids(ids[1]) != [ids[2]]:
+                print("  ❌ Lo aprendido por un usuario desalojado a mitad de aprender() se pierde")
+                return False
+            print(f"  ✅ {estadisticas['en_memoria']} usuarios en memoria, el resto recuperado del disco")
+
+        agente = AgentePredictivo()
+        frase = "mi gato se llama zorblax. "
+        texto = ""
+        for caracter in frase * 3 + "mi gato se llama ":
+            texto += caracter
+            agente.procesar_entrada(texto, 'gato_user', sesion_id='doc')
+
+        propias = [s.texto for s in agente.procesar_entrada(texto, 'gato_user', sesion_id='doc')]
+        ajenas = [s.texto for s in agente.procesar_entrada(texto, 'otro_user')]
+        if 'zorblax' not in propias or 'zorblax' in ajenas:
+            print(f"  ❌ El modelo del usuario no se usa: {propias} / {ajenas}")
+            return False
+
+        print(f"  ✅ 'zorblax' se sugiere solo a quien lo escribe: {propias}")
+        print("✅ Modelo de n-gramas por usuario funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en modelo de n-gramas por usuario: {e}")
+        return False
+
+def test_aprendizaje_online():
+    """Prueba el aprendizaje de pesos desde el feedback con publicación por referencia"""
+    print("🧪 Probando aprendizaje online de pesos...")
+
+    try:
+        import numpy as np
+        from aprendizaje_online import AprendizajeOnline
+
+        aprendizaje = AprendizajeOnline(tasa=0.05)
+        aprendizaje.iniciar()
+        anteriores = aprendizaje.pesos
+        for _ in range(20):
+            aprendizaje.encolar(7, True, np.array([95.0, 50.0, 60.0]))
+            aprendizaje.encolar(3, False, np.array([20.0, 50.0, 80.0]))
+        aprendizaje.vaciar()
+        aprendizaje.detener()
+
+        pesos = aprendizaje.pesos
+        impulsos = pesos.impulsos_de(np.array([7, 3, 5, 10**6]))
+        if anteriores.version != 0 or anteriores.heuristica.tolist() != [0.4, 0.3, 0.3]:
+            print(f"  ❌ La instantánea publicada no debe cambiar: {anteriores}")
+            return False
+        if not (pesos.heuristica[0] > 0.4 and pesos.heuristica[2] < 0.3 and abs(pesos.heuristica.sum() - 1) < 1e-9):
+            print(f"  ❌ Pesos de la heurística incorrectos: {pesos.heuristica}")
+            return False
+        if impulsos.tolist() != [5.0, -5.0, 0.0, 0.0]:
+            print(f"  ❌ Impulsos incorrectos: {impulsos}")
+            return False
+        if len(pesos.ids_impulso) != 2 or pesos.version > 2:
+            print(f"  ❌ Publicación no acotada o impulsos densos: versión {pesos.version}, {pesos.ids_impulso}")
+            return False
+        print(f"  ✅ Pesos aprendidos: {np.round(pesos.heuristica, 3).tolist()}, {pesos.version} versiones")
+
+        # Solo impulsos: la versión (clave de la caché) no cambia y se avisan las palabras
+        avisados = []
+        impulsos_solos = AprendizajeOnline(tasa=0.0, intervalo_publicacion_s=60.0,
+                                           al_publicar_impulsos=avisados.append)
+        impulsos_solos.iniciar()
+        impulsos_solos.encolar(42, True, np.array([95.0, 50.0, 60.0]))
+        time.sleep(0.1)
+        sin_publicar = impulsos_solos.pesos.impulsos_de(np.array([42]))[0]
+        impulsos_solos.vaciar()
+        impulsos_solos.detener()
+        if sin_publicar != 0.0 or impulsos_solos.pesos.version != 0 or avisados != [{42}] or \
+                impulsos_solos.pesos.impulsos_de(np.array([42]))[0] != 0.5:
+            print(f"  ❌ Calendario o versión de impulsos incorrectos: {impulsos_solos.estadisticas()} {avisados}")
+            return False
+
+        agente = AgentePredictivo()
+        texto = "Nos vemos en la"
+        iniciales = [s.texto for s in agente.procesar_entrada(texto, 'nuevo_user')]
+        rechazada = iniciales[0]
+        for usuario in range(5):
+            agente.registrar_feedback(f"u{usuario}", rechazada, 'rechaza')
+        agente.aprendizaje.vaciar()
+
+        despues = [s.texto for s in agente.procesar_entrada(texto, 'nuevo_user')]
+        metricas = agente.obtener_metricas_rendimiento()['aprendizaje_online']
+        if despues[0] == rechazada or metricas['aplicados'] != 5:
+            print(f"  ❌ El feedback global no cambia el ranking: {iniciales} -> {despues} {metricas}")
+            return False
+
+        print(f"  ✅ '{rechazada}' baja para todos tras rechazos de otros usuarios: {despues}")
+        print("✅ Aprendizaje online funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en aprendizaje online: {e}")
+        return False
+
+def test_ingesta_corpus():
+    """Prueba la ingesta de corpus en paralelo con conteos parciales en disco"""
+    print("🧪 Probando ingesta de corpus...")
+
+    try:
+        import os
+        import random
+        import sqlite3
+        import tempfile
+        from ingesta_corpus import ingerir
+        from lexicon_binario import LexiconBinario
+        from modelo_ngramas import ModeloNgramas
+
+        aleatorio = random.Random(3)
+        palabras = "el la de que parce bacano chévere está también tinto pues".split()
+        textos = [" ".join(aleatorio.choice(palabras) for _ in range(5000)),
+                  "\n".join(" ".join(aleatorio.choice(palabras) for _ in range(9)) + "." for _ in range(400))]
+
+        with tempfile.TemporaryDirectory() as directorio:
+            os.makedirs(os.path.join(directorio, 'corpus', 'sub'))
+            for ruta, texto in zip(('corpus/a.txt', 'corpus/sub/b.txt'), textos):
+                with open(os.path.join(directorio, ruta), 'w', encoding='utf-8') as archivo:
+                    archivo.write(texto)
+
+            # Bloques y presupuesto diminutos: n-gramas entre bloques y varios fragmentos por proceso
+            resultado = ingerir([os.path.join(directorio, 'corpus')], os.path.join(directorio, 'corpus.db'),
+                                os.path.join(directorio, 'modelo.npz'), os.path.join(directorio, 'lexicon.bin'),
+                                procesos=2, memoria_mb=0.01, minimo=1, tamano_bloque=2000)
+            if resultado['fragmentos'] <= resultado['archivos']:
+                print(f"  ❌ Los conteos parciales no se volcaron a disco: {resultado}")
+                return False
+
+            modelo = ModeloNgramas.cargar(os.path.join(directorio, 'modelo.npz'))
+            esperado = ModeloNgramas.entrenar(textos)
+            iguales = modelo.vocabulario == esperado.vocabulario and (modelo.unigramas == esperado.unigramas).all()
+            for orden in (2, 3):
+                iguales = iguales and (modelo.historias[orden] == esperado.historias[orden]).all() \
+                    and (modelo.cuentas[orden] == esperado.cuentas[orden]).all()
+            if not iguales:
+                print("  ❌ Los conteos no coinciden con el entrenamiento en memoria")
+                return False
+
+            conn = sqlite3.connect(os.path.join(directorio, 'corpus.db'))
+            filas = conn.execute("SELECT COUNT(*), SUM(requiere_tilde) FROM palabras").fetchone()
+            conn.close()
+            lexicon = LexiconBinario.abrir(os.path.join(directorio, 'lexicon.bin'))
+            entradas = len(lexicon)
+            lexicon.cerrar()
+            if filas != (len(palabras), 3) or entradas != len(palabras):
+                print(f"  ❌ Carga incorrecta: {filas} filas, {entradas} en el léxico")
+                return False
+
+            # Vocabulario y n-gramas acotados durante la reducción
+            acotado = ingerir([os.path.join(directorio, 'corpus')], os.path.join(directorio, 'acotado.db'),
+                              os.path.join(directorio, 'acotado.npz'), os.path.join(directorio, 'acotado.bin'),
+                              procesos=2, minimo=1, maximo_vocabulario=4, maximo_ngramas=5)
+            modelo = ModeloNgramas.cargar(os.path.join(directorio, 'acotado.npz'))
+            frecuentes = sorted(esperado.vocabulario, key=lambda p: -esperado.unigramas[esperado.ids[p]])[:4]
+            if sorted(frecuentes) != modelo.vocabulario or any(n > 5 for n in acotado['ngramas'].values()):
+                print(f"  ❌ Reducción sin acotar: {modelo.vocabulario} {acotado['ngramas']}")
+                return False
+
+        print(f"  ✅ {resultado['tokens']} tokens en {resultado['fragmentos']} fragmentos, "
+              f"n-gramas {resultado['ngramas']}")
+        print("✅ Ingesta de corpus funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en ingesta de corpus: {e}")
+        return False
+
+def test_benchmark():
+    """Prueba un escenario pequeño del benchmark reproducible"""
+    print("🧪 Probando benchmark del camino caliente...")
+
+    try:
+        from benchmark import ejecutar_escenario, generar_corpus
+
+        if generar_corpus(500, 7) != generar_corpus(500, 7):
+            print("  ❌ El corpus sintético no es reproducible")
+            return False
+
+        resultado = ejecutar_escenario(palabras=500, interacciones=50, pulsaciones=40, semilla=7)
+        for operacion in ('procesar_entrada', 'registrar_feedback', 'obtener_metricas_rendimiento'):
+            if not resultado[operacion].get('p99_ms'):
+                print(f"  ❌ Sin percentiles para {operacion}")
+                return False
+
+        entrada = resultado['procesar_entrada']
+        print(f"  ✅ procesar_entrada: {entrada['throughput_ops_s']} ops/s, p99 {entrada['p99_ms']} ms")
+        print("✅ Benchmark funcionando correctamente")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en benchmark: {e}")
+        return False
+
 def generar_reporte():
     """Genera reporte de pruebas"""
     print("\n" + "="*50)
@@ -192,6 +1409,31 @@ def main():
         ("Núcleo del Agente", test_agente_core),
         ("Base de Datos", test_base_datos), 
         ("Corpus Colombiano", test_corpus_colombiano),
+        ("Índice de Prefijos", test_indice_prefijos),
+        ("Modelo de N-gramas", test_modelo_ngramas),
+        ("Léxico Binario", test_lexicon_binario),
+        ("Corrector Ortográfico", test_corrector_ortografico),
+        ("Índice de Acentos", test_indice_acentos),
+        ("Caché de Sugerencias", test_cache_sugerencias),
+        ("Pool de Conexiones", test_conexiones_bd),
+        ("Escritor de Feedback", test_escritor_feedback),
+        ("Esquema e Índices", test_esquema_indices),
+        ("Instrumentación de Latencia", test_instrumentacion),
+        ("Benchmark", test_benchmark),
+        ("Predicción por Lotes", test_procesar_lote),
+        ("Monitor de Salud", test_monitor_salud),
+        ("Plazos de Respuesta", test_plazos),
+        ("Puntuación Vectorizada", test_puntuacion_vectorizada),
+        ("Vocabulario Global", test_vocabulario),
+        ("Detector de Contexto", test_detector_contexto),
+        ("Sesiones incrementales", test_sesiones),
+        ("Ventana de análisis", test_ventana_analisis),
+        ("Almacén de hechos", test_base_hechos),
+        ("Motor de reglas", test_motor_reglas),
+        ("Preferencias por usuario", test_preferencias_usuario),
+        ("Modelo por usuario", test_modelo_usuario),
+        ("Aprendizaje online", test_aprendizaje_online),
+        ("Ingesta de corpus", test_ingesta_corpus),
         ("Servidor API", test_api_server)
     ]
 
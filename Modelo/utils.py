@@ -0,0 +1,63 @@
+"""
+Utilidades generales de normalización y tokenización de texto
+para el agente de texto predictivo
+"""
+
+import re
+from typing import List, Sequence
+
+import numpy as np
+
+# Tokens de palabra: letras, dígitos y guion bajo (incluye tildes, ü y ñ)
+PATRON_PALABRA = re.compile(r'\w+')
+_PATRON_SEPARADOR = re.compile(r'\W')
+
+# La ñ se conserva: en español es una letra distinta ("ano" ≠ "año")
+_TABLA_ACENTOS = str.maketrans('áéíóúüÁÉÍÓÚÜ', 'aeiouuAEIOUU')
+
+# Parámetros de FNV-1a de 64 bits
+_FNV_BASE = np.uint64(0xcbf29ce484222325)
+_FNV_PRIMO = np.uint64(0x100000001b3)
+
+def plegar_acentos(texto: str) -> str:
+    """Quita tildes y diéresis y pasa a minúsculas"""
+    return texto.translate(_TABLA_ACENTOS).lower()
+
+def tokenizar(texto: str) -> List[str]:
+    """Separa el texto en palabras en minúscula sin puntuación"""
+    return PATRON_PALABRA.findall(texto.lower())
+
+def inicio_cola(texto: str, limite: int) -> int:
+    """Posición donde empiezan los últimos limite caracteres del texto, sin la palabra cortada al inicio"""
+    if len(texto) <= limite:
+        return 0
+
+    inicio = len(texto) - limite
+    if PATRON_PALABRA.match(texto, inicio - 1):
+        # La primera palabra quedó partida: se descarta hasta el primer separador
+        corte = _PATRON_SEPARADOR.search(texto, inicio)
+        return corte.start() if corte else len(texto)
+    return inicio
+
+def prefijo_en_curso(texto: str) -> str:
+    """Devuelve la palabra que el usuario está escribiendo (sin espacio final)"""
+    inicio = len(texto)
+    while inicio > 0 and (texto[inicio - 1].isalnum() or texto[inicio - 1] == '_'):
+        inicio -= 1
+
+    return texto[inicio:].lower()
+
+def huellas(cadenas: Sequence[str], tamano_bloque: int = 1 << 18) -> np.ndarray:
+    """Huella FNV-1a de 64 bits de cada cadena sobre sus puntos de código (estable entre procesos)"""
+    resultado = np.empty(len(cadenas), dtype=np.uint64)
+    for inicio in range(0, len(cadenas), tamano_bloque):
+        bloque = list(cadenas[inicio:inicio + tamano_bloque])
+        codigos = np.array(bloque, dtype=str)
+        codigos = codigos.view(np.uint32).reshape(len(bloque), -1).astype(np.uint64)
+
+        # Los ceros de relleno (las cadenas no contienen NUL) no cambian la huella
+        huella = np.full(len(bloque), _FNV_BASE, dtype=np.uint64)
+        for columna in codigos.T:
+            huella = np.where(columna != 0, (huella ^ columna) * _FNV_PRIMO, huella)
+        resultado[inicio:inicio + len(bloque)] = huella
+    return resultado
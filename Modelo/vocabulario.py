@@ -0,0 +1,97 @@
+"""
+Vocabulario global del agente: cada forma de superficie se interna una sola
+vez como un id int32 denso. Las etapas del pipeline comparan y agrupan ids
+(hashing de enteros, arreglos NumPy) y las cadenas solo se materializan al
+construir las sugerencias. Del texto del usuario solo se internan las palabras
+conocidas (léxico y modelos); las demás usan ids temporales por petición
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# Id de las palabras que no caben en un vocabulario lleno
+DESCONOCIDA = -1
+
+# Primer id temporal: las palabras que solo aparecen en el texto de un usuario
+# reciben ids negativos desde aquí, válidos solo dentro de la petición
+PRIMER_TEMPORAL = -2
+
+# Tope de formas internadas: el texto de los usuarios no puede crecerlo sin límite
+MAXIMO_PALABRAS = 2_000_000
+
+class Vocabulario:
+    """Internado de palabras a ids int32 consecutivos"""
+
+    def __init__(self, maximo: int = MAXIMO_PALABRAS):
+        self.maximo = maximo
+        self._ids: Dict[str, int] = {}
+        self._palabras: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._palabras)
+
+    def __contains__(self, palabra: str) -> bool:
+        return palabra in self._ids
+
+    def id(self, palabra: str) -> int:
+        """Id de la palabra, internándola si es nueva (DESCONOCIDA si está lleno)"""
+        palabra_id = self._ids.get(palabra)
+        if palabra_id is not None:
+            return palabra_id
+
+        with self._lock:
+            palabra_id = self._ids.get(palabra)
+            if palabra_id is not None:
+                return palabra_id
+            if len(self._palabras) >= self.maximo:
+                return DESCONOCIDA
+
+            # La lista se amplía antes de publicar el id: un lector nunca ve un id sin palabra
+            palabra_id = len(self._palabras)
+            self._palabras.append(palabra)
+            self._ids[palabra] = palabra_id
+            return palabra_id
+
+    def buscar(self, palabra: str) -> int:
+        """Id de la palabra sin internarla (DESCONOCIDA si no existe)"""
+        return self._ids.get(palabra, DESCONOCIDA)
+
+    def ids(self, palabras: Iterable[str]) -> np.ndarray:
+        """Ids int32 de una secuencia de palabras, internando las nuevas"""
+        internar = self.id
+        return np.fromiter((internar(palabra) for palabra in palabras), dtype=np.int32)
+
+    def ids_texto(self, palabras: Iterable[str], conocida: Callable[[str], bool]) -> np.ndarray:
+        """Ids int32 de palabras escritas por el usuario, internando solo las conocidas
+
+        Las que no están internadas ni son conocidas (léxico o modelo) reciben un
+        id temporal negativo; la misma forma repite su id dentro de la llamada
+        """
+        temporales: Dict[str, int] = {}
+        resultado = []
+        for palabra in palabras:
+            palabra_id = self._ids.get(palabra)
+            if palabra_id is None:
+                if conocida(palabra):
+                    palabra_id = self.id(palabra)
+                else:
+                    palabra_id = temporales.setdefault(palabra, PRIMER_TEMPORAL - len(temporales))
+            resultado.append(palabra_id)
+        return np.array(resultado, dtype=np.int32)
+
+    def palabra(self, palabra_id: int) -> str:
+        """Forma de superficie de un id"""
+        return self._palabras[palabra_id]
+
+    def palabras(self, ids: Sequence[int]) -> List[str]:
+        """Formas de superficie de una secuencia de ids"""
+        palabras = self._palabras
+        if isinstance(ids, np.ndarray):
+            ids = ids.tolist()
+        return [palabras[palabra_id] for palabra_id in ids]
+
+# Instancia compartida por todos los componentes del proceso
+VOCABULARIO = Vocabulario()